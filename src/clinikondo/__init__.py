@@ -1,31 +1,120 @@
-"""Pacote principal do CliniKondo."""
+"""Pacote principal do CliniKondo.
+
+Os nomes públicos são importados sob demanda (``__getattr__`` do módulo):
+``import clinikondo`` e os comandos administrativos da CLI (``listar-pacientes``,
+``mostrar-log``...) não carregam o extrator, o pipeline nem os clientes HTTP.
+"""
 
 from __future__ import annotations
 
-from pathlib import Path
-from typing import List
+import importlib
+from typing import TYPE_CHECKING, Any, Callable, Generator, List, Optional
+
+if TYPE_CHECKING:
+    import threading
 
-from .config import Config, load_config_from_args
-from .llm import build_extractor
-from .models import Document
-from .patients import PatientRegistry
-from .processing import DocumentProcessor
-from .types import DocumentTypeCatalog
+    from .config import Config, load_config_from_args
+    from .llm import build_extractor
+    from .metrics import RunMetrics
+    from .models import Document
+    from .patients import PatientRegistry
+    from .processing import DocumentProcessor
+    from .types import DocumentTypeCatalog
 
 __all__ = [
     "Config",
     "Document",
     "DocumentProcessor",
     "PatientRegistry",
+    "RunMetrics",
     "DocumentTypeCatalog",
     "build_extractor",
+    "build_processor",
+    "iter_pipeline",
     "load_config_from_args",
     "run_pipeline",
+    "watch_pipeline",
 ]
 
+# Nome público -> módulo que o define
+_LAZY = {
+    "Config": ".config",
+    "load_config_from_args": ".config",
+    "build_extractor": ".llm",
+    "RunMetrics": ".metrics",
+    "Document": ".models",
+    "PatientRegistry": ".patients",
+    "DocumentProcessor": ".processing",
+    "DocumentTypeCatalog": ".types",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value  # Próximos acessos não passam mais por aqui
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
+
+
+def run_pipeline(
+    config: Config,
+    metrics: Optional[RunMetrics] = None,
+    on_document: Optional[Callable[[Document], None]] = None,
+) -> List[Document]:
+    """Executa o pipeline completo a partir de uma configuração válida.
+
+    *metrics* recebe o tempo por etapa, as tentativas e os tokens de cada documento.
+    Com *on_document*, cada documento é entregue ao callback assim que é
+    organizado e nada é acumulado (a lista retornada fica vazia).
+    """
+    documents = iter_pipeline(config, metrics)
+    if on_document is None:
+        return list(documents)
+    for document in documents:
+        on_document(document)
+    return []
+
+
+def iter_pipeline(config: Config, metrics: Optional[RunMetrics] = None) -> Generator[Document, None, None]:
+    """Como :func:`run_pipeline`, mas entrega os documentos organizados um a um.
+
+    O texto extraído de cada documento já foi liberado quando ele é entregue.
+    """
+    return build_processor(config, metrics).iter_process()
+
+
+def watch_pipeline(
+    config: Config, metrics: Optional[RunMetrics] = None, *, stop: threading.Event
+) -> Generator[Document, None, None]:
+    """Organiza a entrada e continua observando-a até *stop* ser sinalizado (``processar --watch``).
+
+    O processador (registro de pacientes, hashes, cliente do LLM) é criado uma
+    única vez e atende todos os arquivos novos.
+    """
+    from .watch import watch_documents
+
+    return watch_documents(
+        build_processor(config, metrics),
+        stop=stop,
+        backend=config.watch_backend,
+        interval=config.watch_interval,
+        settle=config.watch_settle_seconds,
+    )
+
+
+def build_processor(config: Config, metrics: Optional[RunMetrics] = None) -> DocumentProcessor:
+    """Monta o :class:`DocumentProcessor` da configuração (com o aquecimento do Ollama)."""
+    from .llm import build_extractor
+    from .patients import PatientRegistry
+    from .processing import DocumentProcessor
+    from .types import DocumentTypeCatalog
 
-def run_pipeline(config: Config) -> List[Document]:
-    """Executa o pipeline completo a partir de uma configuração válida."""
     prompt_text = None
     if config.prompt_template_path:
         prompt_text = config.prompt_text()
@@ -35,11 +124,15 @@ def run_pipeline(config: Config) -> List[Document]:
     patient_registry = PatientRegistry(registry_path)
     type_catalog = DocumentTypeCatalog()
     extractor = build_extractor(config, prompt_text)
-    processor = DocumentProcessor(
+    if config.llm_provider == "ollama" and config.llm_warmup:
+        from .ollama import warm_up_models
+
+        warm_up_models(config)
+    return DocumentProcessor(
         config=config,
         extractor=extractor,
         patient_registry=patient_registry,
         type_catalog=type_catalog,
+        metrics=metrics,
     )
-    return processor.process_all()
 
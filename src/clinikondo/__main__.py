@@ -1,21 +1,28 @@
-"""Interface de linha de comando do CliniKondo - onde a magia começa! ✨"""
+"""Interface de linha de comando do CliniKondo - onde a magia começa! ✨
+
+Cada comando importa só o que usa: o pipeline (extrator, OCR, clientes HTTP)
+é carregado apenas pelo ``processar``/``servir``, e os comandos
+administrativos iniciam em poucas dezenas de milissegundos.
+"""
 
 from __future__ import annotations
 
 import argparse
-import hashlib
 import json
 import logging
+import os
 import sys
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List
+
+from .discovery import SUPPORTED_EXTENSIONS, DiscoveredFile
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
 
-from . import load_config_from_args, run_pipeline
-from .config import Config
-from .models import Patient
-from .patients import PatientRegistry
-from .processing import SUPPORTED_EXTENSIONS
+    from .models import Document
+    from .patients import PatientRegistry
 
 
 def validate_file(file_path: Path) -> List[str]:
@@ -44,34 +51,92 @@ def validate_file(file_path: Path) -> List[str]:
     return errors
 
 
-def calculate_file_hash(file_path: Path) -> str:
-    """Calcula hash SHA-256 de um arquivo."""
-    sha256_hash = hashlib.sha256()
-    with open(file_path, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(byte_block)
-    return sha256_hash.hexdigest()
+def _group_by_hash(
+    groups: Iterable[List[DiscoveredFile]],
+    hash_file: Callable[[Path, os.stat_result], str],
+    executor: Executor,
+) -> Dict[str, List[DiscoveredFile]]:
+    """Calcula *hash_file* em paralelo e reagrupa; só sobram grupos com 2+ arquivos."""
+    futures = {
+        executor.submit(hash_file, found.path, found.stat): found
+        for group in groups
+        for found in group
+    }
+    by_hash: Dict[str, List[DiscoveredFile]] = {}
+    for future, found in futures.items():
+        try:
+            by_hash.setdefault(future.result(), []).append(found)
+        except Exception as e:
+            logging.warning(f"Erro ao processar {found.path}: {e}")
+    return {file_hash: group for file_hash, group in by_hash.items() if len(group) > 1}
 
 
-def find_duplicates(directory: Path) -> Dict[str, List[Path]]:
-    """Encontra arquivos duplicados por hash."""
-    file_hashes = {}
-    duplicates = {}
-    
-    for file_path in directory.rglob("*"):
-        if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_EXTENSIONS:
-            try:
-                file_hash = calculate_file_hash(file_path)
-                if file_hash in file_hashes:
-                    if file_hash not in duplicates:
-                        duplicates[file_hash] = [file_hashes[file_hash]]
-                    duplicates[file_hash].append(file_path)
-                else:
-                    file_hashes[file_hash] = file_path
-            except Exception as e:
-                logging.warning(f"Erro ao processar {file_path}: {e}")
-    
-    return duplicates
+def find_duplicates(
+    directory: Path, *, workers: int | None = None, cache: bool = False
+) -> Dict[str, List[Path]]:
+    """Encontra arquivos duplicados por hash.
+
+    Funil tamanho → hash parcial (primeiro/último bloco) → SHA-256 completo: só
+    arquivos de mesmo tamanho são lidos, e só os de mesmo hash parcial são lidos
+    inteiros, em várias threads. Com *cache*, os hashes ficam no cache do
+    ``HashTracker`` em ``<pasta>/.clinikondo`` e são reaproveitados enquanto o
+    arquivo não mudar; sem ele, nada é gravado na pasta verificada.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from .discovery import scan_documents
+    from .hash_tracker import HashTracker
+
+    directory = directory.resolve()  # Chaves do cache absolutas, inclusive para "."
+    tracker = HashTracker(directory / ".clinikondo" / "processed_hashes.json") if cache else None
+
+    def partial_hash(path: Path, stat: os.stat_result) -> str:
+        if tracker is not None:
+            return tracker.cached_partial_hash(path, stat)
+        return HashTracker.calculate_partial_hash(path, stat.st_size)
+
+    def full_hash(path: Path, stat: os.stat_result) -> str:
+        if tracker is not None:
+            return tracker.cached_hash(path, stat)
+        return HashTracker.calculate_hash(path)
+
+    by_size: Dict[int, List[DiscoveredFile]] = {}
+    seen = set()
+    for found in scan_documents(directory, extensions=SUPPORTED_EXTENSIONS):
+        seen.add(str(found.path))
+        by_size.setdefault(found.stat.st_size, []).append(found)
+
+    same_size = [group for group in by_size.values() if len(group) > 1]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="clinikondo-hash") as executor:
+        same_partial = _group_by_hash(same_size, partial_hash, executor)
+        same_content = _group_by_hash(same_partial.values(), full_hash, executor)
+
+    if tracker is not None:
+        tracker.prune_cache(directory, seen)
+        tracker.save_cache()
+    groups = sorted((sorted(found.path for found in group), file_hash) for file_hash, group in same_content.items())
+    return {file_hash: paths for paths, file_hash in groups}
+
+
+def files_identical(kept: Path, candidate: Path) -> bool:
+    """Compara os bytes dos dois arquivos antes de apagar/mover uma duplicata.
+
+    O agrupamento pode vir do cache de hashes; a ação destrutiva nunca confia só nele.
+    """
+    import filecmp
+
+    filecmp.clear_cache()
+    return filecmp.cmp(kept, candidate, shallow=False)
+
+
+def patient_storage_file(output_dir: Path, backend: str | None = None) -> Path:
+    """Resolve o arquivo de pacientes (JSON ou SQLite) de um diretório de dados."""
+    backend = backend or os.environ.get("CLINIKONDO_PATIENTS_BACKEND")
+    if backend == "sqlite":
+        return output_dir / "patients.db"
+    if backend is None and (output_dir / "patients.db").exists():
+        return output_dir / "patients.db"
+    return output_dir / "patients.json"
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -108,7 +173,7 @@ def build_parser() -> argparse.ArgumentParser:
     processar_parser.add_argument("--temperature", type=float, help="Temperatura da inferência LLM (0-2)")
     processar_parser.add_argument("--max-tokens", type=int, help="Quantidade máxima de tokens do LLM")
     processar_parser.add_argument("--timeout", type=int, help="Timeout em segundos por requisição LLM (padrão: 240)")
-    processar_parser.add_argument("--retry-delay", type=int, help="Tempo de espera entre tentativas em segundos (padrão: 30)")
+    processar_parser.add_argument("--retry-delay", type=int, help="Espera base entre tentativas em segundos; dobra a cada falha, com jitter (padrão: 30)")
     processar_parser.add_argument("--prompt-template", help="Caminho para o template de prompt")
     processar_parser.add_argument("--ocr-strategy", choices=["hybrid", "multimodal", "traditional"], default="hybrid", help="Estratégia de OCR (hybrid, multimodal, traditional)")
     # Multi-model configuration (SRS v2.0)
@@ -126,6 +191,56 @@ def build_parser() -> argparse.ArgumentParser:
     processar_parser.add_argument("--move-to-shared", action=argparse.BooleanOptionalAction, default=None)
     processar_parser.add_argument("--copy-on-error", action=argparse.BooleanOptionalAction, default=None)
     processar_parser.add_argument("--mover", action="store_true", help="Move arquivos em vez de copiar")
+    processar_parser.add_argument("--patients-backend", choices=["json", "sqlite"], help="Armazenamento do cadastro de pacientes (padrão: json)")
+    processar_parser.add_argument("--fast-path", action=argparse.BooleanOptionalAction, default=None, help="Classifica por regras locais e só consulta o LLM abaixo do limiar de confiança")
+    processar_parser.add_argument("--fast-path-threshold", type=float, help="Confiança mínima (0-1) para dispensar o LLM (padrão: 0.85)")
+    processar_parser.add_argument("--local-classifier", action=argparse.BooleanOptionalAction, default=None, help="Usa o classificador local treinado com 'treinar-classificador'")
+    processar_parser.add_argument("--local-classifier-threshold", type=float, help="Probabilidade mínima (0-1) para o classificador local responder um campo (padrão: 0.9)")
+    processar_parser.add_argument("--collect-training-examples", action=argparse.BooleanOptionalAction, default=None, help="Grava o texto e a classificação de cada documento classificado pelo LLM em .clinikondo/exemplos_classificacao.jsonl para o 'treinar-classificador' (desligado por padrão)")
+    processar_parser.add_argument("--batch-size", type=int, help="Documentos curtos agrupados por requisição ao LLM (padrão: 1, sem agrupamento)")
+    processar_parser.add_argument("--batch-max-chars", type=int, help="Tamanho máximo de texto para um documento entrar em lote (padrão: 6000)")
+    processar_parser.add_argument("--rpm", type=float, help="Limite de requisições por minuto por endpoint LLM (padrão: sem limite)")
+    processar_parser.add_argument("--tpm", type=float, help="Limite de tokens por minuto por endpoint LLM (padrão: sem limite)")
+    processar_parser.add_argument("--max-concurrency", type=int, help="Máximo de requisições simultâneas por endpoint; o limite efetivo se adapta a 429/5xx (padrão: 8)")
+    processar_parser.add_argument("--backoff-max", type=float, help="Espera máxima entre tentativas em segundos (padrão: 120)")
+    processar_parser.add_argument("--circuit-failures", type=int, help="Falhas consecutivas que abrem o circuito de um endpoint LLM (padrão: 5)")
+    processar_parser.add_argument("--circuit-reset", type=float, help="Segundos com o circuito aberto antes de testar o endpoint novamente (padrão: 60)")
+    processar_parser.add_argument("--document-timeout", type=float, help="Prazo total por documento (OCR + LLM) em segundos; ao exceder, o arquivo vai para 'falhas' (padrão: sem prazo)")
+    processar_parser.add_argument("--backends", help="Pool de endpoints LLM: arquivo JSON ou JSON inline com api_base, api_key, weight, max_concurrency e model")
+    processar_parser.add_argument("--health-interval", type=float, help="Intervalo em segundos da verificação de saúde dos endpoints do pool (padrão: 30, 0 desativa)")
+    processar_parser.add_argument("--hedge", action=argparse.BooleanOptionalAction, default=None, help="Dispara uma cópia da classificação que demorar mais que o p95 observado; vence a primeira resposta válida")
+    processar_parser.add_argument("--hedge-max-rate", type=float, help="Fração máxima de requisições com cópia por execução (padrão: 0.05)")
+    processar_parser.add_argument("--cascade", action=argparse.BooleanOptionalAction, default=None, help="Classifica com --classification-model e consulta o modelo maior só quando a resposta é inválida ou de baixa confiança")
+    processar_parser.add_argument("--escalation-model", help="Modelo maior da cascata (padrão: --model)")
+    processar_parser.add_argument("--cascade-threshold", type=float, help="Confiança mínima para aceitar o modelo rápido da cascata (padrão: 0.95)")
+    processar_parser.add_argument("--structured-output", choices=["auto", "json_schema", "off"], help="Saída estruturada (response_format com o schema da resposta); auto desativa por endpoint se rejeitada (padrão: auto)")
+    processar_parser.add_argument("--stream", action=argparse.BooleanOptionalAction, default=None, help="Lê a resposta do LLM em streaming e encerra assim que o JSON fecha (padrão: ativado)")
+    processar_parser.add_argument("--prompt-budget", type=int, help="Tokens estimados do texto do documento no prompt; o texto é limpo e as regiões mais informativas são mantidas (padrão: 3000, 0 = sem limite)")
+    processar_parser.add_argument("--provider", choices=["openai", "ollama"], help="API usada na classificação e no OCR multimodal: openai (compatível, padrão) ou ollama (nativa /api/chat)")
+    processar_parser.add_argument("--keep-alive", help="Com --provider ollama, tempo que o modelo fica carregado entre requisições (padrão: 30m)")
+    processar_parser.add_argument("--warmup", action=argparse.BooleanOptionalAction, default=None, help="Com --provider ollama, carrega os modelos no início da execução (padrão: ativado)")
+    processar_parser.add_argument("--recursive", action=argparse.BooleanOptionalAction, default=None, help="Varre as subpastas da entrada (padrão: ativado)")
+    processar_parser.add_argument("--include", action="append", metavar="GLOB", help="Processa só arquivos que casam com o glob (caminho relativo à entrada ou nome); pode repetir")
+    processar_parser.add_argument("--exclude", action="append", metavar="GLOB", help="Ignora arquivos e pastas que casam com o glob; pode repetir")
+    processar_parser.add_argument("--watch", action=argparse.BooleanOptionalAction, default=None, help="Continua em execução e organiza cada arquivo novo da entrada assim que ele termina de ser gravado")
+    processar_parser.add_argument("--watch-backend", choices=["auto", "inotify", "polling"], help="Detecção de arquivos novos no --watch: inotify (Linux), polling (varredura periódica) ou auto (padrão)")
+    processar_parser.add_argument("--watch-interval", type=float, help="Segundos entre varreduras do --watch com polling (padrão: 5)")
+    processar_parser.add_argument("--watch-settle", type=float, help="Segundos sem mudança de tamanho/mtime antes de processar um arquivo no --watch (padrão: 2)")
+    processar_parser.add_argument("--modo-lote", action=argparse.BooleanOptionalAction, default=None, help="Envia as classificações como job assíncrono de batch; organize depois com 'aplicar-lote'")
+
+    # Comando: servir (mesmas opções do processar, mais as da API)
+    servir_parser = subparsers.add_parser(
+        "servir",
+        parents=[processar_parser],
+        add_help=False,
+        help="Mantém o pipeline carregado e recebe documentos por uma API local",
+        description="API HTTP (ou socket Unix) para enviar documentos, consultar o status e obter o resultado"
+    )
+    servir_parser.add_argument("--host", help="Endereço da API (padrão: 127.0.0.1)")
+    servir_parser.add_argument("--port", type=int, help="Porta da API (padrão: 8765)")
+    servir_parser.add_argument("--socket", help="Socket Unix da API, acessível só pelo usuário (substitui --host/--port)")
+    servir_parser.add_argument("--queue-size", type=int, help="Documentos aguardando na fila; cheia, a API responde 503 (padrão: 100)")
+    servir_parser.add_argument("--max-upload-mb", type=float, help="Tamanho máximo de um arquivo enviado (padrão: 50)")
 
     # Comando: listar pacientes
     listar_parser = subparsers.add_parser(
@@ -136,6 +251,7 @@ def build_parser() -> argparse.ArgumentParser:
     listar_parser.add_argument("--formato", choices=["tabela", "json", "csv"], default="tabela", help="Formato de saída")
     listar_parser.add_argument("--filtro", help="Filtrar pacientes por nome (busca parcial)")
     listar_parser.add_argument("--output-dir", help="Diretório para buscar pacientes (padrão: diretório atual)")
+    listar_parser.add_argument("--patients-backend", choices=["json", "sqlite"], help="Armazenamento do cadastro (padrão: detecta patients.db)")
 
     # Comando: verificar duplicatas
     duplicatas_parser = subparsers.add_parser(
@@ -146,6 +262,8 @@ def build_parser() -> argparse.ArgumentParser:
     duplicatas_parser.add_argument("pasta", help="Pasta para verificar duplicatas")
     duplicatas_parser.add_argument("--acao", choices=["listar", "remover", "mover"], default="listar", help="Ação com duplicatas")
     duplicatas_parser.add_argument("--pasta-backup", help="Pasta para mover duplicatas (se ação=mover)")
+    duplicatas_parser.add_argument("--threads", type=int, help="Threads para calcular hashes (padrão: automático)")
+    duplicatas_parser.add_argument("--cache-hashes", action="store_true", help="Guarda os hashes em <pasta>/.clinikondo/hash_cache.json para acelerar as próximas verificações")
 
     # Comando: relatório de processamento
     relatorio_parser = subparsers.add_parser(
@@ -181,6 +299,7 @@ def build_parser() -> argparse.ArgumentParser:
         help="Gerencia cadastro de pacientes",
         description="Adiciona, edita, remove e fusiona pacientes"
     )
+    pacientes_parser.add_argument("--patients-backend", choices=["json", "sqlite"], help="Armazenamento do cadastro (padrão: detecta patients.db)")
     pacientes_subparsers = pacientes_parser.add_subparsers(dest="acao_paciente", help="Ações disponíveis")
 
     # Subcomando: adicionar paciente
@@ -215,6 +334,28 @@ def build_parser() -> argparse.ArgumentParser:
     duplicates_patient_parser.add_argument("--threshold", type=float, default=0.85, help="Limiar de similaridade (0-1)")
     duplicates_patient_parser.add_argument("--output-dir", help="Diretório de dados (padrão: diretório atual)")
 
+    # Comando: treinar classificador local
+    treinar_parser = subparsers.add_parser(
+        "treinar-classificador",
+        help="Treina o classificador local com as classificações do LLM",
+        description="Atualiza incrementalmente o classificador local (tipo/especialidade) a partir dos exemplos registrados pelo 'processar'"
+    )
+    treinar_parser.add_argument("--output-dir", required=True, help="Diretório de saída usado no 'processar'")
+    treinar_parser.add_argument("--completo", action="store_true", help="Retreina do zero com todos os exemplos")
+
+    # Comando: aplicar lote
+    aplicar_lote_parser = subparsers.add_parser(
+        "aplicar-lote",
+        help="Organiza os documentos de jobs enviados com 'processar --modo-lote'",
+        description="Consulta os jobs de classificação em lote e organiza os documentos dos jobs concluídos"
+    )
+    aplicar_lote_parser.add_argument("--output-dir", required=True, help="Diretório de saída usado no 'processar --modo-lote'")
+    aplicar_lote_parser.add_argument("--lote", help="Aplica apenas o job informado (id local ou id do batch)")
+    aplicar_lote_parser.add_argument("--api-key", help="Chave de API (padrão: OPENAI_API_KEY)")
+    aplicar_lote_parser.add_argument("--api-base", help="Endpoint da API (padrão: OPENAI_API_BASE)")
+    aplicar_lote_parser.add_argument("--aguardar", action="store_true", help="Aguarda a conclusão dos jobs pendentes")
+    aplicar_lote_parser.add_argument("--intervalo", type=float, default=60.0, help="Intervalo entre consultas com --aguardar, em segundos (padrão: 60)")
+
     return parser
 
 
@@ -231,7 +372,9 @@ def cmd_listar_pacientes(args) -> int:
     try:
         output_dir = Path(args.output_dir) if args.output_dir else Path.cwd()
         # Procurar arquivo de registro de pacientes
-        patient_file = output_dir / "patients.json"
+        patient_file = patient_storage_file(output_dir, args.patients_backend)
+        
+        from .patients import PatientRegistry
         
         registry = PatientRegistry(patient_file if patient_file.exists() else None)
         
@@ -282,7 +425,7 @@ def cmd_verificar_duplicatas(args) -> int:
             return 1
         
         print("🔍 Procurando duplicatas...")
-        duplicates = find_duplicates(pasta)
+        duplicates = find_duplicates(pasta, workers=args.threads, cache=args.cache_hashes)
         
         if not duplicates:
             print("✅ Nenhuma duplicata encontrada!")
@@ -303,6 +446,9 @@ def cmd_verificar_duplicatas(args) -> int:
                 # Manter o primeiro arquivo, remover os demais
                 for file_path in files[1:]:
                     try:
+                        if not files_identical(files[0], file_path):
+                            print(f"⚠️  Conteúdo mudou desde a verificação, mantido: {file_path}")
+                            continue
                         file_path.unlink()
                         print(f"🗑️  Removido: {file_path}")
                         removed_count += 1
@@ -322,6 +468,9 @@ def cmd_verificar_duplicatas(args) -> int:
             for files in duplicates.values():
                 for file_path in files[1:]:
                     try:
+                        if not files_identical(files[0], file_path):
+                            print(f"⚠️  Conteúdo mudou desde a verificação, mantido: {file_path}")
+                            continue
                         dest_path = backup_dir / file_path.name
                         # Garantir nome único
                         counter = 1
@@ -347,6 +496,8 @@ def cmd_verificar_duplicatas(args) -> int:
 
 def cmd_relatorio_processamento(args) -> int:
     """Gera relatório de processamento de documentos."""
+    from .manifest import list_manifests, read_manifest
+
     try:
         output_dir = Path(args.output_dir) if args.output_dir else Path.cwd()
         
@@ -360,8 +511,25 @@ def cmd_relatorio_processamento(args) -> int:
             "data_fim": datetime.now()
         }
         
-        # Analisar estrutura de arquivos
-        for file_path in output_dir.rglob("*"):
+        # Manifestos das execuções já trazem destino, paciente e falhas de cada documento
+        manifestos = list_manifests(output_dir / ".clinikondo" / "manifestos")
+        for manifesto in manifestos:
+            for entrada in read_manifest(manifesto):
+                if datetime.fromisoformat(entrada["registrado_em"]) < stats["data_inicio"]:
+                    continue
+                if entrada["status"] == "falha":
+                    stats["erros"] += 1
+                    continue
+                if entrada["status"] != "organizado" or not entrada.get("destino"):
+                    continue
+                stats["total_arquivos"] += 1
+                ext = Path(entrada["destino"]).suffix.lower()
+                stats["por_tipo"][ext] = stats["por_tipo"].get(ext, 0) + 1
+                paciente = (entrada.get("campos") or {}).get("nome_paciente") or "Compartilhado"
+                stats["por_paciente"][paciente] = stats["por_paciente"].get(paciente, 0) + 1
+        
+        # Sem manifestos (execuções antigas): analisar estrutura de arquivos
+        for file_path in ([] if manifestos else output_dir.rglob("*")):
             if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_EXTENSIONS:
                 # Verificar se arquivo foi modificado no período
                 mtime = datetime.fromtimestamp(file_path.stat().st_mtime)
@@ -421,6 +589,8 @@ def cmd_relatorio_processamento(args) -> int:
             print("=" * 50)
             print(f"Período: {stats['data_inicio'].strftime('%d/%m/%Y')} a {stats['data_fim'].strftime('%d/%m/%Y')}")
             print(f"Total de arquivos processados: {stats['total_arquivos']}")
+            if stats["erros"]:
+                print(f"Falhas: {stats['erros']}")
             
             if stats["por_tipo"]:
                 print("\n📁 Arquivos por tipo:")
@@ -581,13 +751,138 @@ def cmd_mostrar_log(args) -> int:
         return 1
 
 
+def cmd_treinar_classificador(args) -> int:
+    """Treina o classificador local com os exemplos registrados."""
+    try:
+        from .classifier import train_classifier
+
+        state_dir = Path(args.output_dir).expanduser() / ".clinikondo"
+        examples_path = state_dir / "exemplos_classificacao.jsonl"
+        if not examples_path.exists():
+            print(f"❌ Nenhum exemplo de treino encontrado em {examples_path}")
+            print("Execute o comando 'processar' primeiro para registrar classificações do LLM.")
+            return 1
+        
+        print("🧠 Treinando classificador local...")
+        stats = train_classifier(examples_path, state_dir / "classificador.npz", full=args.completo)
+        print(f"  Exemplos novos: {stats['exemplos_novos']}")
+        print(f"  Exemplos no modelo: {stats['exemplos_total']}")
+        print(f"  Tipos: {stats['tipos']} | Especialidades: {stats['especialidades']}")
+        print("✅ Classificador atualizado! Use 'processar --local-classifier' para utilizá-lo.")
+        return 0
+        
+    except Exception as e:
+        print(f"Erro ao treinar classificador: {e}")
+        return 1
+
+
+def cmd_aplicar_lote(args) -> int:
+    """Aplica os resultados de jobs de classificação em lote."""
+    try:
+        from .batch import (
+            FINAL_STATUSES,
+            STATUS_APLICADO,
+            BatchAPIClient,
+            apply_batch_job,
+            list_jobs,
+            refresh_job,
+            wait_for_job,
+        )
+
+        output_dir = Path(args.output_dir).expanduser()
+        api_key = args.api_key or os.environ.get("OPENAI_API_KEY")
+        if not api_key:
+            print("❌ OPENAI_API_KEY é obrigatória para consultar os jobs em lote.")
+            return 1
+        client = BatchAPIClient(api_key, args.api_base or os.environ.get("OPENAI_API_BASE"))
+        
+        jobs = [job for job in list_jobs(output_dir / ".clinikondo") if job.status != STATUS_APLICADO]
+        if args.lote:
+            jobs = [job for job in jobs if args.lote in (job.id_local, job.batch_id)]
+        if not jobs:
+            print("ℹ️  Nenhum job em lote pendente.")
+            return 0
+        
+        pendentes = 0
+        for job in jobs:
+            if args.aguardar:
+                wait_for_job(job, client, interval=args.intervalo)
+            else:
+                refresh_job(job, client)
+            if job.status not in FINAL_STATUSES:
+                print(f"⏳ {job.id_local} ({job.batch_id}): {job.status}")
+                pendentes += 1
+                continue
+            documents, falhas = apply_batch_job(job, output_dir, client)
+            print(f"📦 {job.id_local} ({job.batch_id}): {job.status}")
+            for document in documents:
+                print(f"✅ {document.nome_arquivo_original} -> {document.caminho_destino}")
+            print(f"   {len(documents)} documento(s) organizado(s), {falhas} falha(s)")
+        
+        if pendentes:
+            print(f"\nℹ️  {pendentes} job(s) ainda em andamento. Execute 'aplicar-lote' novamente mais tarde.")
+        return 0
+        
+    except Exception as e:
+        print(f"Erro ao aplicar lote: {e}")
+        return 1
+
+
+def cmd_servir(args) -> int:
+    """Serve a API local sobre um pipeline carregado uma única vez."""
+    try:
+        import threading
+
+        from . import RunMetrics, build_processor, load_config_from_args
+        from .service import DocumentService, make_server, server_address
+        from .watch import install_stop_handlers
+
+        config = load_config_from_args(args)
+        configure_logging(config.log_nivel)
+        metrics = RunMetrics()
+        service = DocumentService(build_processor(config, metrics), queue_size=config.service_queue_size)
+        server = make_server(
+            service,
+            host=config.service_host,
+            port=config.service_port,
+            socket_path=config.service_socket,
+            max_upload_mb=config.service_max_upload_mb,
+        )
+    except Exception as exc:
+        print(f"❌ Erro ao iniciar o serviço: {exc}")
+        return 2
+    
+    stop = threading.Event()
+    install_stop_handlers(stop)
+    service.start()
+    threading.Thread(target=server.serve_forever, name="clinikondo-api", daemon=True).start()
+    print(f"🛎️  CliniKondo servindo em {server_address(server)} (Ctrl+C encerra)", flush=True)
+    try:
+        while not stop.wait(1.0):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+        if config.service_socket is not None:
+            config.service_socket.unlink(missing_ok=True)
+        service.close()
+    
+    print("\n⏹️  Serviço encerrado.")
+    print(metrics.format_summary())
+    return 0
+
+
 def cmd_gerenciar_pacientes(args) -> int:
     """Gerencia cadastro de pacientes."""
     try:
         output_dir = Path(args.output_dir) if args.output_dir else Path.cwd()
-        patient_file = output_dir / "patients.json"
+        patient_file = patient_storage_file(output_dir, args.patients_backend)
+        
+        from .patients import PatientRegistry
         
-        registry = PatientRegistry(patient_file if patient_file.exists() else patient_file)
+        registry = PatientRegistry(patient_file)
         
         if not args.acao_paciente:
             print("❌ Especifique uma ação: adicionar, editar, remover, fusionar, detectar-duplicatas")
@@ -783,6 +1078,9 @@ def main(argv: list[str] | None = None) -> int:
         print("  validar-estrutura    - Validar estrutura de pastas")
         print("  mostrar-log         - Exibir logs do sistema")
         print("  gerenciar-pacientes  - Gerenciar cadastro de pacientes")
+        print("  treinar-classificador - Treinar classificador local")
+        print("  aplicar-lote         - Aplicar resultados de jobs em lote")
+        print("  servir               - Servir a API local de processamento")
         return 1
     
     # Configurar logging padrão
@@ -791,24 +1089,68 @@ def main(argv: list[str] | None = None) -> int:
     # Executar comando específico
     if args.comando == "processar":
         try:
+            from . import (
+                RunMetrics,
+                load_config_from_args,
+                run_pipeline,
+                watch_pipeline,
+            )
+            
             config = load_config_from_args(args)
             configure_logging(config.log_nivel)
             logging.getLogger(__name__).debug("Configuração carregada: %s", config)
             
-            documents = run_pipeline(config)
+            if config.modo_lote:
+                from .batch import submit_pipeline_batch
+                
+                job = submit_pipeline_batch(config)
+                if job is None:
+                    print("ℹ️  Nenhum documento pendente para enviar em lote.")
+                    return 0
+                print(f"📦 Job em lote enviado: {job.batch_id} (local: {job.id_local})")
+                print(f"   {job.documentos} documento(s) aguardando classificação")
+                print(f"   Organize os resultados com: clinikondo aplicar-lote --output-dir {config.output_dir}")
+                return 0
+            
+            metrics = RunMetrics()
+            processados = 0
             
             print("📄 RESULTADOS DO PROCESSAMENTO")
             print("=" * 40)
             
-            for document in documents:
+            # Cada documento é impresso assim que é organizado (nada fica acumulado em memória)
+            def mostrar(document: Document) -> None:
+                nonlocal processados
+                processados += 1
                 destino_final = document.caminho_destino if document.caminho_destino else "(sem destino)"
-                print(f"✅ {document.nome_arquivo_original} -> {destino_final}")
+                print(f"✅ {document.nome_arquivo_original} -> {destino_final}", flush=True)
             
-            if not documents:
+            if config.watch:
+                import threading
+
+                from .watch import install_stop_handlers
+
+                # Ctrl+C ou SIGTERM encerram o processo; o estado é salvo ao sair do gerador
+                stop = threading.Event()
+                install_stop_handlers(stop)
+                documentos = watch_pipeline(config, metrics, stop=stop)
+                try:
+                    for document in documentos:
+                        mostrar(document)
+                except KeyboardInterrupt:
+                    print("\n⏹️  Modo watch encerrado.")
+                finally:
+                    documentos.close()
+            else:
+                run_pipeline(config, metrics, on_document=mostrar)
+            
+            if not processados:
                 print("ℹ️  Nenhum documento processado.")
             else:
-                print(f"\n🎉 {len(documents)} documento(s) processado(s) com sucesso!")
+                print(f"\n🎉 {processados} documento(s) processado(s) com sucesso!")
             
+            print()
+            print(metrics.format_summary())
             return 0
             
         except Exception as exc:
@@ -833,6 +1175,15 @@ def main(argv: list[str] | None = None) -> int:
     elif args.comando == "gerenciar-pacientes":
         return cmd_gerenciar_pacientes(args)
     
+    elif args.comando == "treinar-classificador":
+        return cmd_treinar_classificador(args)
+    
+    elif args.comando == "aplicar-lote":
+        return cmd_aplicar_lote(args)
+    
+    elif args.comando == "servir":
+        return cmd_servir(args)
+    
     else:
         print(f"❌ Comando desconhecido: {args.comando}")
         return 1
@@ -0,0 +1,345 @@
+"""Pool de endpoints LLM com balanceamento de carga e failover.
+
+O pool é configurado com ``--backends`` (arquivo JSON ou JSON inline)::
+
+    [
+      {"api_base": "http://gpu1:11434/v1", "api_key": "ollama", "weight": 2, "max_concurrency": 4,
+       "model": "qwen2.5:14b", "allow_insecure": true},
+      {"api_base": "http://localhost:11434/v1", "api_key": "ollama", "max_concurrency": 2},
+      {"api_base": "https://gateway.exemplo/v1", "api_key_env": "GATEWAY_KEY", "weight": 1}
+    ]
+
+Cada requisição vai para o endpoint saudável com menos requisições em voo
+relativas ao peso (*least outstanding requests*). Se ele falhar, a mesma
+requisição vai na hora para o próximo endpoint (failover), sem esperar o
+backoff das novas tentativas. A saúde vem do circuit
+breaker de cada endpoint (falhas reais) e, opcionalmente, de uma verificação
+periódica em ``GET /models``. Sem ``--backends``, o pool tem um único endpoint
+e o comportamento é o mesmo de antes.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, TypeVar
+
+from .ratelimit import AdaptiveRateLimiter, limiter_for_config, status_code_of
+from .resilience import ABERTO, CircuitOpenError, DeadlineExceeded
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass(slots=True)
+class BackendEndpoint:
+    """Um endpoint compatível com a API OpenAI dentro do pool."""
+
+    api_base: str
+    api_key: str | None = None
+    weight: float = 1.0
+    max_concurrency: int | None = None  # Se None, usa llm_max_concurrency
+    model: str | None = None  # Se None, usa o modelo da configuração
+    ocr_model: str | None = None  # Se None, usa o modelo OCR da configuração
+
+    @property
+    def name(self) -> str:
+        return self.api_base.rstrip("/")
+
+
+def validate_transport(api_base: str) -> None:
+    """Dados médicos só trafegam por HTTPS (ou HTTP local, para Ollama)."""
+    is_localhost = any(host in api_base for host in ["localhost", "127.0.0.1"])
+    if not api_base.startswith("https://") and not is_localhost:
+        raise ValueError(
+            f"Transmissão insegura detectada: API base deve usar HTTPS para proteger dados médicos. "
+            f"URL atual: {api_base}. Configure uma URL HTTPS segura ou use localhost para testes."
+        )
+
+
+def parse_backends(value: str, *, allow_insecure: bool = False) -> List[BackendEndpoint]:
+    """Lê a lista de endpoints de um arquivo JSON ou de JSON inline."""
+    text = value.strip()
+    if not text.startswith("["):
+        text = Path(value).expanduser().read_text(encoding="utf-8")
+    raw = json.loads(text)
+    if not isinstance(raw, list) or not raw:
+        raise ValueError("--backends deve ser uma lista JSON não vazia de endpoints.")
+    endpoints: List[BackendEndpoint] = []
+    for entry in raw:
+        if not isinstance(entry, dict) or "api_base" not in entry:
+            raise ValueError(f"Endpoint inválido em --backends: {entry}")
+        api_key = entry.get("api_key")
+        if api_key is None and entry.get("api_key_env"):
+            api_key = os.environ.get(entry["api_key_env"])
+        endpoint = BackendEndpoint(
+            api_base=entry["api_base"],
+            api_key=api_key,
+            weight=float(entry.get("weight", 1.0)),
+            max_concurrency=entry.get("max_concurrency"),
+            model=entry.get("model"),
+            ocr_model=entry.get("ocr_model"),
+        )
+        if endpoint.weight <= 0:
+            raise ValueError(f"Peso do endpoint {endpoint.name} deve ser positivo.")
+        # HTTP fora de localhost só com opt-in explícito por endpoint (rede interna confiável)
+        if not (allow_insecure or entry.get("allow_insecure")):
+            validate_transport(endpoint.api_base)
+        endpoints.append(endpoint)
+    return endpoints
+
+
+def _openai_client(endpoint: BackendEndpoint, timeout: float) -> Any:
+    try:
+        import httpx  # type: ignore
+        from openai import OpenAI  # type: ignore
+    except ImportError as exc:  # pragma: no cover - depende de pip
+        raise RuntimeError("Pacote 'openai' não está instalado.") from exc
+    # Novas tentativas ficam a cargo do limitador (evita backoff duplicado)
+    return OpenAI(
+        api_key=endpoint.api_key,
+        base_url=endpoint.api_base,
+        timeout=httpx.Timeout(connect=30.0, read=timeout, write=30.0, pool=30.0),
+        max_retries=0,
+    )
+
+
+class _Member:
+    """Estado de um endpoint no pool."""
+
+    __slots__ = ("endpoint", "limiter", "client", "outstanding", "requisicoes", "falhas", "failovers")
+
+    def __init__(self, endpoint: BackendEndpoint, limiter: AdaptiveRateLimiter) -> None:
+        self.endpoint = endpoint
+        self.limiter = limiter
+        self.client: Any = None
+        self.outstanding = 0
+        self.requisicoes = 0
+        self.falhas = 0
+        self.failovers = 0
+
+    @property
+    def max_concurrency(self) -> int:
+        return self.limiter.concurrency.maximum
+
+    @property
+    def healthy(self) -> bool:
+        breaker = self.limiter.breaker
+        return breaker is None or breaker.state != ABERTO
+
+
+class BackendPool:
+    """Distribui requisições entre endpoints por menor carga relativa ao peso."""
+
+    def __init__(
+        self,
+        endpoints: Sequence[BackendEndpoint],
+        limiter_factory: Callable[[BackendEndpoint], AdaptiveRateLimiter],
+        client_factory: Callable[[BackendEndpoint], Any],
+    ) -> None:
+        if not endpoints:
+            raise ValueError("O pool de backends precisa de pelo menos um endpoint.")
+        self._members = [_Member(endpoint, limiter_factory(endpoint)) for endpoint in endpoints]
+        self._client_factory = client_factory
+        self._lock = threading.Lock()
+        self._health_thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    @property
+    def endpoints(self) -> List[BackendEndpoint]:
+        return [member.endpoint for member in self._members]
+
+    def _client(self, member: _Member) -> Any:
+        with self._lock:
+            if member.client is None:
+                member.client = self._client_factory(member.endpoint)
+            return member.client
+
+    def _select(self, tried: set[int]) -> Optional[_Member]:
+        """Endpoint não tentado com menor (em voo + 1) / peso; saudáveis e com vaga primeiro."""
+        with self._lock:
+            candidates = [member for index, member in enumerate(self._members) if index not in tried]
+            if not candidates:
+                return None
+
+            def score(member: _Member) -> tuple:
+                saturated = member.outstanding >= member.max_concurrency
+                return (not member.healthy, saturated, (member.outstanding + 1) / member.endpoint.weight)
+
+            member = min(candidates, key=score)
+            member.outstanding += 1
+            member.requisicoes += 1
+            return member
+
+    def call(
+        self,
+        request: Callable[[Any, BackendEndpoint], T],
+        *,
+        estimated_tokens: float = 0,
+        usage: Callable[[T], Optional[float]] | None = None,
+        description: str = "requisição LLM",
+    ) -> T:
+        """Executa ``request(client, endpoint)`` no melhor endpoint, com failover.
+
+        Com mais de um endpoint, cada um recebe uma única tentativa por rodada:
+        conexão recusada, timeout, 429 ou 5xx passam imediatamente ao próximo
+        endpoint. As novas tentativas (``llm_max_retries`` no total, no mínimo
+        uma por endpoint) se espalham pelo pool, com backoff só entre rodadas.
+        Com um único endpoint, as tentativas ficam a cargo do limitador dele.
+        Se todos os circuitos rejeitarem a rodada, falha na hora, sem backoff.
+        """
+        failover = len(self._members) > 1
+        budget = max(len(self._members), max(member.limiter.max_attempts for member in self._members))
+        tried: set[int] = set()
+        attempts = 0
+        rounds = 0
+        rejected = 0  # Endpoints da rodada atual com o circuito aberto
+        last_error: Exception | None = None
+        while True:
+            member = self._select(tried)
+            if member is None:
+                # Rodada completa sem sucesso: aguardar antes de recomeçar por todos os endpoints
+                assert last_error is not None
+                if not failover or attempts >= budget or rejected == len(self._members):
+                    raise last_error
+                rounds += 1
+                rejected = 0
+                tried.clear()
+                self._members[0].limiter.wait_before_retry(last_error, rounds, description)
+                continue
+            tried.add(self._members.index(member))
+            attempts += 1
+            try:
+                client = self._client(member)
+                return member.limiter.call(
+                    functools.partial(request, client, member.endpoint),
+                    estimated_tokens=estimated_tokens,
+                    usage=usage,
+                    description=description,
+                    max_attempts=1 if failover else None,
+                )
+            except DeadlineExceeded:
+                raise
+            except Exception as exc:
+                status = status_code_of(exc)
+                if status is not None and 400 <= status < 500 and status not in {408, 409, 429}:
+                    raise  # Requisição inválida falharia em qualquer endpoint
+                member.falhas += 1
+                last_error = exc
+                if isinstance(exc, CircuitOpenError):
+                    rejected += 1
+                if failover and attempts >= budget:
+                    raise
+                if len(tried) < len(self._members):
+                    member.failovers += 1
+                    LOGGER.warning(f"🔀 {description} falhou em {member.endpoint.name}: {exc}. Tentando outro endpoint")
+            finally:
+                with self._lock:
+                    member.outstanding -= 1
+
+    def check_health(self, timeout: float = 5.0) -> Dict[str, bool]:
+        """Verificação ativa (``GET /models``); falhas alimentam o circuit breaker."""
+        import urllib.request  # Só com --health-interval; evita o custo no início da CLI
+
+        results: Dict[str, bool] = {}
+        for member in self._members:
+            endpoint = member.endpoint
+            request = urllib.request.Request(f"{endpoint.name}/models")
+            if endpoint.api_key:
+                request.add_header("Authorization", f"Bearer {endpoint.api_key}")
+            try:
+                with urllib.request.urlopen(request, timeout=timeout):
+                    ok = True
+            except Exception as exc:
+                LOGGER.debug("Verificação de saúde de %s falhou: %s", endpoint.name, exc)
+                ok = False
+            breaker = member.limiter.breaker
+            if breaker is not None:
+                breaker.record_success() if ok else breaker.record_failure()
+            results[endpoint.name] = ok
+        return results
+
+    def start_health_checks(self, interval: float) -> None:
+        """Executa :meth:`check_health` periodicamente em uma thread daemon."""
+        if interval <= 0 or self._health_thread is not None:
+            return
+
+        def loop() -> None:
+            while not self._stop.wait(interval):
+                self.check_health()
+
+        self._health_thread = threading.Thread(target=loop, name="clinikondo-health", daemon=True)
+        self._health_thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            member.endpoint.name: {
+                "requisicoes": member.requisicoes,
+                "falhas": member.falhas,
+                "failovers": member.failovers,
+                "em_voo": member.outstanding,
+                "saudavel": member.healthy,
+                "limitador": member.limiter.get_statistics(),
+            }
+            for member in self._members
+        }
+
+
+_POOLS: Dict[tuple, BackendPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def uses_backend_pool(config: Any, api_base: str | None = None) -> bool:
+    """Se as requisições para *api_base* vão para ``config.llm_backends``.
+
+    Um endpoint próprio de uma função (``--ocr-api-base``,
+    ``--classification-api-base``) diferente de ``openai_api_base`` não entra
+    no pool: ele recebe um pool só seu.
+    """
+    return bool(config.llm_backends) and api_base in (None, config.openai_api_base)
+
+
+def pool_for_config(config: Any, api_base: str | None = None, api_key: str | None = None) -> BackendPool:
+    """Pool compartilhado: ``config.llm_backends`` ou um único endpoint (*api_base*).
+
+    Pools são compartilhados por conjunto de endpoints: OCR e classificação com
+    endpoints próprios (ver :func:`uses_backend_pool`) têm pools separados.
+    """
+    compartilhado = uses_backend_pool(config, api_base)
+    if compartilhado:
+        endpoints = list(config.llm_backends)
+    else:
+        endpoints = [BackendEndpoint(api_base=api_base or "https://api.openai.com/v1", api_key=api_key)]
+    key = tuple((endpoint.name, endpoint.api_key) for endpoint in endpoints)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            if config.llm_backends and not compartilhado:
+                LOGGER.info("Endpoint próprio %s: requisições fora do pool de --backends", endpoints[0].name)
+            pool = BackendPool(
+                endpoints,
+                limiter_factory=lambda endpoint: limiter_for_config(
+                    config, endpoint.api_base, max_concurrency=endpoint.max_concurrency
+                ),
+                client_factory=lambda endpoint: _openai_client(endpoint, config.llm_timeout),
+            )
+            if len(endpoints) > 1:
+                pool.start_health_checks(config.llm_health_interval)
+            _POOLS[key] = pool
+        return pool
+
+
+def reset_pools() -> None:
+    with _POOLS_LOCK:
+        for pool in _POOLS.values():
+            pool.stop()
+        _POOLS.clear()
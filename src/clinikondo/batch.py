@@ -0,0 +1,436 @@
+"""Modo lote: classificação assíncrona via endpoint de batch compatível com OpenAI.
+
+Para grandes volumes (backfill de arquivos digitalizados) a latência não importa,
+mas custo e vazão sim. ``processar --modo-lote`` extrai o texto dos documentos,
+grava uma requisição por documento em um arquivo JSONL, envia o arquivo ao
+endpoint ``/batches`` e persiste o estado do job em ``.clinikondo/lotes``.
+``aplicar-lote`` consulta o job e, quando concluído, organiza os documentos com
+os resultados baixados.
+
+O cliente HTTP usa apenas a biblioteca padrão (``urllib``), o que permite testar
+o fluxo contra um servidor local que implemente os endpoints de arquivos/jobs.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import logging
+import shutil
+import time
+import urllib.error
+import urllib.request
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from .config import Config
+from .llm import (
+    DEFAULT_PROMPT,
+    RESPONSE_FORMAT,
+    STRUCTURED_MAX_TOKENS,
+    SYSTEM_PROMPT,
+    BaseExtractor,
+    build_extraction_result,
+    parse_llm_response,
+    split_prompt,
+)
+from .models import Document, DocumentProcessingError, LLMExtractionResult
+from .patients import PatientRegistry
+from .processing import DocumentProcessor
+from .prompting import compact_document_text
+from .types import DocumentTypeCatalog
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_API_BASE = "https://api.openai.com/v1"
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+
+# Status do job no provedor; "aplicado" é registrado localmente após aplicar-lote
+FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+STATUS_APLICADO = "aplicado"
+
+# Campos da configuração necessários para organizar os documentos no aplicar-lote
+_PLACEMENT_FIELDS = (
+    "modelo_llm",
+    "match_nome_paciente_auto",
+    "criar_paciente_sem_match",
+    "mover_para_compartilhado_sem_match",
+    "mover_arquivo_original",
+    "executar_copia_apos_erro",
+    "dry_run",
+    "force_reprocess",
+    "patients_backend",
+)
+
+
+class BatchAPIError(RuntimeError):
+    """Erro retornado pelo endpoint de batch."""
+
+
+class BatchAPIClient:
+    """Cliente mínimo dos endpoints ``/files`` e ``/batches``."""
+
+    def __init__(self, api_key: str, api_base: str | None = None, timeout: float = 60.0) -> None:
+        self._api_key = api_key
+        self._api_base = (api_base or DEFAULT_API_BASE).rstrip("/")
+        self._timeout = timeout
+
+    def _request(
+        self,
+        method: str,
+        path: str,
+        *,
+        body: bytes | None = None,
+        content_type: str | None = None,
+    ) -> bytes:
+        request = urllib.request.Request(f"{self._api_base}{path}", data=body, method=method)
+        request.add_header("Authorization", f"Bearer {self._api_key}")
+        if content_type:
+            request.add_header("Content-Type", content_type)
+        try:
+            with urllib.request.urlopen(request, timeout=self._timeout) as response:
+                return response.read()
+        except urllib.error.HTTPError as exc:
+            detail = exc.read().decode("utf-8", errors="replace")[:500]
+            raise BatchAPIError(f"{method} {path} falhou ({exc.code}): {detail}") from exc
+        except urllib.error.URLError as exc:
+            raise BatchAPIError(f"{method} {path} falhou: {exc.reason}") from exc
+
+    def _json(self, method: str, path: str, payload: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        raw = self._request(method, path, body=body, content_type="application/json" if body else None)
+        return json.loads(raw)
+
+    def upload_file(self, content: bytes, filename: str, purpose: str = "batch") -> str:
+        """Envia o arquivo JSONL de requisições e retorna o ``file_id``."""
+        boundary = f"clinikondo-{uuid.uuid4().hex}"
+        body = b"".join(
+            [
+                f"--{boundary}\r\n".encode(),
+                b'Content-Disposition: form-data; name="purpose"\r\n\r\n',
+                purpose.encode(),
+                f"\r\n--{boundary}\r\n".encode(),
+                f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'.encode(),
+                b"Content-Type: application/jsonl\r\n\r\n",
+                content,
+                f"\r\n--{boundary}--\r\n".encode(),
+            ]
+        )
+        raw = self._request(
+            "POST", "/files", body=body, content_type=f"multipart/form-data; boundary={boundary}"
+        )
+        return json.loads(raw)["id"]
+
+    def create_batch(self, input_file_id: str) -> Dict[str, Any]:
+        return self._json(
+            "POST",
+            "/batches",
+            {
+                "input_file_id": input_file_id,
+                "endpoint": BATCH_ENDPOINT,
+                "completion_window": COMPLETION_WINDOW,
+            },
+        )
+
+    def retrieve_batch(self, batch_id: str) -> Dict[str, Any]:
+        return self._json("GET", f"/batches/{batch_id}")
+
+    def file_content(self, file_id: str) -> bytes:
+        return self._request("GET", f"/files/{file_id}/content")
+
+
+@dataclass
+class BatchJob:
+    """Estado persistido de um job de classificação em lote."""
+
+    id_local: str
+    diretorio: Path
+    status: str = "criado"
+    batch_id: str | None = None
+    input_file_id: str | None = None
+    output_file_id: str | None = None
+    error_file_id: str | None = None
+    criado_em: str = field(default_factory=lambda: datetime.now().isoformat(timespec="seconds"))
+    atualizado_em: str | None = None
+    documentos: int = 0
+    input_dir: str = ""
+    configuracao: Dict[str, Any] = field(default_factory=dict)
+    resumo: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def requests_path(self) -> Path:
+        return self.diretorio / "requisicoes.jsonl"
+
+    @property
+    def documents_path(self) -> Path:
+        return self.diretorio / "documentos.jsonl"
+
+    @property
+    def state_path(self) -> Path:
+        return self.diretorio / "job.json"
+
+    def save(self) -> None:
+        self.atualizado_em = datetime.now().isoformat(timespec="seconds")
+        data = asdict(self)
+        data.pop("diretorio")
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        self.state_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    @classmethod
+    def load(cls, directory: Path) -> BatchJob:
+        data = json.loads((directory / "job.json").read_text(encoding="utf-8"))
+        return cls(diretorio=directory, **data)
+
+
+def jobs_dir(state_dir: Path) -> Path:
+    return state_dir / "lotes"
+
+
+def list_jobs(state_dir: Path) -> List[BatchJob]:
+    """Jobs registrados no diretório de estado, do mais antigo ao mais recente."""
+    base = jobs_dir(state_dir)
+    if not base.exists():
+        return []
+    jobs = [BatchJob.load(path) for path in sorted(base.iterdir()) if (path / "job.json").exists()]
+    return sorted(jobs, key=lambda job: job.criado_em)
+
+
+def pending_hashes(state_dir: Path) -> Set[str]:
+    """Hashes dos documentos em jobs enviados que ainda não foram aplicados.
+
+    Um job que falhou, expirou ou foi cancelado libera seus documentos depois
+    de passar pelo ``aplicar-lote``, que registra as falhas no manifesto.
+    """
+    hashes: Set[str] = set()
+    for job in list_jobs(state_dir):
+        if job.status == STATUS_APLICADO:
+            continue
+        if job.documents_path.exists():
+            hashes.update(entry["hash_sha256"] for entry in _read_jsonl(job.documents_path.read_bytes()))
+    return hashes
+
+
+def build_request_line(
+    custom_id: str, prompt: str, config: Config, system: str = SYSTEM_PROMPT
+) -> Dict[str, Any]:
+    """Monta uma linha do arquivo de entrada (mesmas mensagens do modo síncrono)."""
+    body: Dict[str, Any] = {
+        "model": config.effective_classification_model,
+        "temperature": config.llm_temperature,
+        "max_tokens": config.llm_max_tokens,
+        "messages": [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt},
+        ],
+    }
+    if config.llm_structured_output != "off":
+        body["response_format"] = RESPONSE_FORMAT
+        body["max_tokens"] = min(config.llm_max_tokens, STRUCTURED_MAX_TOKENS)
+    return {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+
+
+def _client_for(config: Config) -> BatchAPIClient:
+    api_key = config.effective_classification_api_key
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY é obrigatória para o modo lote.")
+    return BatchAPIClient(api_key, config.effective_classification_api_base, timeout=config.llm_timeout)
+
+
+def submit_batch_job(
+    config: Config,
+    documents: Iterable[Document],
+    client: BatchAPIClient | None = None,
+) -> BatchJob:
+    """Grava o arquivo de requisições, envia o job e persiste seu estado.
+
+    Os documentos são gravados nos arquivos JSONL à medida que são produzidos,
+    sem manter todos os textos extraídos em memória.
+    """
+    client = client or _client_for(config)
+    template = config.prompt_text() or DEFAULT_PROMPT
+
+    id_local = datetime.now().strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+    job = BatchJob(
+        id_local=id_local,
+        diretorio=jobs_dir(config.state_dir) / id_local,
+        input_dir=str(config.input_dir),
+        configuracao={name: getattr(config, name) for name in _PLACEMENT_FIELDS},
+    )
+    job.diretorio.mkdir(parents=True, exist_ok=True)
+
+    with job.requests_path.open("w", encoding="utf-8") as requests_file, job.documents_path.open(
+        "w", encoding="utf-8"
+    ) as documents_file:
+        for indice, document in enumerate(documents, 1):
+            job.documentos = indice
+            custom_id = f"doc-{indice}"
+            texto = compact_document_text(document.texto_extraido, config.llm_prompt_token_budget)
+            system, prompt = split_prompt(template, "texto", texto)
+            requests_file.write(
+                json.dumps(build_request_line(custom_id, prompt, config, system), ensure_ascii=False) + "\n"
+            )
+            documents_file.write(
+                json.dumps(
+                    {
+                        "custom_id": custom_id,
+                        "caminho_entrada": str(document.caminho_entrada),
+                        "hash_sha256": document.hash_sha256,
+                        "texto_extraido": document.texto_extraido,
+                    },
+                    ensure_ascii=False,
+                )
+                + "\n"
+            )
+    if not job.documentos:
+        shutil.rmtree(job.diretorio)
+        raise ValueError("Nenhum documento pendente para enviar em lote.")
+    job.save()
+
+    job.input_file_id = client.upload_file(job.requests_path.read_bytes(), f"clinikondo-{id_local}.jsonl")
+    job.save()
+    batch = client.create_batch(job.input_file_id)
+    job.batch_id = batch["id"]
+    job.status = batch.get("status", "validating")
+    job.save()
+    LOGGER.info(f"📦 Job em lote {job.batch_id} enviado com {job.documentos} documento(s) (local: {id_local})")
+    return job
+
+
+def refresh_job(job: BatchJob, client: BatchAPIClient) -> BatchJob:
+    """Atualiza o status do job consultando o provedor."""
+    if job.status == STATUS_APLICADO or not job.batch_id:
+        return job
+    batch = client.retrieve_batch(job.batch_id)
+    job.status = batch.get("status", job.status)
+    job.output_file_id = batch.get("output_file_id") or job.output_file_id
+    job.error_file_id = batch.get("error_file_id") or job.error_file_id
+    job.save()
+    return job
+
+
+def wait_for_job(
+    job: BatchJob,
+    client: BatchAPIClient,
+    *,
+    interval: float = 60.0,
+    timeout: float | None = None,
+) -> BatchJob:
+    """Consulta o job periodicamente até atingir um status final."""
+    inicio = time.monotonic()
+    while True:
+        refresh_job(job, client)
+        if job.status in FINAL_STATUSES or job.status == STATUS_APLICADO:
+            return job
+        if timeout is not None and time.monotonic() - inicio >= timeout:
+            return job
+        LOGGER.info(f"⏳ Job {job.batch_id} em '{job.status}', nova consulta em {interval:.0f}s")
+        time.sleep(interval)
+
+
+def _read_jsonl(raw: bytes) -> Iterable[Dict[str, Any]]:
+    for line in raw.decode("utf-8").splitlines():
+        if line.strip():
+            yield json.loads(line)
+
+
+def download_results(job: BatchJob, client: BatchAPIClient) -> Dict[str, LLMExtractionResult | Exception]:
+    """Baixa os arquivos de saída/erro e converte cada linha no resultado do documento."""
+    outcomes: Dict[str, LLMExtractionResult | Exception] = {}
+    if job.error_file_id:
+        for entry in _read_jsonl(client.file_content(job.error_file_id)):
+            erro = entry.get("error") or {}
+            outcomes[entry["custom_id"]] = DocumentProcessingError(
+                f"Requisição em lote falhou: {erro.get('message', erro)}"
+            )
+    if not job.output_file_id:
+        return outcomes
+    for entry in _read_jsonl(client.file_content(job.output_file_id)):
+        custom_id = entry["custom_id"]
+        response = entry.get("response") or {}
+        if entry.get("error") or response.get("status_code", 200) != 200:
+            detalhe = entry.get("error") or response.get("body")
+            outcomes[custom_id] = DocumentProcessingError(f"Requisição em lote falhou: {detalhe}")
+            continue
+        try:
+            content = response["body"]["choices"][0]["message"]["content"]
+            outcomes[custom_id] = build_extraction_result(parse_llm_response(content))
+        except (KeyError, IndexError, TypeError, ValueError, RuntimeError) as exc:
+            outcomes[custom_id] = DocumentProcessingError(f"Resposta inválida no lote: {exc}")
+    return outcomes
+
+
+class _OfflineExtractor(BaseExtractor):
+    """Placeholder do processador no aplicar-lote: a classificação vem do job."""
+
+    def extract(
+        self,
+        document: Document,
+        *,
+        patient_registry: PatientRegistry,
+        type_catalog: DocumentTypeCatalog,
+    ) -> LLMExtractionResult:
+        raise DocumentProcessingError("Documento sem resultado no job em lote.")
+
+
+def _job_config(job: BatchJob, output_dir: Path) -> Config:
+    return Config(input_dir=Path(job.input_dir), output_dir=output_dir, **job.configuracao)
+
+
+def apply_batch_job(
+    job: BatchJob,
+    output_dir: Path,
+    client: BatchAPIClient,
+) -> Tuple[List[Document], int]:
+    """Organiza os documentos de um job concluído; retorna (organizados, falhas)."""
+    if job.status not in FINAL_STATUSES:
+        raise RuntimeError(f"Job {job.batch_id} ainda não foi concluído (status: {job.status}).")
+    config = _job_config(job, output_dir)
+    outcomes = download_results(job, client)
+    processor = DocumentProcessor(
+        config=config,
+        extractor=_OfflineExtractor(),
+        patient_registry=PatientRegistry(config.patients_storage_path),
+        type_catalog=DocumentTypeCatalog(),
+    )
+
+    items: List[Tuple[Document, LLMExtractionResult | Exception]] = []
+    for entry in _read_jsonl(job.documents_path.read_bytes()):
+        document = Document(
+            caminho_entrada=Path(entry["caminho_entrada"]),
+            texto_extraido=entry["texto_extraido"],
+            hash_sha256=entry["hash_sha256"],
+        )
+        outcome = outcomes.get(entry["custom_id"])
+        if outcome is None:
+            outcome = DocumentProcessingError("Documento ausente no resultado do job em lote.")
+        elif not document.caminho_entrada.exists():
+            outcome = DocumentProcessingError(f"Arquivo não encontrado: {document.caminho_entrada}")
+        items.append((document, outcome))
+
+    placed = processor.place_extracted(items)
+    falhas = len(items) - len(placed)
+    job.resumo = {"organizados": len(placed), "falhas": falhas}
+    job.status = STATUS_APLICADO
+    job.save()
+    LOGGER.info(f"📦 Job {job.batch_id} aplicado: {len(placed)} organizado(s), {falhas} falha(s)")
+    return placed, falhas
+
+
+def submit_pipeline_batch(config: Config) -> BatchJob | None:
+    """Executa o ``processar --modo-lote``: extrai textos e envia o job."""
+    config.state_dir.mkdir(parents=True, exist_ok=True)
+    processor = DocumentProcessor(
+        config=config,
+        extractor=_OfflineExtractor(),
+        patient_registry=PatientRegistry(config.patients_storage_path),
+        type_catalog=DocumentTypeCatalog(),
+    )
+    documents = processor.prepare_all(skip_hashes=pending_hashes(config.state_dir))
+    first = next(documents, None)
+    if first is None:
+        return None
+    return submit_batch_job(config, itertools.chain([first], documents))
@@ -0,0 +1,182 @@
+"""Cascata de modelos: modelo pequeno primeiro, modelo maior só quando necessário."""
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from .heuristics import require_all_results
+from .llm import BaseExtractor
+from .models import Document, LLMExtractionResult
+from .patients import PatientRegistry
+from .resilience import DeadlineExceeded
+from .types import DocumentTypeCatalog
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_CASCADE_THRESHOLD = 0.95
+
+RAPIDO = "rapido"
+ESCALONADO = "escalonado"
+
+
+class _TierStats:
+    """Contadores de um nível da cascata."""
+
+    __slots__ = ("documentos", "aceitos", "invalidos", "baixa_confianca", "tempo_total")
+
+    def __init__(self) -> None:
+        self.documentos = 0
+        self.aceitos = 0
+        self.invalidos = 0
+        self.baixa_confianca = 0
+        self.tempo_total = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "documentos": self.documentos,
+            "aceitos": self.aceitos,
+            "invalidos": self.invalidos,
+            "baixa_confianca": self.baixa_confianca,
+            "taxa_aceitos": round(self.aceitos / self.documentos, 3) if self.documentos else 0.0,
+            "latencia_media_ms": int(self.tempo_total * 1000 / self.documentos) if self.documentos else 0,
+        }
+
+
+class CascadeExtractor(BaseExtractor):
+    """Classifica com o modelo rápido e escala para o maior abaixo do limiar.
+
+    O documento sobe de nível quando a resposta do modelo rápido é inválida
+    (JSON malformado ou reprovado em ``validate_llm_response``) ou quando a
+    confiança calculada fica abaixo de *threshold*.
+    """
+
+    def __init__(
+        self,
+        rapido: BaseExtractor,
+        escalonado: BaseExtractor,
+        *,
+        threshold: float = DEFAULT_CASCADE_THRESHOLD,
+    ) -> None:
+        self._rapido = rapido
+        self._escalonado = escalonado
+        self._threshold = threshold
+        self._stats = {RAPIDO: _TierStats(), ESCALONADO: _TierStats()}
+
+    def _accept(self, document: Document, result: LLMExtractionResult) -> bool:
+        confianca = float(result.extras.get("confianca_extracao", 0.0))
+        if confianca >= self._threshold:
+            self._stats[RAPIDO].aceitos += 1
+            result.extras["cascata"] = RAPIDO
+            return True
+        self._stats[RAPIDO].baixa_confianca += 1
+        LOGGER.info(
+            "🪜 Confiança %.2f abaixo de %.2f para %s: consultando o modelo maior",
+            confianca,
+            self._threshold,
+            document.nome_arquivo_original,
+        )
+        return False
+
+    def _escalate(
+        self,
+        documents: Sequence[Document],
+        patient_registry: PatientRegistry,
+        type_catalog: DocumentTypeCatalog,
+    ) -> List[LLMExtractionResult]:
+        stats = self._stats[ESCALONADO]
+        stats.documentos += len(documents)
+        start = time.perf_counter()
+        try:
+            if len(documents) == 1:
+                results = [
+                    self._escalonado.extract(
+                        documents[0], patient_registry=patient_registry, type_catalog=type_catalog
+                    )
+                ]
+            else:
+                results = self._escalonado.extract_batch(
+                    documents, patient_registry=patient_registry, type_catalog=type_catalog
+                )
+        finally:
+            stats.tempo_total += time.perf_counter() - start
+        stats.aceitos += len(results)
+        for result in results:
+            result.extras["cascata"] = ESCALONADO
+        return results
+
+    def extract(
+        self,
+        document: Document,
+        *,
+        patient_registry: PatientRegistry,
+        type_catalog: DocumentTypeCatalog,
+    ) -> LLMExtractionResult:
+        stats = self._stats[RAPIDO]
+        stats.documentos += 1
+        start = time.perf_counter()
+        try:
+            result = self._rapido.extract(
+                document, patient_registry=patient_registry, type_catalog=type_catalog
+            )
+        except DeadlineExceeded:
+            raise
+        except Exception as exc:
+            stats.invalidos += 1
+            LOGGER.info("🪜 Modelo rápido falhou para %s (%s): consultando o modelo maior", document.nome_arquivo_original, exc)
+            result = None
+        finally:
+            stats.tempo_total += time.perf_counter() - start
+        if result is not None and self._accept(document, result):
+            return result
+        return self._escalate([document], patient_registry, type_catalog)[0]
+
+    def extract_batch(
+        self,
+        documents: Sequence[Document],
+        *,
+        patient_registry: PatientRegistry,
+        type_catalog: DocumentTypeCatalog,
+    ) -> List[LLMExtractionResult]:
+        stats = self._stats[RAPIDO]
+        stats.documentos += len(documents)
+        start = time.perf_counter()
+        try:
+            rapidos: List[Optional[LLMExtractionResult]] = list(
+                self._rapido.extract_batch(documents, patient_registry=patient_registry, type_catalog=type_catalog)
+            )
+        except DeadlineExceeded:
+            raise
+        except Exception as exc:
+            stats.invalidos += len(documents)
+            LOGGER.info("🪜 Modelo rápido falhou para o lote (%s): consultando o modelo maior", exc)
+            rapidos = [None] * len(documents)
+        finally:
+            stats.tempo_total += time.perf_counter() - start
+
+        pending = [
+            indice
+            for indice, result in enumerate(rapidos)
+            if result is None or not self._accept(documents[indice], result)
+        ]
+        if pending:
+            escalados = self._escalate([documents[indice] for indice in pending], patient_registry, type_catalog)
+            for indice, result in zip(pending, escalados, strict=True):
+                rapidos[indice] = result
+        return require_all_results(rapidos)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        rapido = self._stats[RAPIDO]
+        stats: Dict[str, Any] = {
+            "limiar_confianca": self._threshold,
+            "niveis": {nivel: tier.as_dict() for nivel, tier in self._stats.items()},
+            "taxa_escalonamento": (
+                round(self._stats[ESCALONADO].documentos / rapido.documentos, 3) if rapido.documentos else 0.0
+            ),
+        }
+        for nivel, extractor in ((RAPIDO, self._rapido), (ESCALONADO, self._escalonado)):
+            extractor_stats = extractor.get_statistics()
+            if extractor_stats:
+                stats[f"extrator_{nivel}"] = extractor_stats
+        return stats
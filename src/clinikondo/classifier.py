@@ -0,0 +1,375 @@
+"""Classificador local (CPU, NumPy) treinado com as classificações anteriores do LLM."""
+
+from __future__ import annotations
+
+import json
+import logging
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .heuristics import require_all_results
+from .llm import BaseExtractor
+from .models import Document, LLMExtractionResult
+from .patients import PatientRegistry
+from .types import DocumentTypeCatalog
+from .utils import first_date_from_text, sanitize_token
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_N_FEATURES = 2**16
+DEFAULT_CLASSIFIER_THRESHOLD = 0.9
+MIN_TRAINING_EXAMPLES = 20
+MAX_EXAMPLE_CHARS = 4000
+NO_SPECIALTY = "__nenhuma__"
+
+
+def _numpy() -> Any:
+    try:
+        import numpy as np  # type: ignore
+    except ImportError as exc:  # pragma: no cover - depende de pip
+        raise RuntimeError("Pacote 'numpy' não está instalado.") from exc
+    return np
+
+
+def hashed_features(text: str, n_features: int = DEFAULT_N_FEATURES) -> Tuple[Any, Any]:
+    """Converte o texto em índices/contagens de unigramas e bigramas com hashing."""
+    np = _numpy()
+    words = sanitize_token(text[:MAX_EXAMPLE_CHARS], separator=" ").split()
+    grams = words + [f"{a} {b}" for a, b in zip(words[:-1], words[1:], strict=True)]
+    if not grams:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+    hashed = np.fromiter(
+        (zlib.crc32(gram.encode("utf-8")) % n_features for gram in grams),
+        dtype=np.int64,
+        count=len(grams),
+    )
+    indices, counts = np.unique(hashed, return_counts=True)
+    return indices, counts.astype(np.float64)
+
+
+class HashedNaiveBayes:
+    """Naive Bayes multinomial sobre features com hashing, treinável incrementalmente."""
+
+    def __init__(self, n_features: int = DEFAULT_N_FEATURES, alpha: float = 1.0) -> None:
+        np = _numpy()
+        self.n_features = n_features
+        self.alpha = alpha
+        self.labels: List[str] = []
+        self.feature_counts = np.zeros((0, n_features), dtype=np.float32)
+        self.class_counts = np.zeros(0, dtype=np.float64)
+
+    def _label_index(self, label: str) -> int:
+        np = _numpy()
+        if label not in self.labels:
+            self.labels.append(label)
+            self.feature_counts = np.vstack(
+                [self.feature_counts, np.zeros((1, self.n_features), dtype=np.float32)]
+            )
+            self.class_counts = np.append(self.class_counts, 0.0)
+        return self.labels.index(label)
+
+    def partial_fit(self, features: Iterable[Tuple[Any, Any]], labels: Iterable[str]) -> None:
+        for (indices, counts), label in zip(features, labels, strict=True):
+            row = self._label_index(label)
+            self.feature_counts[row, indices] += counts
+            self.class_counts[row] += 1
+
+    def predict(self, features: Tuple[Any, Any]) -> Tuple[Optional[str], float]:
+        """Retorna o rótulo mais provável e sua probabilidade a posteriori."""
+        np = _numpy()
+        if not self.labels:
+            return None, 0.0
+        indices, counts = features
+        log_prior = np.log(self.class_counts / self.class_counts.sum())
+        totals = self.feature_counts.sum(axis=1, dtype=np.float64) + self.alpha * self.n_features
+        selected = self.feature_counts[:, indices].astype(np.float64) + self.alpha
+        log_likelihood = (np.log(selected) - np.log(totals)[:, None]) @ counts
+        scores = log_prior + log_likelihood
+        scores -= scores.max()
+        probabilities = np.exp(scores)
+        probabilities /= probabilities.sum()
+        best = int(probabilities.argmax())
+        return self.labels[best], float(probabilities[best])
+
+    @property
+    def n_examples(self) -> int:
+        return int(self.class_counts.sum())
+
+
+@dataclass(slots=True)
+class LocalPrediction:
+    tipo_documento: Optional[str]
+    confianca_tipo: float
+    especialidade: Optional[str]
+    confianca_especialidade: float
+
+
+class LocalClassifier:
+    """Par de modelos (tipo de documento e especialidade) persistido em ``.npz``."""
+
+    def __init__(self, n_features: int = DEFAULT_N_FEATURES) -> None:
+        self.n_features = n_features
+        self.tipo = HashedNaiveBayes(n_features)
+        self.especialidade = HashedNaiveBayes(n_features)
+        self.exemplos_processados = 0  # linhas já consumidas do arquivo de exemplos
+
+    @property
+    def n_examples(self) -> int:
+        return self.tipo.n_examples
+
+    def partial_fit(self, examples: Iterable[Dict[str, Any]]) -> int:
+        features, tipos, especialidades = [], [], []
+        for example in examples:
+            if not example.get("tipo_documento"):
+                continue
+            features.append(hashed_features(example.get("texto", ""), self.n_features))
+            tipos.append(example["tipo_documento"])
+            especialidades.append(example.get("especialidade") or NO_SPECIALTY)
+        self.tipo.partial_fit(features, tipos)
+        self.especialidade.partial_fit(features, especialidades)
+        return len(features)
+
+    def predict(self, text: str) -> LocalPrediction:
+        features = hashed_features(text, self.n_features)
+        tipo, confianca_tipo = self.tipo.predict(features)
+        especialidade, confianca_especialidade = self.especialidade.predict(features)
+        if especialidade == NO_SPECIALTY:
+            especialidade = None
+        return LocalPrediction(tipo, confianca_tipo, especialidade, confianca_especialidade)
+
+    def save(self, path: Path) -> None:
+        np = _numpy()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        metadata = {
+            "n_features": self.n_features,
+            "exemplos_processados": self.exemplos_processados,
+            "labels_tipo": self.tipo.labels,
+            "labels_especialidade": self.especialidade.labels,
+        }
+        with path.open("wb") as handle:
+            np.savez_compressed(
+                handle,
+                metadata=np.array(json.dumps(metadata)),
+                tipo_features=self.tipo.feature_counts,
+                tipo_classes=self.tipo.class_counts,
+                especialidade_features=self.especialidade.feature_counts,
+                especialidade_classes=self.especialidade.class_counts,
+            )
+
+    @classmethod
+    def load(cls, path: Path) -> LocalClassifier:
+        np = _numpy()
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data["metadata"]))
+            classifier = cls(metadata["n_features"])
+            classifier.exemplos_processados = metadata["exemplos_processados"]
+            classifier.tipo.labels = metadata["labels_tipo"]
+            classifier.tipo.feature_counts = data["tipo_features"]
+            classifier.tipo.class_counts = data["tipo_classes"]
+            classifier.especialidade.labels = metadata["labels_especialidade"]
+            classifier.especialidade.feature_counts = data["especialidade_features"]
+            classifier.especialidade.class_counts = data["especialidade_classes"]
+        return classifier
+
+
+def append_training_example(path: Path, document: Document) -> None:
+    """Registra a classificação de um documento como exemplo de treino."""
+    if not document.texto_extraido.strip() or not document.tipo_documento:
+        return
+    example = {
+        "hash_sha256": document.hash_sha256,
+        "texto": document.texto_extraido[:MAX_EXAMPLE_CHARS],
+        "tipo_documento": document.tipo_documento,
+        "especialidade": document.especialidade,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as handle:
+        handle.write(json.dumps(example, ensure_ascii=False) + "\n")
+
+
+def train_classifier(examples_path: Path, model_path: Path, *, full: bool = False) -> Dict[str, int]:
+    """Treina (ou continua treinando) o classificador com os exemplos registrados.
+
+    Sem *full*, apenas as linhas ainda não consumidas do arquivo de exemplos são
+    usadas, atualizando as contagens do modelo salvo.
+    """
+    classifier = (
+        LocalClassifier.load(model_path)
+        if model_path.exists() and not full
+        else LocalClassifier()
+    )
+    novos: List[Dict[str, Any]] = []
+    linhas = 0
+    if examples_path.exists():
+        with examples_path.open("r", encoding="utf-8") as handle:
+            for linhas, line in enumerate(handle, 1):
+                if linhas <= classifier.exemplos_processados or not line.strip():
+                    continue
+                try:
+                    novos.append(json.loads(line))
+                except json.JSONDecodeError:
+                    LOGGER.warning("Exemplo de treino inválido na linha %d de %s", linhas, examples_path)
+    adicionados = classifier.partial_fit(novos)
+    classifier.exemplos_processados = max(linhas, classifier.exemplos_processados)
+    classifier.save(model_path)
+    return {
+        "exemplos_novos": adicionados,
+        "exemplos_total": classifier.n_examples,
+        "tipos": len(classifier.tipo.labels),
+        "especialidades": len(classifier.especialidade.labels),
+    }
+
+
+class LocalClassifierExtractor(BaseExtractor):
+    """Responde localmente os campos previstos com confiança e consulta o LLM para o resto.
+
+    Tipo e especialidade vêm do :class:`LocalClassifier`; paciente e data vêm do
+    cadastro (``match_in_text``) e de :func:`first_date_from_text`. Quando todos os
+    campos obrigatórios são respondidos localmente o LLM não é chamado; caso
+    contrário o resultado do LLM é usado, mantendo os campos previstos com confiança.
+    """
+
+    def __init__(
+        self,
+        fallback: BaseExtractor,
+        classifier: LocalClassifier,
+        *,
+        threshold: float = DEFAULT_CLASSIFIER_THRESHOLD,
+    ) -> None:
+        self._fallback = fallback
+        self._classifier = classifier
+        self._threshold = threshold
+        self._documentos = 0
+        self._locais = 0
+        self._campos_locais = {"tipo_documento": 0, "especialidade": 0}
+
+    @classmethod
+    def from_path(
+        cls, fallback: BaseExtractor, model_path: Path, *, threshold: float = DEFAULT_CLASSIFIER_THRESHOLD
+    ) -> BaseExtractor:
+        """Envolve *fallback* com o classificador salvo, se houver exemplos suficientes."""
+        if not model_path.exists():
+            LOGGER.warning("Classificador local não encontrado em %s; use 'treinar-classificador'", model_path)
+            return fallback
+        classifier = LocalClassifier.load(model_path)
+        if classifier.n_examples < MIN_TRAINING_EXAMPLES:
+            LOGGER.warning(
+                "Classificador local com apenas %d exemplo(s) (mínimo %d); usando somente o LLM",
+                classifier.n_examples,
+                MIN_TRAINING_EXAMPLES,
+            )
+            return fallback
+        return cls(fallback, classifier, threshold=threshold)
+
+    def _predict_local(
+        self,
+        document: Document,
+        patient_registry: PatientRegistry,
+        type_catalog: DocumentTypeCatalog,
+    ) -> Tuple[Optional[LLMExtractionResult], LocalPrediction, Optional[str], bool]:
+        """Prevê os campos localmente; o resultado só vem preenchido se dispensar o LLM."""
+        self._documentos += 1
+        text = document.texto_extraido or ""
+        prediction = self._classifier.predict(text)
+        tipo = prediction.tipo_documento if prediction.confianca_tipo >= self._threshold else None
+        especialidade_confiante = prediction.confianca_especialidade >= self._threshold
+        if tipo:
+            self._campos_locais["tipo_documento"] += 1
+        if especialidade_confiante:
+            self._campos_locais["especialidade"] += 1
+
+        patient = patient_registry.match_in_text(text) if text else None
+        data_documento = first_date_from_text(text)
+
+        if not (tipo and especialidade_confiante and patient and data_documento):
+            return None, prediction, tipo, especialidade_confiante
+
+        self._locais += 1
+        result = LLMExtractionResult(
+            nome_paciente=patient.nome_completo,
+            data_documento=data_documento,
+            tipo_documento=type_catalog.resolve(tipo).nome_tipo,
+            especialidade=prediction.especialidade,
+        )
+        result.extras["confianca_extracao"] = round(
+            min(prediction.confianca_tipo, prediction.confianca_especialidade), 3
+        )
+        result.extras["extrator"] = "classificador_local"
+        LOGGER.info(
+            "🧠 Classificador local respondeu %s (tipo=%s %.2f), LLM não consultado",
+            document.nome_arquivo_original,
+            tipo,
+            prediction.confianca_tipo,
+        )
+        return result, prediction, tipo, especialidade_confiante
+
+    @staticmethod
+    def _merge(
+        result: LLMExtractionResult,
+        prediction: LocalPrediction,
+        tipo: Optional[str],
+        especialidade_confiante: bool,
+        type_catalog: DocumentTypeCatalog,
+    ) -> LLMExtractionResult:
+        if tipo:
+            result.tipo_documento = type_catalog.resolve(tipo).nome_tipo
+        if especialidade_confiante:
+            result.especialidade = prediction.especialidade
+        if tipo or especialidade_confiante:
+            # Não reaproveitar como exemplo de treino um resultado com campos do próprio modelo
+            result.extras["extrator"] = "llm+classificador_local"
+        return result
+
+    def extract(
+        self,
+        document: Document,
+        *,
+        patient_registry: PatientRegistry,
+        type_catalog: DocumentTypeCatalog,
+    ) -> LLMExtractionResult:
+        local, prediction, tipo, especialidade_confiante = self._predict_local(
+            document, patient_registry, type_catalog
+        )
+        if local is not None:
+            return local
+        result = self._fallback.extract(
+            document, patient_registry=patient_registry, type_catalog=type_catalog
+        )
+        return self._merge(result, prediction, tipo, especialidade_confiante, type_catalog)
+
+    def extract_batch(
+        self,
+        documents: Sequence[Document],
+        *,
+        patient_registry: PatientRegistry,
+        type_catalog: DocumentTypeCatalog,
+    ) -> List[LLMExtractionResult]:
+        predictions = [self._predict_local(document, patient_registry, type_catalog) for document in documents]
+        pending = [indice for indice, (local, *_rest) in enumerate(predictions) if local is None]
+        results: List[Optional[LLMExtractionResult]] = [local for local, *_rest in predictions]
+        if pending:
+            delegated = self._fallback.extract_batch(
+                [documents[indice] for indice in pending],
+                patient_registry=patient_registry,
+                type_catalog=type_catalog,
+            )
+            for indice, result in zip(pending, delegated, strict=True):
+                _local, prediction, tipo, especialidade_confiante = predictions[indice]
+                results[indice] = self._merge(result, prediction, tipo, especialidade_confiante, type_catalog)
+        return require_all_results(results)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "documentos": self._documentos,
+            "respondidos_localmente": self._locais,
+            "llm_consultadas": self._documentos - self._locais,
+            "campos_locais": dict(self._campos_locais),
+            "limiar_confianca": self._threshold,
+            "exemplos_treino": self._classifier.n_examples,
+        }
+        fallback_stats = self._fallback.get_statistics()
+        if fallback_stats:
+            stats["fallback"] = fallback_stats
+        return stats
@@ -5,8 +5,12 @@ from __future__ import annotations
 import argparse
 import logging
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import TYPE_CHECKING, List
+
+if TYPE_CHECKING:
+    from .backends import BackendEndpoint
 
 DEFAULT_MODEL = "gpt-4"
 DEFAULT_PROMPT_FILENAME = "prompt_base.txt"
@@ -46,6 +50,13 @@ def _bool_from_env(value: str | None, default: bool) -> bool:
     return value.strip().lower() in {"1", "true", "yes", "sim"}
 
 
+def _list_from_env(value: str | None) -> List[str]:
+    """Lista separada por vírgulas (ex.: ``CLINIKONDO_EXCLUDE="rascunhos/*,*.tmp.pdf"``)."""
+    if not value:
+        return []
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
 @dataclass(slots=True)
 class Config:
     """Configuração carregada via CLI e variáveis de ambiente."""
@@ -77,6 +88,47 @@ class Config:
     classification_model: str | None = None  # Se None, usa modelo_llm
     classification_api_key: str | None = None  # Se None, usa openai_api_key
     classification_api_base: str | None = None  # Se None, usa openai_api_base
+    patients_backend: str = "json"  # json, sqlite
+    heuristic_fast_path: bool = False  # Classificação por regras antes do LLM
+    heuristic_confidence_threshold: float = 0.85  # Confiança mínima para dispensar o LLM
+    local_classifier: bool = False  # Classificador local treinado com resultados anteriores do LLM
+    local_classifier_threshold: float = 0.9  # Probabilidade mínima para responder um campo localmente
+    collect_training_examples: bool = False  # Grava texto + classificação do LLM para treinar-classificador
+    llm_batch_size: int = 1  # Documentos por requisição ao LLM (1 = sem agrupamento)
+    llm_batch_max_chars: int = 6000  # Documentos maiores que isso são enviados individualmente
+    modo_lote: bool = False  # Envia a classificação como job assíncrono (aplicar-lote organiza depois)
+    llm_requests_per_minute: float = 0  # Limite de requisições/min por endpoint (0 = sem limite)
+    llm_tokens_per_minute: float = 0  # Limite de tokens/min por endpoint (0 = sem limite)
+    llm_max_concurrency: int = 8  # Teto do controle adaptativo (AIMD) de requisições simultâneas
+    llm_backoff_max: float = 120.0  # Espera máxima entre tentativas (backoff exponencial com jitter)
+    circuit_failure_threshold: int = 5  # Falhas consecutivas que abrem o circuito de um endpoint
+    circuit_reset_timeout: float = 60.0  # Segundos com o circuito aberto antes de uma sonda
+    document_timeout: float = 0  # Prazo total (OCR + LLM) por documento em segundos (0 = sem prazo)
+    llm_backends: List[BackendEndpoint] = field(default_factory=list)  # Pool de endpoints (vazio = openai_api_base)
+    llm_health_interval: float = 30.0  # Intervalo da verificação de saúde do pool (0 = só passiva)
+    llm_hedge: bool = False  # Dispara uma cópia da classificação que passar do p95 observado
+    llm_hedge_max_rate: float = 0.05  # Fração máxima de requisições com cópia por execução
+    llm_cascade: bool = False  # Classifica com classification_model e escala para escalation_model
+    escalation_model: str | None = None  # Modelo maior da cascata; se None, usa modelo_llm
+    cascade_confidence_threshold: float = 0.95  # Confiança mínima para aceitar o modelo rápido
+    llm_structured_output: str = "auto"  # auto, json_schema, off (response_format com o schema de resposta)
+    llm_stream: bool = True  # Lê a resposta em streaming e encerra assim que o JSON fecha
+    llm_prompt_token_budget: int = 3000  # Tokens (estimados) do texto do documento no prompt (0 = sem limite)
+    llm_provider: str = "openai"  # openai (API compatível) ou ollama (API nativa /api/chat)
+    ollama_keep_alive: str = "30m"  # Tempo que o Ollama mantém o modelo carregado entre requisições
+    llm_warmup: bool = True  # Carrega os modelos do Ollama no início da execução
+    input_recursive: bool = True  # Varre as subpastas da entrada
+    input_include: List[str] = field(default_factory=list)  # Globs aceitos (vazio = todos os formatos suportados)
+    input_exclude: List[str] = field(default_factory=list)  # Globs ignorados (arquivos e pastas)
+    watch: bool = False  # Processo contínuo: organiza os arquivos novos assim que chegam
+    watch_backend: str = "auto"  # auto (inotify com fallback), inotify ou polling
+    watch_interval: float = 5.0  # Segundos entre varreduras no backend polling
+    watch_settle_seconds: float = 2.0  # Segundos sem mudar de tamanho/mtime antes de processar
+    service_host: str = "127.0.0.1"  # Endereço da API do modo servir
+    service_port: int = 8765  # Porta da API do modo servir
+    service_socket: Path | None = None  # Socket Unix da API (substitui host/porta)
+    service_queue_size: int = 100  # Documentos aguardando na fila do servir (cheia = HTTP 503)
+    service_max_upload_mb: float = 50.0  # Tamanho máximo de um arquivo enviado ao servir
 
     def validar(self) -> None:
         if not self.input_dir.exists():
@@ -97,12 +149,64 @@ class Config:
             raise ValueError("llm_retry_delay não pode ser negativo.")
         if self.llm_max_retries < 1:
             raise ValueError("llm_max_retries deve ser pelo menos 1.")
+        if self.llm_requests_per_minute < 0 or self.llm_tokens_per_minute < 0:
+            raise ValueError("Limites de requisições/tokens por minuto não podem ser negativos.")
+        if self.llm_max_concurrency < 1:
+            raise ValueError("llm_max_concurrency deve ser pelo menos 1.")
+        if self.llm_backoff_max < 0:
+            raise ValueError("llm_backoff_max não pode ser negativo.")
+        if self.circuit_failure_threshold < 1:
+            raise ValueError("circuit_failure_threshold deve ser pelo menos 1.")
+        if self.circuit_reset_timeout < 0 or self.document_timeout < 0:
+            raise ValueError("circuit_reset_timeout e document_timeout não podem ser negativos.")
+        if self.llm_health_interval < 0:
+            raise ValueError("llm_health_interval não pode ser negativo.")
+        if not 0 <= self.llm_hedge_max_rate <= 1:
+            raise ValueError("llm_hedge_max_rate deve estar entre 0 e 1.")
+        if not 0 <= self.cascade_confidence_threshold <= 1:
+            raise ValueError("cascade_confidence_threshold deve estar entre 0 e 1.")
+        if self.llm_prompt_token_budget < 0:
+            raise ValueError("llm_prompt_token_budget não pode ser negativo.")
+        if self.llm_structured_output not in {"auto", "json_schema", "off"}:
+            raise ValueError(
+                f"llm_structured_output inválido: {self.llm_structured_output}. Use: auto, json_schema ou off"
+            )
+        if self.llm_cascade and self.effective_classification_model == self.effective_escalation_model:
+            raise ValueError(
+                "Cascata requer modelos diferentes: defina --classification-model (rápido) "
+                "distinto de --escalation-model/--model (maior)."
+            )
         # Validação obrigatória: sistema requer LLM
-        if not self.openai_api_key:
+        if self.llm_provider not in {"openai", "ollama"}:
+            raise ValueError(f"llm_provider inválido: {self.llm_provider}. Use: openai ou ollama")
+        if self.llm_provider == "ollama" and (self.llm_backends or self.llm_hedge):
+            # O extrator nativo usa um único OllamaClient: sem pool, failover ou cópias da requisição
+            raise ValueError("--backends e --hedge não são suportados com --provider ollama.")
+        if not self.openai_api_key and self.llm_provider != "ollama":
             raise ValueError("OPENAI_API_KEY é obrigatória. Sistema utiliza exclusivamente LLM para processamento.")
         # Validar estratégia OCR
         if self.ocr_strategy not in {"hybrid", "multimodal", "traditional"}:
             raise ValueError(f"ocr_strategy inválida: {self.ocr_strategy}. Use: hybrid, multimodal ou traditional")
+        if not 0 <= self.heuristic_confidence_threshold <= 1:
+            raise ValueError("heuristic_confidence_threshold deve estar entre 0 e 1.")
+        if not 0 <= self.local_classifier_threshold <= 1:
+            raise ValueError("local_classifier_threshold deve estar entre 0 e 1.")
+        if self.llm_batch_size < 1:
+            raise ValueError("llm_batch_size deve ser pelo menos 1.")
+        if self.llm_batch_max_chars <= 0:
+            raise ValueError("llm_batch_max_chars deve ser positivo.")
+        if self.patients_backend not in {"json", "sqlite"}:
+            raise ValueError(f"patients_backend inválido: {self.patients_backend}. Use: json ou sqlite")
+        if self.watch_backend not in {"auto", "inotify", "polling"}:
+            raise ValueError(f"watch_backend inválido: {self.watch_backend}. Use: auto, inotify ou polling")
+        if self.watch_interval <= 0 or self.watch_settle_seconds < 0:
+            raise ValueError("watch_interval deve ser positivo e watch_settle_seconds não pode ser negativo.")
+        if self.watch and self.modo_lote:
+            raise ValueError("--watch não pode ser combinado com --modo-lote.")
+        if not 0 < self.service_port < 65536:
+            raise ValueError("service_port deve estar entre 1 e 65535.")
+        if self.service_queue_size < 1 or self.service_max_upload_mb <= 0:
+            raise ValueError("service_queue_size e service_max_upload_mb devem ser positivos.")
 
     @property
     def state_dir(self) -> Path:
@@ -110,12 +214,34 @@ class Config:
 
     @property
     def patients_storage_path(self) -> Path:
+        if self.patients_backend == "sqlite":
+            return self.state_dir / "patients.db"
         return self.state_dir / "patients.json"
     
     @property
     def processed_hashes_path(self) -> Path:
         """Caminho para arquivo de hashes processados."""
         return self.state_dir / "processed_hashes.json"
+
+    @property
+    def training_examples_path(self) -> Path:
+        """Exemplos (texto → tipo/especialidade) classificados pelo LLM."""
+        return self.state_dir / "exemplos_classificacao.jsonl"
+
+    @property
+    def metrics_dir(self) -> Path:
+        """Resumos de execução (``execucao-<inicio>.json``) gravados pelo ``processar``."""
+        return self.state_dir / "metricas"
+
+    @property
+    def manifests_dir(self) -> Path:
+        """Manifestos JSONL (uma linha por documento) de cada execução do ``processar``."""
+        return self.state_dir / "manifestos"
+
+    @property
+    def classifier_model_path(self) -> Path:
+        """Modelo do classificador local treinado com ``treinar-classificador``."""
+        return self.state_dir / "classificador.npz"
     
     # Propriedades com fallback para multi-model (SRS v2.0)
     @property
@@ -147,6 +273,11 @@ class Config:
     def effective_classification_api_base(self) -> str | None:
         """API base efetiva para classificação (fallback para openai_api_base)."""
         return self.classification_api_base or self.openai_api_base
+    
+    @property
+    def effective_escalation_model(self) -> str:
+        """Modelo maior da cascata (fallback para modelo_llm)."""
+        return self.escalation_model or self.modelo_llm
 
     def prompt_text(self) -> str | None:
         if not self.prompt_template_path:
@@ -265,6 +396,219 @@ def load_config_from_args(args: argparse.Namespace) -> Config:
         if hasattr(args, 'classification_api_base') and args.classification_api_base
         else env.get("CLINIKONDO_CLASSIFICATION_API_BASE")
     )
+    patients_backend = (
+        args.patients_backend
+        if hasattr(args, 'patients_backend') and args.patients_backend
+        else env.get("CLINIKONDO_PATIENTS_BACKEND", "json")
+    )
+    heuristic_fast_path = (
+        args.fast_path
+        if getattr(args, 'fast_path', None) is not None
+        else _bool_from_env(env.get("CLINIKONDO_FAST_PATH"), False)
+    )
+    heuristic_confidence_threshold = (
+        args.fast_path_threshold
+        if getattr(args, 'fast_path_threshold', None) is not None
+        else float(env.get("CLINIKONDO_FAST_PATH_THRESHOLD", 0.85))
+    )
+    local_classifier = (
+        args.local_classifier
+        if getattr(args, 'local_classifier', None) is not None
+        else _bool_from_env(env.get("CLINIKONDO_LOCAL_CLASSIFIER"), False)
+    )
+    local_classifier_threshold = (
+        args.local_classifier_threshold
+        if getattr(args, 'local_classifier_threshold', None) is not None
+        else float(env.get("CLINIKONDO_LOCAL_CLASSIFIER_THRESHOLD", 0.9))
+    )
+    collect_training_examples = (
+        args.collect_training_examples
+        if getattr(args, 'collect_training_examples', None) is not None
+        else _bool_from_env(env.get("CLINIKONDO_COLLECT_TRAINING_EXAMPLES"), False)
+    )
+    llm_batch_size = (
+        args.batch_size
+        if getattr(args, 'batch_size', None) is not None
+        else int(env.get("CLINIKONDO_BATCH_SIZE", 1))
+    )
+    llm_batch_max_chars = (
+        args.batch_max_chars
+        if getattr(args, 'batch_max_chars', None) is not None
+        else int(env.get("CLINIKONDO_BATCH_MAX_CHARS", 6000))
+    )
+    modo_lote = (
+        args.modo_lote
+        if getattr(args, 'modo_lote', None) is not None
+        else _bool_from_env(env.get("CLINIKONDO_MODO_LOTE"), False)
+    )
+    llm_requests_per_minute = (
+        args.rpm
+        if getattr(args, 'rpm', None) is not None
+        else float(env.get("CLINIKONDO_RPM", 0))
+    )
+    llm_tokens_per_minute = (
+        args.tpm
+        if getattr(args, 'tpm', None) is not None
+        else float(env.get("CLINIKONDO_TPM", 0))
+    )
+    llm_max_concurrency = (
+        args.max_concurrency
+        if getattr(args, 'max_concurrency', None) is not None
+        else int(env.get("CLINIKONDO_MAX_CONCURRENCY", 8))
+    )
+    llm_backoff_max = (
+        args.backoff_max
+        if getattr(args, 'backoff_max', None) is not None
+        else float(env.get("CLINIKONDO_BACKOFF_MAX", 120))
+    )
+    circuit_failure_threshold = (
+        args.circuit_failures
+        if getattr(args, 'circuit_failures', None) is not None
+        else int(env.get("CLINIKONDO_CIRCUIT_FAILURES", 5))
+    )
+    circuit_reset_timeout = (
+        args.circuit_reset
+        if getattr(args, 'circuit_reset', None) is not None
+        else float(env.get("CLINIKONDO_CIRCUIT_RESET", 60))
+    )
+    document_timeout = (
+        args.document_timeout
+        if getattr(args, 'document_timeout', None) is not None
+        else float(env.get("CLINIKONDO_DOCUMENT_TIMEOUT", 0))
+    )
+    backends_spec = (
+        args.backends
+        if getattr(args, 'backends', None) is not None
+        else env.get("CLINIKONDO_BACKENDS")
+    )
+    llm_backends: List[BackendEndpoint] = []
+    if backends_spec:
+        from .backends import parse_backends
+
+        llm_backends = parse_backends(backends_spec)
+    llm_health_interval = (
+        args.health_interval
+        if getattr(args, 'health_interval', None) is not None
+        else float(env.get("CLINIKONDO_HEALTH_INTERVAL", 30))
+    )
+    llm_hedge = (
+        args.hedge
+        if getattr(args, 'hedge', None) is not None
+        else _bool_from_env(env.get("CLINIKONDO_HEDGE"), False)
+    )
+    llm_hedge_max_rate = (
+        args.hedge_max_rate
+        if getattr(args, 'hedge_max_rate', None) is not None
+        else float(env.get("CLINIKONDO_HEDGE_MAX_RATE", 0.05))
+    )
+    llm_cascade = (
+        args.cascade
+        if getattr(args, 'cascade', None) is not None
+        else _bool_from_env(env.get("CLINIKONDO_CASCADE"), False)
+    )
+    escalation_model = (
+        args.escalation_model
+        if hasattr(args, 'escalation_model') and args.escalation_model
+        else env.get("CLINIKONDO_ESCALATION_MODEL")
+    )
+    cascade_confidence_threshold = (
+        args.cascade_threshold
+        if getattr(args, 'cascade_threshold', None) is not None
+        else float(env.get("CLINIKONDO_CASCADE_THRESHOLD", 0.95))
+    )
+    llm_structured_output = (
+        args.structured_output
+        if hasattr(args, 'structured_output') and args.structured_output
+        else env.get("CLINIKONDO_STRUCTURED_OUTPUT", "auto")
+    )
+    llm_provider = (
+        args.provider
+        if hasattr(args, 'provider') and args.provider
+        else env.get("CLINIKONDO_PROVIDER", "openai")
+    )
+    llm_stream = (
+        args.stream
+        if getattr(args, 'stream', None) is not None
+        else _bool_from_env(env.get("CLINIKONDO_STREAM"), llm_provider != "ollama")
+    )
+    if llm_stream and llm_provider == "ollama":
+        raise ValueError("--stream não é suportado com --provider ollama (a API nativa responde de uma vez).")
+    llm_prompt_token_budget = (
+        args.prompt_budget
+        if getattr(args, 'prompt_budget', None) is not None
+        else int(env.get("CLINIKONDO_PROMPT_BUDGET", 3000))
+    )
+    ollama_keep_alive = (
+        args.keep_alive
+        if hasattr(args, 'keep_alive') and args.keep_alive
+        else env.get("CLINIKONDO_KEEP_ALIVE", "30m")
+    )
+    llm_warmup = (
+        args.warmup
+        if getattr(args, 'warmup', None) is not None
+        else _bool_from_env(env.get("CLINIKONDO_WARMUP"), True)
+    )
+    input_recursive = (
+        args.recursive
+        if getattr(args, 'recursive', None) is not None
+        else _bool_from_env(env.get("CLINIKONDO_RECURSIVE"), True)
+    )
+    input_include = (
+        args.include
+        if hasattr(args, 'include') and args.include
+        else _list_from_env(env.get("CLINIKONDO_INCLUDE"))
+    )
+    input_exclude = (
+        args.exclude
+        if hasattr(args, 'exclude') and args.exclude
+        else _list_from_env(env.get("CLINIKONDO_EXCLUDE"))
+    )
+    watch = (
+        args.watch
+        if getattr(args, 'watch', None) is not None
+        else _bool_from_env(env.get("CLINIKONDO_WATCH"), False)
+    )
+    watch_backend = (
+        args.watch_backend
+        if hasattr(args, 'watch_backend') and args.watch_backend
+        else env.get("CLINIKONDO_WATCH_BACKEND", "auto")
+    )
+    watch_interval = (
+        args.watch_interval
+        if getattr(args, 'watch_interval', None) is not None
+        else float(env.get("CLINIKONDO_WATCH_INTERVAL", 5))
+    )
+    watch_settle_seconds = (
+        args.watch_settle
+        if getattr(args, 'watch_settle', None) is not None
+        else float(env.get("CLINIKONDO_WATCH_SETTLE", 2))
+    )
+    service_host = (
+        args.host
+        if hasattr(args, 'host') and args.host
+        else env.get("CLINIKONDO_HOST", "127.0.0.1")
+    )
+    service_port = (
+        args.port
+        if getattr(args, 'port', None) is not None
+        else int(env.get("CLINIKONDO_PORT", 8765))
+    )
+    service_socket_value = (
+        args.socket
+        if hasattr(args, 'socket') and args.socket
+        else env.get("CLINIKONDO_SOCKET")
+    )
+    service_socket = Path(service_socket_value).expanduser() if service_socket_value else None
+    service_queue_size = (
+        args.queue_size
+        if getattr(args, 'queue_size', None) is not None
+        else int(env.get("CLINIKONDO_QUEUE_SIZE", 100))
+    )
+    service_max_upload_mb = (
+        args.max_upload_mb
+        if getattr(args, 'max_upload_mb', None) is not None
+        else float(env.get("CLINIKONDO_MAX_UPLOAD_MB", 50))
+    )
 
     config = Config(
         input_dir=input_dir,
@@ -293,6 +637,47 @@ def load_config_from_args(args: argparse.Namespace) -> Config:
         classification_model=classification_model,
         classification_api_key=classification_api_key,
         classification_api_base=classification_api_base,
+        patients_backend=patients_backend,
+        heuristic_fast_path=heuristic_fast_path,
+        heuristic_confidence_threshold=heuristic_confidence_threshold,
+        local_classifier=local_classifier,
+        local_classifier_threshold=local_classifier_threshold,
+        collect_training_examples=collect_training_examples,
+        llm_batch_size=llm_batch_size,
+        llm_batch_max_chars=llm_batch_max_chars,
+        modo_lote=modo_lote,
+        llm_requests_per_minute=llm_requests_per_minute,
+        llm_tokens_per_minute=llm_tokens_per_minute,
+        llm_max_concurrency=llm_max_concurrency,
+        llm_backoff_max=llm_backoff_max,
+        circuit_failure_threshold=circuit_failure_threshold,
+        circuit_reset_timeout=circuit_reset_timeout,
+        document_timeout=document_timeout,
+        llm_backends=llm_backends,
+        llm_health_interval=llm_health_interval,
+        llm_hedge=llm_hedge,
+        llm_hedge_max_rate=llm_hedge_max_rate,
+        llm_cascade=llm_cascade,
+        escalation_model=escalation_model,
+        cascade_confidence_threshold=cascade_confidence_threshold,
+        llm_structured_output=llm_structured_output,
+        llm_stream=llm_stream,
+        llm_prompt_token_budget=llm_prompt_token_budget,
+        llm_provider=llm_provider,
+        ollama_keep_alive=ollama_keep_alive,
+        llm_warmup=llm_warmup,
+        input_recursive=input_recursive,
+        input_include=input_include,
+        input_exclude=input_exclude,
+        watch=watch,
+        watch_backend=watch_backend,
+        watch_interval=watch_interval,
+        watch_settle_seconds=watch_settle_seconds,
+        service_host=service_host,
+        service_port=service_port,
+        service_socket=service_socket,
+        service_queue_size=service_queue_size,
+        service_max_upload_mb=service_max_upload_mb,
     )
     config.validar()
     return config
@@ -0,0 +1,201 @@
+"""Descoberta incremental dos documentos da pasta de entrada.
+
+A varredura usa :func:`os.scandir` recursivamente (subpastas por clínica, por
+exemplo) e entrega cada arquivo assim que ele é encontrado, junto com o
+``stat`` do :class:`os.DirEntry` — reaproveitado na validação e no cache de
+hashes, sem um novo ``stat`` por arquivo. Com :func:`prefetch`, a varredura
+continua em uma thread enquanto o primeiro documento já está sendo processado:
+uma entrada com centenas de milhares de arquivos em um compartilhamento de
+rede começa a produzir resultados imediatamente.
+
+A ordem é a do sistema de arquivos (não há ordenação, que exigiria listar a
+pasta inteira antes de começar).
+
+Padrões ``--include``/``--exclude`` são globs (:mod:`fnmatch`) comparados com
+o caminho relativo à entrada (``clinica_a/2024/laudo.pdf``) e com o nome do
+arquivo; ``--exclude`` também poda pastas inteiras. Pastas ocultas
+(``.clinikondo``, ``.git``...) são sempre ignoradas.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Collection, Iterator, List, NamedTuple, Sequence, TypeVar
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+SUPPORTED_EXTENSIONS = {".pdf", ".png", ".jpg", ".jpeg", ".tif", ".tiff", ".heic", ".txt"}
+
+# Arquivos descobertos à frente do processamento (limita a memória da varredura)
+PREFETCH_SIZE = 1024
+
+
+class DiscoveredFile(NamedTuple):
+    """Arquivo encontrado na varredura, com o ``stat`` já obtido pelo ``DirEntry``."""
+
+    path: Path
+    stat: os.stat_result
+
+
+def _matches(relative: str, name: str, patterns: Sequence[str]) -> bool:
+    return any(fnmatch(relative, pattern) or fnmatch(name, pattern) for pattern in patterns)
+
+
+def _accepts_file(
+    relative: str, name: str, extensions: Collection[str], include: Sequence[str], exclude: Sequence[str]
+) -> bool:
+    if os.path.splitext(name)[1].lower() not in extensions:
+        return False
+    if include and not _matches(relative, name, include):
+        return False
+    return not (exclude and _matches(relative, name, exclude))
+
+
+def accepts_dir(
+    root: Path,
+    directory: Path,
+    *,
+    exclude: Sequence[str] = (),
+    recursive: bool = True,
+    skip_dirs: Collection[Path] = (),
+    **_options: object,
+) -> bool:
+    """Indica se :func:`scan_documents` entraria em *directory* (a própria entrada sempre)."""
+    try:
+        parts = directory.relative_to(root).parts
+    except ValueError:
+        return False
+    if not parts:
+        return True
+    if not recursive or any(part.startswith(".") for part in parts):
+        return False
+    for depth in range(1, len(parts) + 1):
+        if _matches("/".join(parts[:depth]), parts[depth - 1], exclude):
+            return False
+    real = os.path.realpath(directory)
+    return not any(
+        real == skipped or real.startswith(skipped + os.sep)
+        for skipped in (os.path.realpath(path) for path in skip_dirs)
+    )
+
+
+def accepts_path(
+    root: Path,
+    path: Path,
+    *,
+    extensions: Collection[str],
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+    recursive: bool = True,
+    skip_dirs: Collection[Path] = (),
+) -> bool:
+    """Aplica a *path* (ex.: um evento do modo ``--watch``) as mesmas regras de :func:`scan_documents`."""
+    if path.name.startswith(".") or not accepts_dir(
+        root, path.parent, exclude=exclude, recursive=recursive, skip_dirs=skip_dirs
+    ):
+        return False
+    relative = path.relative_to(root).as_posix()
+    return _accepts_file(relative, path.name, extensions, include, exclude)
+
+
+def scan_documents(
+    root: Path,
+    *,
+    extensions: Collection[str],
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+    recursive: bool = True,
+    skip_dirs: Collection[Path] = (),
+) -> Iterator[DiscoveredFile]:
+    """Percorre *root* com ``os.scandir`` e entrega os arquivos aceitos à medida que aparecem.
+
+    *skip_dirs* são podadas da varredura (ex.: a pasta de saída dentro da entrada).
+    """
+    pending: List[str] = [os.fspath(root)]
+    skipped = {os.path.realpath(directory) for directory in skip_dirs}
+    root_prefix = len(os.fspath(root).rstrip(os.sep)) + 1
+    while pending:
+        directory = pending.pop()
+        try:
+            iterator = os.scandir(directory)
+        except OSError as exc:
+            LOGGER.warning("Não foi possível listar %s: %s", directory, exc)
+            continue
+        subdirs: List[str] = []
+        with iterator:
+            for entry in iterator:
+                if entry.name.startswith("."):
+                    continue
+                relative = entry.path[root_prefix:].replace(os.sep, "/")
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if (
+                            recursive
+                            and not _matches(relative, entry.name, exclude)
+                            and os.path.realpath(entry.path) not in skipped
+                        ):
+                            subdirs.append(entry.path)
+                        continue
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                if not _accepts_file(relative, entry.name, extensions, include, exclude):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError as exc:
+                    LOGGER.debug("stat falhou para %s: %s", entry.path, exc)
+                    continue
+                yield DiscoveredFile(Path(entry.path), stat)
+        # Subpastas em ordem de descoberta (a pilha inverte, então empilha ao contrário)
+        pending.extend(reversed(subdirs))
+
+
+def prefetch(iterable: Iterator[T], maxsize: int = PREFETCH_SIZE) -> Iterator[T]:
+    """Consome *iterable* em uma thread, até *maxsize* itens à frente de quem lê.
+
+    Se o consumidor parar antes do fim, a thread é encerrada na próxima entrega.
+    """
+    buffer: queue.Queue[tuple] = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item: tuple) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for value in iterable:
+                if not put(("item", value)):
+                    return
+        except BaseException as exc:  # Repassado ao consumidor
+            put(("erro", exc))
+            return
+        put(("fim", None))
+
+    thread = threading.Thread(target=produce, name="clinikondo-scan", daemon=True)
+    thread.start()
+    try:
+        while True:
+            kind, value = buffer.get()
+            if kind == "item":
+                yield value
+            elif kind == "erro":
+                raise value
+            else:
+                return
+    finally:
+        stop.set()
@@ -5,13 +5,20 @@ from __future__ import annotations
 import hashlib
 import json
 import logging
+import os
+import threading
 from dataclasses import dataclass, asdict
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Any, Callable, Collection, Dict, Optional
 
 logger = logging.getLogger(__name__)
 
+# Leituras grandes: em arquivos de vários MB, blocos de 4 KB custam mais em syscalls que em SHA-256
+HASH_BLOCK_SIZE = 1024 * 1024
+# Bloco lido do início e do fim do arquivo no hash parcial
+PARTIAL_BLOCK_SIZE = 64 * 1024
+
 
 @dataclass
 class ProcessedFileRecord:
@@ -27,14 +34,21 @@ class ProcessedFileRecord:
 class HashTracker:
     """Gerencia rastreamento de hashes de arquivos processados."""
     
-    def __init__(self, storage_path: Path):
+    def __init__(self, storage_path: Path, cache_path: Optional[Path] = None):
         """Inicializa o rastreador de hashes.
         
         Args:
             storage_path: Caminho para arquivo JSON de armazenamento
+            cache_path: Cache de hashes por caminho e metadados do arquivo (padrão: ``hash_cache.json``
+                ao lado de *storage_path*)
         """
         self.storage_path = storage_path
+        self.cache_path = cache_path or storage_path.with_name("hash_cache.json")
         self._records: Dict[str, ProcessedFileRecord] = {}
+        self._records_dirty = True  # A primeira gravação cria/normaliza o arquivo
+        self._cache: Optional[Dict[str, Dict[str, Any]]] = None  # Carregado no primeiro uso
+        self._cache_dirty = False
+        self._cache_lock = threading.Lock()
         self._load()
     
     def _load(self) -> None:
@@ -57,7 +71,10 @@ class HashTracker:
             self._records = {}
     
     def save(self) -> None:
-        """Salva registros no arquivo de armazenamento."""
+        """Salva registros no arquivo de armazenamento, se mudaram (e o cache de hashes, se mudou)."""
+        self.save_cache()
+        if not self._records_dirty:
+            return
         try:
             self.storage_path.parent.mkdir(parents=True, exist_ok=True)
             with open(self.storage_path, 'w', encoding='utf-8') as f:
@@ -66,11 +83,13 @@ class HashTracker:
                     for hash_val, record in self._records.items()
                 }
                 json.dump(data, f, indent=2, ensure_ascii=False)
+            self._records_dirty = False
             logger.debug(f"Salvos {len(self._records)} hashes processados")
         except Exception as e:
             logger.error(f"Erro ao salvar hashes processados: {e}")
     
-    def calculate_hash(self, file_path: Path) -> str:
+    @staticmethod
+    def calculate_hash(file_path: Path) -> str:
         """Calcula hash SHA-256 de um arquivo.
         
         Args:
@@ -82,13 +101,127 @@ class HashTracker:
         sha256_hash = hashlib.sha256()
         try:
             with open(file_path, "rb") as f:
-                for byte_block in iter(lambda: f.read(4096), b""):
+                for byte_block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
                     sha256_hash.update(byte_block)
             return sha256_hash.hexdigest()
         except Exception as e:
             logger.error(f"Erro ao calcular hash de {file_path}: {e}")
             raise
     
+    @staticmethod
+    def calculate_partial_hash(file_path: Path, size: int) -> str:
+        """Hash SHA-256 do tamanho, do primeiro e do último bloco do arquivo.
+        
+        Barato (duas leituras por arquivo) e suficiente para separar a maioria dos
+        arquivos de mesmo tamanho; iguais aqui ainda precisam do hash completo.
+        Arquivos de até dois blocos são lidos inteiros.
+        """
+        sha256_hash = hashlib.sha256(str(size).encode("ascii"))
+        with open(file_path, "rb") as f:
+            sha256_hash.update(f.read(PARTIAL_BLOCK_SIZE))
+            if size > 2 * PARTIAL_BLOCK_SIZE:
+                f.seek(-PARTIAL_BLOCK_SIZE, os.SEEK_END)
+            sha256_hash.update(f.read(PARTIAL_BLOCK_SIZE))
+        return sha256_hash.hexdigest()
+    
+    @staticmethod
+    def calculate_hash_bytes(content: bytes | memoryview) -> str:
+        """Calcula hash SHA-256 de um conteúdo em memória (sem cópia do buffer)."""
+        return hashlib.sha256(content).hexdigest()
+    
+    def _load_cache(self) -> Dict[str, Dict[str, Any]]:
+        """Carrega o cache de hashes (uma vez); arquivo ausente ou corrompido vira cache vazio."""
+        with self._cache_lock:
+            if self._cache is None:
+                self._cache = {}
+                if self.cache_path.exists():
+                    try:
+                        with open(self.cache_path, encoding='utf-8') as f:
+                            self._cache = json.load(f)
+                        logger.debug(f"Carregados {len(self._cache)} hashes em cache")
+                    except Exception as e:
+                        logger.warning(f"Erro ao carregar cache de hashes: {e}. Iniciando com cache vazio.")
+            return self._cache
+    
+    @staticmethod
+    def _signature(stat: os.stat_result) -> Dict[str, int]:
+        # ctime muda também com os.utime: cópias que preservam o mtime (cp -p, rsync -t,
+        # restauração de backup) não reaproveitam o hash do conteúdo anterior
+        return {
+            "tamanho": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "ctime_ns": stat.st_ctime_ns,
+            "inode": stat.st_ino,
+        }
+    
+    def _cached(
+        self, file_path: Path, stat: Optional[os.stat_result], field: str, compute: Callable[[], str]
+    ) -> str:
+        """Valor *field* do cache se o arquivo não mudou (tamanho, mtime, ctime e inode); senão calcula e guarda."""
+        cache = self._load_cache()
+        if stat is None:
+            stat = file_path.stat()
+        key = str(file_path)
+        signature = self._signature(stat)
+        with self._cache_lock:
+            entry = cache.get(key)
+            if entry is not None and all(entry.get(name) == value for name, value in signature.items()):
+                if field in entry:
+                    return entry[field]
+            else:
+                entry = None
+        value = compute()  # Fora do lock: as leituras das outras threads seguem em paralelo
+        with self._cache_lock:
+            if entry is None:
+                entry = dict(signature)
+                cache[key] = entry
+            entry[field] = value
+            self._cache_dirty = True
+        return value
+    
+    def cached_hash(self, file_path: Path, stat: Optional[os.stat_result] = None) -> str:
+        """Hash SHA-256 completo, reaproveitado do cache enquanto o arquivo não mudar.
+        
+        Seguro para chamar de várias threads.
+        """
+        return self._cached(file_path, stat, "sha256", lambda: self.calculate_hash(file_path))
+    
+    def cached_partial_hash(self, file_path: Path, stat: Optional[os.stat_result] = None) -> str:
+        """Hash parcial (ver :meth:`calculate_partial_hash`) com o mesmo cache de :meth:`cached_hash`."""
+        if stat is None:
+            stat = file_path.stat()
+        return self._cached(
+            file_path, stat, "parcial", lambda: self.calculate_partial_hash(file_path, stat.st_size)
+        )
+    
+    def prune_cache(self, root: Path, seen: Collection[str]) -> None:
+        """Remove do cache os arquivos sob *root* que não estão em *seen* (apagados ou movidos).
+
+        As chaves do cache são caminhos absolutos; *seen* deve usar a mesma forma.
+        """
+        cache = self._load_cache()
+        prefix = str(root.resolve()).rstrip(os.sep) + os.sep
+        with self._cache_lock:
+            stale = [key for key in cache if key.startswith(prefix) and key not in seen]
+            for key in stale:
+                del cache[key]
+            if stale:
+                self._cache_dirty = True
+    
+    def save_cache(self) -> None:
+        """Salva o cache de hashes, se algo mudou desde a carga."""
+        with self._cache_lock:
+            if not self._cache_dirty or self._cache is None:
+                return
+            try:
+                self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.cache_path, 'w', encoding='utf-8') as f:
+                    json.dump(self._cache, f, ensure_ascii=False, separators=(",", ":"))
+                self._cache_dirty = False
+                logger.debug(f"Salvos {len(self._cache)} hashes em cache")
+            except Exception as e:
+                logger.error(f"Erro ao salvar cache de hashes: {e}")
+    
     def is_processed(self, file_hash: str) -> bool:
         """Verifica se arquivo com este hash já foi processado.
         
@@ -137,6 +270,7 @@ class HashTracker:
             tipo_documento=tipo_documento
         )
         self._records[file_hash] = record
+        self._records_dirty = True
         logger.debug(f"Registrado hash {file_hash[:12]}... para {arquivo_original}")
     
     def log_duplicate_detection(
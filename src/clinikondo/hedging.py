@@ -0,0 +1,169 @@
+"""Requisições com *hedging* para controlar a cauda de latência.
+
+Quando uma classificação demora mais que o p95 observado, uma cópia da mesma
+requisição é disparada (o pool tende a enviá-la a outro endpoint, pois o
+primeiro já tem uma requisição em voo). A primeira resposta válida vence; a
+outra é cancelada se ainda estiver na fila ou descartada ao terminar — o
+cliente HTTP síncrono não permite abortar uma requisição já enviada.
+
+O número de cópias é limitado a uma fração das requisições da execução
+(``llm_hedge_max_rate``), o que mantém o custo extra previsível.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, List, Optional, TypeVar
+
+from .resilience import DeadlineExceeded, remaining_time
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """Janela deslizante das latências recentes (segundos) de requisições bem-sucedidas."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20) -> None:
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, quantile: float) -> Optional[float]:
+        """Percentil observado; ``None`` enquanto houver poucas amostras."""
+        with self._lock:
+            if len(self._samples) < self._min_samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(quantile * len(ordered)))
+        return ordered[index]
+
+
+class HedgeBudget:
+    """Limita as cópias a uma fração das requisições principais da execução."""
+
+    def __init__(self, max_rate: float) -> None:
+        self._max_rate = max_rate
+        self._requests = 0
+        self._hedges = 0
+        self._lock = threading.Lock()
+
+    def record_request(self) -> None:
+        with self._lock:
+            self._requests += 1
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._hedges + 1 > self._max_rate * self._requests:
+                return False
+            self._hedges += 1
+            return True
+
+    @property
+    def requests(self) -> int:
+        return self._requests
+
+    @property
+    def hedges(self) -> int:
+        return self._hedges
+
+
+class Hedger:
+    """Executa uma requisição com cópia disparada após o p95 observado."""
+
+    def __init__(
+        self,
+        *,
+        max_rate: float = 0.05,
+        quantile: float = 0.95,
+        max_workers: int = 8,
+        tracker: LatencyTracker | None = None,
+    ) -> None:
+        self._tracker = tracker or LatencyTracker()
+        self._budget = HedgeBudget(max_rate)
+        self._quantile = quantile
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="clinikondo-hedge")
+        self._lock = threading.Lock()
+        self.vitorias_copia = 0
+        self.negadas_por_limite = 0
+
+    def _submit(self, attempt: Callable[[], T]) -> Future[T]:
+        ctx = contextvars.copy_context()  # preserva o prazo do documento na thread
+
+        def timed() -> T:
+            start = time.perf_counter()
+            value = attempt()
+            self._tracker.record(time.perf_counter() - start)
+            return value
+
+        return self._executor.submit(ctx.run, timed)
+
+    def call(self, attempt: Callable[[], T], validate: Callable[[T], Any] | None = None) -> T:
+        """Retorna o primeiro resultado de *attempt* aceito por *validate*.
+
+        *validate* levanta exceção para respostas inválidas (ex.: JSON
+        malformado); nesse caso a outra tentativa, se houver, ainda pode vencer.
+        """
+        self._budget.record_request()
+        threshold = self._tracker.percentile(self._quantile)
+        remaining = remaining_time()
+        if threshold is not None and remaining is not None and remaining <= threshold:
+            threshold = None  # sem tempo para uma cópia fazer diferença
+
+        pending: List[Future] = [self._submit(attempt)]
+        primary = pending[0]
+        hedged = False
+        last_error: BaseException | None = None
+        try:
+            while pending:
+                timeout = threshold if not hedged and threshold is not None else remaining_time()
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    if not hedged and threshold is not None:
+                        hedged = True
+                        if self._budget.try_acquire():
+                            LOGGER.info("⏱️ Requisição acima do p95 (%.1fs): disparando cópia", threshold)
+                            pending.append(self._submit(attempt))
+                        else:
+                            with self._lock:
+                                self.negadas_por_limite += 1
+                        continue
+                    raise DeadlineExceeded("Prazo do documento excedido aguardando resposta do LLM")
+                for future in done:
+                    pending.remove(future)
+                    try:
+                        value = future.result()
+                        if validate is not None:
+                            validate(value)
+                    except Exception as exc:
+                        last_error = exc
+                        continue
+                    if future is not primary:
+                        with self._lock:
+                            self.vitorias_copia += 1
+                    return value
+            assert last_error is not None
+            raise last_error
+        finally:
+            for future in pending:
+                future.cancel()  # só tem efeito se ainda não começou; o resultado é descartado
+
+    def get_statistics(self) -> Dict[str, Any]:
+        p95 = self._tracker.percentile(self._quantile)
+        return {
+            "requisicoes": self._budget.requests,
+            "copias": self._budget.hedges,
+            "vitorias_copia": self.vitorias_copia,
+            "negadas_por_limite": self.negadas_por_limite,
+            "p95_ms": int(p95 * 1000) if p95 is not None else None,
+        }
@@ -0,0 +1,232 @@
+"""Extração por regras para documentos que dispensam a chamada ao LLM."""
+
+from __future__ import annotations
+
+import logging
+import re
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .llm import BaseExtractor
+from .models import Document, LLMExtractionResult
+from .patients import PatientRegistry
+from .types import DocumentTypeCatalog
+from .utils import first_date_from_text, sanitize_token
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_FAST_PATH_THRESHOLD = 0.85
+
+# Linhas do tipo "Paciente: Nome" comuns em laudos e resultados de laboratório
+_PATIENT_LABEL = re.compile(
+    r"^[ \t]*(?:paciente|nome(?: do paciente)?|cliente)[ \t]*[:\-][ \t]*(?P<nome>[^\n]+)$",
+    re.IGNORECASE | re.MULTILINE,
+)
+_NAME_STOP = re.compile(r"\s{2,}|\t|\s[-|]\s|\b(?:data|idade|sexo|nasc|rg|cpf|convenio|convênio)\b", re.IGNORECASE)
+_NAME_WORD = re.compile(r"^[A-Za-zÀ-ÖØ-öø-ÿ'.]+$")
+
+# Termos (já normalizados) que indicam cada especialidade válida
+_SPECIALTY_TERMS: Dict[str, Tuple[str, ...]] = {
+    "radiologia": ("radiolog", "raio x", "tomografia", "ressonancia", "ultrassom", "ultrassonografia", "mamografia"),
+    "laboratorial": ("laboratori", "hemograma", "glicemia", "colesterol", "creatinina", "urina", "sorologia"),
+    "cardiologia": ("cardiolog", "eletrocardiograma", "ecocardiograma", "holter", "mapa"),
+    "endocrinologia": ("endocrino", "tireoide", "tsh", "insulina", "diabetes"),
+    "ginecologia": ("ginecolog", "papanicolau", "colposcopia", "obstetr"),
+    "dermatologia": ("dermatolog",),
+    "pediatria": ("pediatr", "puericultura"),
+    "oftalmologia": ("oftalmolog", "acuidade visual", "fundo de olho"),
+    "otorrinolaringologia": ("otorrino", "audiometria", "nasofibroscopia"),
+    "infectologia": ("infectolog", "hiv", "hepatite"),
+    "clinica_geral": ("clinica geral", "clinico geral", "medicina de familia"),
+}
+_SPECIALTY_PATTERNS = {
+    especialidade: re.compile(r"\b(?:" + "|".join(re.escape(term) for term in termos) + r")")
+    for especialidade, termos in _SPECIALTY_TERMS.items()
+}
+
+
+def _name_from_label(text: str) -> str | None:
+    """Extrai o nome de uma linha rotulada ("Paciente: ...")."""
+    for match in _PATIENT_LABEL.finditer(text[:5000]):
+        candidate = _NAME_STOP.split(match.group("nome"), maxsplit=1)[0].strip(" .,;:")
+        words = candidate.split()
+        if 2 <= len(words) <= 8 and all(_NAME_WORD.match(word) for word in words):
+            return candidate
+    return None
+
+
+def _guess_specialty(text_clean: str) -> str | None:
+    best: Tuple[int, str | None] = (0, None)
+    for especialidade, pattern in _SPECIALTY_PATTERNS.items():
+        hits = len(pattern.findall(text_clean))
+        if hits > best[0]:
+            best = (hits, especialidade)
+    return best[1]
+
+
+def require_all_results(results: Sequence[Optional[LLMExtractionResult]]) -> List[LLMExtractionResult]:
+    """Garante que o extrator de fallback respondeu por todos os documentos pendentes."""
+    if any(result is None for result in results):
+        raise RuntimeError("O extrator de fallback retornou menos resultados que documentos.")
+    return [result for result in results if result is not None]
+
+
+class HeuristicExtractor(BaseExtractor):
+    """Extrai metadados com regras locais e estima a confiança do resultado.
+
+    Usa :func:`first_date_from_text`, :meth:`DocumentTypeCatalog.score_text` e
+    :meth:`PatientRegistry.match_in_text`. A confiança (0.0-1.0) fica em
+    ``extras["confianca_extracao"]``.
+    """
+
+    def extract(
+        self,
+        document: Document,
+        *,
+        patient_registry: PatientRegistry,
+        type_catalog: DocumentTypeCatalog,
+    ) -> LLMExtractionResult:
+        text = document.texto_extraido or ""
+        confianca = 0.0
+
+        data_documento = first_date_from_text(text)
+        if data_documento:
+            confianca += 0.25
+
+        nome_paciente = None
+        patient = patient_registry.match_in_text(text) if text else None
+        if patient:
+            nome_paciente = patient.nome_completo
+            confianca += 0.35
+        else:
+            nome_paciente = _name_from_label(text)
+            if nome_paciente:
+                confianca += 0.15
+
+        tipo_documento = None
+        scores = type_catalog.score_text(text) if text else {}
+        if scores:
+            ranking = sorted(scores.values(), reverse=True)
+            melhor = ranking[0]
+            segundo = ranking[1] if len(ranking) > 1 else 0.0
+            tipo_documento = max(scores, key=lambda nome: scores[nome])
+            margem = (melhor - segundo) / melhor
+            confianca += 0.3 if melhor >= 2 and margem >= 0.5 else 0.15 * margem
+
+        especialidade = _guess_specialty(sanitize_token(text, separator=" ")) if text else None
+        if especialidade:
+            confianca += 0.1
+
+        confianca = round(min(1.0, confianca), 3)
+        result = LLMExtractionResult(
+            nome_paciente=nome_paciente or "",
+            data_documento=data_documento or date.today(),
+            tipo_documento=tipo_documento or type_catalog.resolve(None).nome_tipo,
+            especialidade=especialidade,
+        )
+        result.extras["confianca_extracao"] = confianca
+        result.extras["extrator"] = "heuristica"
+        if not (nome_paciente and data_documento and tipo_documento):
+            result.extras["confianca_extracao"] = min(confianca, 0.5)
+        return result
+
+
+class FastPathExtractor(BaseExtractor):
+    """Tenta as regras locais primeiro e só consulta o extrator LLM abaixo do limiar."""
+
+    def __init__(
+        self,
+        fallback: BaseExtractor,
+        *,
+        threshold: float = DEFAULT_FAST_PATH_THRESHOLD,
+        heuristic: BaseExtractor | None = None,
+    ) -> None:
+        self._fallback = fallback
+        self._heuristic = heuristic or HeuristicExtractor()
+        self._threshold = threshold
+        self._documentos = 0
+        self._llm_evitadas = 0
+        self._confiancas: List[float] = []
+
+    def _try_fast_path(
+        self,
+        document: Document,
+        patient_registry: PatientRegistry,
+        type_catalog: DocumentTypeCatalog,
+    ) -> LLMExtractionResult | None:
+        """Retorna o resultado das regras se a confiança atingir o limiar."""
+        self._documentos += 1
+        try:
+            result = self._heuristic.extract(
+                document, patient_registry=patient_registry, type_catalog=type_catalog
+            )
+            confianca = float(result.extras.get("confianca_extracao", 0.0))
+        except Exception as exc:  # pragma: no cover - regras não devem derrubar o pipeline
+            LOGGER.debug("Extração heurística falhou para %s: %s", document.nome_arquivo_original, exc)
+            result, confianca = None, 0.0
+        self._confiancas.append(confianca)
+
+        if result is not None and confianca >= self._threshold:
+            self._llm_evitadas += 1
+            LOGGER.info(
+                "⚡ Caminho rápido: %s classificado por regras (confiança %.2f), LLM não consultado",
+                document.nome_arquivo_original,
+                confianca,
+            )
+            return result
+
+        LOGGER.debug(
+            "Confiança heurística %.2f abaixo do limiar %.2f para %s, consultando LLM",
+            confianca,
+            self._threshold,
+            document.nome_arquivo_original,
+        )
+        return None
+
+    def extract(
+        self,
+        document: Document,
+        *,
+        patient_registry: PatientRegistry,
+        type_catalog: DocumentTypeCatalog,
+    ) -> LLMExtractionResult:
+        result = self._try_fast_path(document, patient_registry, type_catalog)
+        if result is not None:
+            return result
+        return self._fallback.extract(
+            document, patient_registry=patient_registry, type_catalog=type_catalog
+        )
+
+    def extract_batch(
+        self,
+        documents: Sequence[Document],
+        *,
+        patient_registry: PatientRegistry,
+        type_catalog: DocumentTypeCatalog,
+    ) -> List[LLMExtractionResult]:
+        results = [self._try_fast_path(document, patient_registry, type_catalog) for document in documents]
+        pending = [indice for indice, result in enumerate(results) if result is None]
+        if pending:
+            delegated = self._fallback.extract_batch(
+                [documents[indice] for indice in pending],
+                patient_registry=patient_registry,
+                type_catalog=type_catalog,
+            )
+            for indice, result in zip(pending, delegated, strict=True):
+                results[indice] = result
+        return require_all_results(results)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "documentos": self._documentos,
+            "llm_evitadas": self._llm_evitadas,
+            "llm_consultadas": self._documentos - self._llm_evitadas,
+            "limiar_confianca": self._threshold,
+            "taxa_llm_evitadas": round(self._llm_evitadas / self._documentos, 3) if self._documentos else 0.0,
+        }
+        if self._confiancas:
+            stats["confianca_media_heuristica"] = round(sum(self._confiancas) / len(self._confiancas), 3)
+        fallback_stats = self._fallback.get_statistics()
+        if fallback_stats:
+            stats["fallback"] = fallback_stats
+        return stats
@@ -4,16 +4,27 @@ from __future__ import annotations
 
 import json
 import logging
+import re
+import threading
 import time
 from abc import ABC, abstractmethod
 from datetime import date
-from typing import Any, Dict
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, NamedTuple, Sequence, Tuple
 
+from .backends import BackendEndpoint, BackendPool, pool_for_config
 from .config import Config
-from .models import Document, LLMExtractionResult
+from .hedging import Hedger
+from .metrics import record_tokens, record_upload
+from .models import Document, DocumentProcessingError, LLMExtractionResult
 from .patients import PatientRegistry
+from .prompting import compact_document_text
+from .ratelimit import estimate_tokens, status_code_of
+from .resilience import request_timeout
 from .types import DocumentTypeCatalog
 
+if TYPE_CHECKING:
+    import openai
+
 LOGGER = logging.getLogger(__name__)
 
 # Schema JSON para validação de respostas do LLM
@@ -30,6 +41,42 @@ LLM_RESPONSE_SCHEMA = {
     "additionalProperties": False
 }
 
+# Saída estruturada (OpenAI ``response_format``; o endpoint /v1 do Ollama a converte em ``format``)
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "metadados_documento", "schema": LLM_RESPONSE_SCHEMA, "strict": True},
+}
+
+# Com saída estruturada, o JSON de cinco campos curtos cabe com folga nesse limite
+STRUCTURED_MAX_TOKENS = 256
+
+STRUCTURED_OUTPUT_MODES = ("auto", "json_schema", "off")
+
+# Valores aceitos em validate_llm_response e listados nos prompts (categoria → quando usar)
+TIPOS_DOCUMENTO: Dict[str, str] = {
+    "exame": "para resultados de análises clínicas, laboratoriais, de imagem ou ultrassom",
+    "receita": "para prescrições médicas e medicamentos",
+    "vacina": "para registros de vacinação e imunização",
+    "controle": "para medições ou acompanhamento (pressão, glicemia etc.)",
+    "contato": "para dados de médicos, clínicas, endereços, telefones",
+    "laudo": "para relatórios médicos, pareceres, atestados",
+    "agenda": "para agendamentos ou confirmações de consulta",
+    "documento": "para formulários, carteirinhas, solicitações ou arquivos administrativos",
+}
+ESPECIALIDADES = (
+    "radiologia",
+    "laboratorial",
+    "cardiologia",
+    "endocrinologia",
+    "ginecologia",
+    "clinica_geral",
+    "dermatologia",
+    "pediatria",
+    "oftalmologia",
+    "otorrinolaringologia",
+    "infectologia",
+)
+
 
 def validate_llm_response(data: Dict[str, Any]) -> None:
     """Valida resposta do LLM contra schema para prevenir injeção.
@@ -85,19 +132,32 @@ def validate_llm_response(data: Dict[str, Any]) -> None:
         if tipo_lower in tipo_mapping:
             data["tipo_documento"] = tipo_mapping[tipo_lower]
         
-        if data["tipo_documento"] not in [
-            "exame", "receita", "vacina", "controle", "contato", "laudo", "agenda", "documento"
-        ]:
+        if data["tipo_documento"] not in TIPOS_DOCUMENTO:
             raise ValueError(f"tipo_documento inválido: {data['tipo_documento']}")
     
-    if data.get("especialidade") and data["especialidade"] not in [
-        "radiologia", "laboratorial", "cardiologia", "endocrinologia", 
-        "ginecologia", "clinica_geral", "dermatologia", "pediatria", "oftalmologia", "otorrinolaringologia", "infectologia"
-    ]:
+    if data.get("especialidade") and data["especialidade"] not in ESPECIALIDADES:
         raise ValueError(f"especialidade inválida: {data['especialidade']}")
 
 
-DEFAULT_PROMPT = """
+def _lista(titulo: str, itens: List[str]) -> str:
+    return titulo + "\n" + "\n".join(f"- {item}" for item in itens)
+
+
+# Um único texto de categorias, especialidades e instruções para os prompts individual e em lote
+_CATEGORIAS_PROMPT = _lista(
+    "**CATEGORIAS VÁLIDAS para `tipo_documento`:**",
+    [f"{tipo} → {descricao}" for tipo, descricao in TIPOS_DOCUMENTO.items()],
+)
+_ESPECIALIDADES_PROMPT = _lista("**ESPECIALIDADES VÁLIDAS:**", list(ESPECIALIDADES))
+_INSTRUCOES_COMUNS = [
+    "Use **letras minúsculas e sem acento** nos valores categóricos (`tipo_documento`, `especialidade`).",
+    'O campo `descricao_curta` deve conter até **60 caracteres e no máximo 4 termos**, descrevendo o tipo do documento (ex: "hemograma completo", "ultrassom abdominal", "receita antibiótico", "laudo oftalmológico").',
+    "Se houver múltiplas datas, priorize a data de **emissão, coleta ou atendimento médico**.",
+]
+
+
+DEFAULT_PROMPT = (
+    """
 Você é um assistente de IA especializado em interpretar documentos médicos digitalizados 
 (laudos, exames, receitas, formulários, etc.). 
 Seu papel é analisar o texto fornecido e identificar as informações principais 
@@ -113,36 +173,18 @@ formatações quebradas ou textos mistos) e retorne um objeto JSON com os seguin
   "especialidade": "<especialidade válida>",
   "descricao_curta": "<resumo breve, até 60 caracteres>"
 }}
-
-**CATEGORIAS VÁLIDAS para `tipo_documento`:**
-- exame → para resultados de análises clínicas, laboratoriais, de imagem ou ultrassom
-- receita → para prescrições médicas e medicamentos
-- vacina → para registros de vacinação e imunização
-- controle → para medições ou acompanhamento (pressão, glicemia etc.)
-- contato → para dados de médicos, clínicas, endereços, telefones
-- laudo → para relatórios médicos, pareceres, atestados
-- agenda → para agendamentos ou confirmações de consulta
-- documento → para formulários, carteirinhas, solicitações ou arquivos administrativos
-
-**ESPECIALIDADES VÁLIDAS:**
-- radiologia
-- laboratorial
-- cardiologia
-- endocrinologia
-- ginecologia
-- clinica_geral
-- dermatologia
-- pediatria
-- oftalmologia
-- otorrinolaringologia
-- infectologia
-
-**Instruções adicionais:**
-- Sempre tente preencher todos os campos, mesmo que inferindo com base no conteúdo.
-- Use **letras minúsculas e sem acento** nos valores categóricos (`tipo_documento`, `especialidade`).
-- O campo `descricao_curta` deve conter até **60 caracteres e no máximo 4 termos**, descrevendo o tipo do documento (ex: "hemograma completo", "ultrassom abdominal", "receita antibiótico", "laudo oftalmológico").
-- Se houver múltiplas datas, priorize a data de **emissão, coleta ou atendimento médico**.
-- Caso o nome do paciente não esteja claramente legível, utilize a melhor inferência possível baseada em padrões típicos (ex: linhas que iniciam com "Paciente:", "Cliente:", "Nome:", etc.).
+""".strip()
+    + "\n\n" + _CATEGORIAS_PROMPT
+    + "\n\n" + _ESPECIALIDADES_PROMPT
+    + "\n\n" + _lista(
+        "**Instruções adicionais:**",
+        [
+            "Sempre tente preencher todos os campos, mesmo que inferindo com base no conteúdo.",
+            *_INSTRUCOES_COMUNS,
+            'Caso o nome do paciente não esteja claramente legível, utilize a melhor inferência possível baseada em padrões típicos (ex: linhas que iniciam com "Paciente:", "Cliente:", "Nome:", etc.).',
+        ],
+    )
+    + """
 
 Agora processe o conteúdo a seguir:
 
@@ -150,7 +192,199 @@ Documento:
 \"\"\"
 {texto}
 \"\"\"
+"""
+).strip()
+
+
+BATCH_PROMPT = (
+    """
+Você é um assistente de IA especializado em interpretar documentos médicos digitalizados 
+(laudos, exames, receitas, formulários, etc.). 
+Você receberá um ou mais documentos independentes, cada um delimitado por 
+<documento id="N"> e </documento>. Analise cada documento separadamente 
+(mesmo que contenha ruídos de OCR) e retorne APENAS um array JSON com um objeto por documento:
+
+[
+  {{
+    "id": <N>,
+    "nome_paciente": "<texto>",
+    "data_documento": "<AAAA-MM-DD>",
+    "tipo_documento": "<categoria válida>",
+    "especialidade": "<especialidade válida>",
+    "descricao_curta": "<resumo breve, até 60 caracteres>"
+  }}
+]
 """.strip()
+    + "\n\n" + _CATEGORIAS_PROMPT
+    + "\n\n" + _ESPECIALIDADES_PROMPT
+    + "\n\n" + _lista(
+        "**Instruções adicionais:**",
+        [
+            *_INSTRUCOES_COMUNS,
+            "Nunca misture informações de documentos diferentes; use null quando um campo não puder ser inferido.",
+        ],
+    )
+    + """
+
+Documentos ({quantidade}):
+
+{documentos}
+"""
+).strip()
+
+
+SYSTEM_PROMPT = "Você extrai metadados estruturados de documentos médicos."
+
+
+def split_prompt(template: str, placeholder: str, value: str, **fields: Any) -> Tuple[str, str]:
+    """Separa o template em mensagem de sistema estática e mensagem do usuário.
+
+    Tudo que vem antes do último parágrafo que contém ``{placeholder}`` vira
+    parte da mensagem de sistema, idêntica em todas as requisições; assim o
+    cache de prefixo do provedor (OpenAI, KV cache do Ollama/llama.cpp) pode
+    reaproveitá-la. O texto do documento vai no fim, na mensagem do usuário.
+    Templates com outros campos antes do documento mantêm o formato antigo.
+    """
+    marker = "{" + placeholder + "}"
+    if template.count(marker) == 1:
+        prefix, suffix = template.split(marker)
+        cut = prefix.rstrip("\n").rfind("\n\n")
+        static, header = (prefix[:cut], prefix[cut:].lstrip("\n")) if cut > 0 else ("", prefix)
+        if static.strip() and not re.search(r"(?<!\{)\{\w+\}(?!\})", static):
+            system = SYSTEM_PROMPT + "\n\n" + static.replace("{{", "{").replace("}}", "}").strip()
+            return system, header.format(**fields) + value + suffix.format(**fields)
+    return SYSTEM_PROMPT, template.format(**{placeholder: value}, **fields)
+
+
+def strip_json_payload(raw_response: str, opening: str = "{", closing: str = "}") -> str:
+    """Remove cercas markdown e texto ao redor do JSON retornado pelo LLM."""
+    if not raw_response.strip():
+        raise RuntimeError("LLM retornou resposta vazia")
+    
+    # Remove markdown e texto adicional se presente
+    content = raw_response.strip()
+    
+    # Procurar por bloco JSON entre marcadores ```json e ```
+    if '```json' in content:
+        start = content.find('```json') + 7
+        end = content.find('```', start)
+        if end > start:
+            content = content[start:end].strip()
+    # Tentar encontrar JSON entre ``` genérico
+    elif '```' in content:
+        start = content.find('```') + 3
+        end = content.find('```', start)
+        if end > start:
+            content = content[start:end].strip()
+    
+    # Remover texto antes da abertura e depois do fechamento
+    if opening in content and closing in content:
+        start = content.find(opening)
+        end = content.rfind(closing) + 1
+        content = content[start:end]
+    
+    return content.strip()
+
+
+class JsonCloseDetector:
+    """Detecta, em texto recebido aos pedaços, onde o primeiro valor JSON termina.
+
+    Texto antes da abertura (cercas markdown, comentários) é ignorado; chaves e
+    colchetes dentro de strings não contam.
+    """
+
+    def __init__(self, opening: str = "{") -> None:
+        self._opening = opening
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> int | None:
+        """Consome *chunk*; retorna o índice logo após o fechamento, se ocorreu nele."""
+        for index, char in enumerate(chunk):
+            if not self._started:
+                if char == self._opening:
+                    self._started = True
+                    self._depth = 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    return index + 1
+        return None
+
+
+# Pedaços lidos após o fechamento do JSON à procura do uso (chega logo após o fim)
+_USAGE_DRAIN_CHUNKS = 4
+
+
+def read_json_stream(stream: Any, opening: str = "{") -> Tuple[str, bool, Any]:
+    """Lê um stream de *chat completion* até o JSON fechar e encerra a conexão.
+
+    Retorna o texto lido, se a leitura parou antes do fim do stream e o
+    ``usage`` informado pelo servidor (``None`` se não chegou a tempo).
+    """
+    detector = JsonCloseDetector(opening)
+    parts: List[str] = []
+    fechado = False
+    encerrado_cedo = False
+    usage = None
+    extra = 0
+    try:
+        for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            if fechado:
+                extra += 1
+                if usage is not None:
+                    break
+                if extra >= _USAGE_DRAIN_CHUNKS:
+                    encerrado_cedo = True
+                    break
+                continue
+            choices = getattr(chunk, "choices", None)
+            if not choices:
+                continue
+            text = getattr(choices[0].delta, "content", None)
+            if not text:
+                continue
+            end = detector.feed(text)
+            if end is not None:
+                parts.append(text[:end])
+                fechado = True
+                if usage is not None:
+                    break
+                continue
+            parts.append(text)
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()  # não gastar tokens de saída depois do JSON
+    return "".join(parts), encerrado_cedo, usage
+
+
+def parse_llm_response(raw_response: str) -> Dict[str, Any]:
+    """Converte a resposta bruta do LLM em dicionário validado."""
+    LOGGER.debug("Resposta do LLM: %r", raw_response)
+    content = strip_json_payload(raw_response)
+    LOGGER.debug("Conteúdo limpo: %r", content)
+
+    parsed = json.loads(content)
+    
+    # Validar resposta contra schema para prevenir injeção
+    validate_llm_response(parsed)
+    return parsed
 
 
 class BaseExtractor(ABC):
@@ -166,39 +400,84 @@ class BaseExtractor(ABC):
     ) -> LLMExtractionResult:
         raise NotImplementedError
 
+    def extract_batch(
+        self,
+        documents: Sequence[Document],
+        *,
+        patient_registry: PatientRegistry,
+        type_catalog: DocumentTypeCatalog,
+    ) -> List[LLMExtractionResult]:
+        """Extrai metadados de vários documentos (padrão: um a um)."""
+        return [
+            self.extract(document, patient_registry=patient_registry, type_catalog=type_catalog)
+            for document in documents
+        ]
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Estatísticas acumuladas do extrator (vazio quando não há o que reportar)."""
+        return {}
+
 
 class OpenAILLMExtractor(BaseExtractor):
     """Extrator que utiliza a API da OpenAI."""
 
-    def __init__(self, config: Config, prompt_template: str | None = None) -> None:
-        if not config.openai_api_key:
-            raise ValueError("OPENAI_API_KEY não configurada.")
-        try:
-            from openai import OpenAI  # type: ignore
-            import httpx  # type: ignore
-        except ImportError as exc:  # pragma: no cover - depende de pip
-            raise RuntimeError("Pacote 'openai' não está instalado.") from exc
-        
-        # Configurar timeout usando httpx.Timeout
-        timeout_config = httpx.Timeout(
-            connect=30.0,  # Timeout para conexão
-            read=config.llm_timeout,  # Timeout para leitura (padrão: 240s)
-            write=30.0,  # Timeout para escrita
-            pool=30.0  # Timeout para pool de conexões
-        )
-        
-        self._client = OpenAI(
-            api_key=config.openai_api_key,
-            base_url=config.openai_api_base,
-            timeout=timeout_config
+    def __init__(
+        self,
+        config: Config,
+        prompt_template: str | None = None,
+        *,
+        model: str | None = None,
+        api_base: str | None = None,
+        api_key: str | None = None,
+        pool: BackendPool | None = None,
+    ) -> None:
+        """*model*, *api_base* e *api_key* substituem os da configuração (níveis da cascata).
+
+        *pool* substitui o pool de endpoints da configuração (clientes já prontos,
+        por exemplo em testes); sem ele, o pacote ``openai`` é obrigatório.
+        """
+        if pool is None:
+            if not config.openai_api_key:
+                raise ValueError("OPENAI_API_KEY não configurada.")
+            try:
+                import httpx  # type: ignore  # noqa: F401
+                import openai  # type: ignore  # noqa: F401
+            except ImportError as exc:  # pragma: no cover - depende de pip
+                raise RuntimeError("Pacote 'openai' não está instalado.") from exc
+            # Pool de endpoints (--backends) ou endpoint único; compartilhado com o OCR multimodal
+            pool = pool_for_config(
+                config, api_base or config.openai_api_base, api_key or config.openai_api_key
+            )
+        self._pool = pool
+        # Cópia da requisição após o p95 observado (--hedge), limitada a uma fração das requisições
+        self._hedger = (
+            Hedger(max_rate=config.llm_hedge_max_rate, max_workers=2 * config.llm_max_concurrency)
+            if config.llm_hedge
+            else None
         )
-        self._model = config.modelo_llm
+        self._model = model or config.modelo_llm
+        self._model_fixo = model is not None  # Modelo do nível da cascata prevalece sobre o do endpoint
         self._temperature = config.llm_temperature
         self._max_tokens = config.llm_max_tokens
         self._timeout = config.llm_timeout
-        self._retry_delay = config.llm_retry_delay
-        self._max_retries = config.llm_max_retries
         self._prompt_template = prompt_template or DEFAULT_PROMPT
+        self._custom_prompt = prompt_template is not None
+        self._prompt_token_budget = config.llm_prompt_token_budget
+        self._chars_texto_original = 0
+        self._chars_texto_prompt = 0
+        self._structured_output = config.llm_structured_output
+        self._stream = config.llm_stream
+        self._sem_saida_estruturada: set[str] = set()  # Endpoints que rejeitaram response_format
+        self._sem_stream_options: set[str] = set()  # Endpoints que rejeitaram stream_options
+        self._saida_estruturada = 0
+        self._streams_encerrados_cedo = 0
+        self._uso = threading.local()  # Uso de tokens da última chamada desta thread
+        self._tokens_prompt = 0
+        self._tokens_cache = 0
+        self._lotes = 0
+        self._documentos_em_lote = 0
+        self._chars_prompt_lote = 0
+        self._fallback_individual = 0
 
     def extract(
         self,
@@ -207,10 +486,11 @@ class OpenAILLMExtractor(BaseExtractor):
         patient_registry: PatientRegistry,
         type_catalog: DocumentTypeCatalog,
     ) -> LLMExtractionResult:
-        prompt = self._prompt_template.format(texto=document.texto_extraido)
+        system, prompt = split_prompt(self._prompt_template, "texto", self._prompt_text(document))
         start = time.perf_counter()
-        raw_response = self._call_openai(prompt)
+        raw_response = self._call_openai(prompt, system=system, validate=self._parse_response)
         elapsed_ms = int((time.perf_counter() - start) * 1000)
+        resposta = getattr(self._uso, "ultima", None)
         
         # Logging estruturado conforme SRS
         log_estruturado = {
@@ -226,42 +506,7 @@ class OpenAILLMExtractor(BaseExtractor):
         LOGGER.debug("LLM respondeu em %sms", elapsed_ms)
         
         try:
-            # Debug
-            print(f"DEBUG: Resposta do LLM: '{raw_response}'")
-            
-            if not raw_response.strip():
-                raise RuntimeError("LLM retornou resposta vazia")
-            
-            # Remove markdown e texto adicional se presente
-            content = raw_response.strip()
-            
-            # Procurar por bloco JSON entre marcadores ```json e ```
-            if '```json' in content:
-                start = content.find('```json') + 7
-                end = content.find('```', start)
-                if end > start:
-                    content = content[start:end].strip()
-            # Tentar encontrar JSON entre ``` genérico
-            elif '```' in content:
-                start = content.find('```') + 3
-                end = content.find('```', start)
-                if end > start:
-                    content = content[start:end].strip()
-            
-            # Remover texto antes de { e depois de }
-            if '{' in content and '}' in content:
-                start = content.find('{')
-                end = content.rfind('}') + 1
-                content = content[start:end]
-            
-            content = content.strip()
-            print(f"DEBUG: Conteúdo limpo: '{content}'")
-
-            parsed = json.loads(content)
-            
-            # Validar resposta contra schema para prevenir injeção
-            validate_llm_response(parsed)
-            
+            parsed = self._parse_response(raw_response)
             log_estruturado["sucesso"] = True
             log_estruturado["dados_extraidos"] = parsed
         except json.JSONDecodeError as exc:
@@ -271,113 +516,389 @@ class OpenAILLMExtractor(BaseExtractor):
         
         # Log final estruturado conforme SRS
         LOGGER.info("Extração LLM concluída: %s", log_estruturado)
-        return self._build_result(parsed)
+        result = self._build_result(parsed)
+        if resposta is not None and resposta.prompt_tokens is not None:
+            result.extras["tokens_prompt"] = resposta.prompt_tokens
+            result.extras["tokens_cache"] = resposta.cached_tokens or 0
+            result.extras["tokens_resposta"] = resposta.completion_tokens or 0
+        return result
 
-    def _call_openai(self, prompt: str) -> str:
-        """Chama API OpenAI com sistema de retry conforme SRS."""
-        print(f"DEBUG: Usando endpoint {self._client.base_url}")
-        print("DEBUG: Fazendo chamada para chat.completions.create")
-        
-        for tentativa in range(1, self._max_retries + 1):
-            try:
-                LOGGER.debug(f"Tentativa {tentativa}/{self._max_retries} de classificação LLM")
-                
-                completion = self._client.chat.completions.create(
-                    model=self._model,
-                    temperature=self._temperature,
-                    max_tokens=self._max_tokens,
-                    messages=[
-                        {"role": "system", "content": "Você extrai metadados estruturados de documentos médicos."},
-                        {"role": "user", "content": prompt},
-                    ],
-                )
-                response_content = completion.choices[0].message.content
-                print(f"DEBUG: Sucesso na tentativa {tentativa}")
-                LOGGER.info(f"✓ Classificação LLM bem-sucedida na tentativa {tentativa}")
-                return response_content
-            except Exception as e:
-                LOGGER.warning(f"Tentativa {tentativa}/{self._max_retries} falhou: {e}")
-                print(f"DEBUG: Erro na tentativa {tentativa}/{self._max_retries}: {e}")
-                if tentativa == self._max_retries:
-                    LOGGER.error(f"Falha na classificação LLM após {self._max_retries} tentativas")
-                    raise RuntimeError(f"Falha após {self._max_retries} tentativas: {e}") from e
-                # Aguarda antes de tentar novamente
-                LOGGER.info(f"Aguardando {self._retry_delay}s antes de tentar novamente...")
-                time.sleep(self._retry_delay)
+    def _prompt_text(self, document: Document) -> str:
+        """Texto do documento limpo e limitado ao orçamento de tokens do prompt."""
+        original = document.texto_extraido or ""
+        texto = compact_document_text(original, self._prompt_token_budget)
+        self._chars_texto_original += len(original)
+        self._chars_texto_prompt += len(texto)
+        return texto
 
-    def _build_result(self, data: Dict[str, Any]) -> LLMExtractionResult:
+    def _parse_response(self, raw_response: str) -> Dict[str, Any]:
+        return parse_llm_response(raw_response)
+
+    def extract_batch(
+        self,
+        documents: Sequence[Document],
+        *,
+        patient_registry: PatientRegistry,
+        type_catalog: DocumentTypeCatalog,
+    ) -> List[LLMExtractionResult]:
+        """Classifica vários documentos em uma única requisição.
+
+        Cada elemento do array retornado é validado individualmente; documentos
+        sem elemento válido (ou o lote inteiro, se a resposta não for um array
+        JSON) voltam para a extração individual.
+        """
+        if len(documents) < 2 or self._custom_prompt:
+            return super().extract_batch(
+                documents, patient_registry=patient_registry, type_catalog=type_catalog
+            )
+        
+        blocos = "\n\n".join(
+            f'<documento id="{indice}">\n{self._prompt_text(document)}\n</documento>'
+            for indice, document in enumerate(documents, 1)
+        )
+        system, prompt = split_prompt(BATCH_PROMPT, "documentos", blocos, quantidade=len(documents))
+        self._lotes += 1
+        self._documentos_em_lote += len(documents)
+        self._chars_prompt_lote += len(prompt)
+        
+        elementos: Dict[str, Dict[str, Any]] = {}
         try:
-            # Tratar casos onde data_documento pode ser None ou inválida
-            data_doc = data.get("data_documento")
-            if data_doc and isinstance(data_doc, str) and data_doc.strip():
+            raw_response = self._call_openai(
+                prompt,
+                system=system,
+                max_tokens=self._max_tokens * len(documents),
+                validate=_parse_batch_response,
+                structured=False,
+                opening="[",
+            )
+            parsed = _parse_batch_response(raw_response)
+            if not isinstance(parsed, list):
+                raise ValueError("Resposta em lote deve ser um array JSON")
+            for elemento in parsed:
+                if isinstance(elemento, dict) and "id" in elemento:
+                    elementos[str(elemento.pop("id"))] = elemento
+        except Exception as exc:
+            LOGGER.warning("Classificação em lote falhou (%d documentos), usando chamadas individuais: %s", len(documents), exc)
+        
+        results: List[LLMExtractionResult] = []
+        for indice, document in enumerate(documents, 1):
+            elemento = elementos.get(str(indice))
+            if elemento is not None:
                 try:
-                    data_documento = date.fromisoformat(data_doc)
-                except ValueError:
-                    # Se não conseguir fazer parse, usar data atual
-                    data_documento = date.today()
-            else:
-                data_documento = date.today()
-            
-            # Calcular confiança conforme SRS (0.0-1.0)
-            confianca = self._calcular_confianca_extracao(data)
-            
-            result = LLMExtractionResult(
-                nome_paciente=data.get("nome_paciente", "").strip() or None,
-                data_documento=data_documento,
-                tipo_documento=data.get("tipo_documento", "").strip() or None,
-                especialidade=data.get("especialidade", "").strip() or None,
-                descricao_curta=data.get("descricao_curta", "").strip() or None,
+                    validate_llm_response(elemento)
+                    results.append(self._build_result(elemento))
+                    continue
+                except ValueError as exc:
+                    LOGGER.warning("Elemento %d do lote inválido (%s): %s", indice, document.nome_arquivo_original, exc)
+            self._fallback_individual += 1
+            results.append(
+                self.extract(document, patient_registry=patient_registry, type_catalog=type_catalog)
             )
-            
-            # Adicionar confiança aos extras (SRS requer campo confianca_extracao)
-            if not hasattr(result, 'extras') or result.extras is None:
-                result.extras = {}
-            result.extras['confianca_extracao'] = confianca
-            
-            return result
-        except Exception as e:
-            print(f"DEBUG: Erro ao processar resultado: {e}")
-            print(f"DEBUG: Dados recebidos: {data}")
-            # Retorna resultado com dados mínimos em caso de erro
-            result = LLMExtractionResult(
-                nome_paciente=None,
-                data_documento=date.today(),
-                tipo_documento=None,
-                especialidade=None,
-                descricao_curta=None,
+        return results
+
+    def get_statistics(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {}
+        if self._lotes:
+            stats.update(
+                lotes=self._lotes,
+                documentos_em_lote=self._documentos_em_lote,
+                documentos_por_requisicao=round(self._documentos_em_lote / self._lotes, 2),
+                chars_prompt_por_documento=round(self._chars_prompt_lote / self._documentos_em_lote),
+                fallback_individual=self._fallback_individual,
+            )
+        stats["backends"] = self._pool.get_statistics()
+        if self._tokens_prompt:
+            stats.update(
+                tokens_prompt=self._tokens_prompt,
+                tokens_prompt_cache=self._tokens_cache,
+                taxa_cache_prompt=round(self._tokens_cache / self._tokens_prompt, 3),
             )
-            result.extras = {'confianca_extracao': 0.0}
-            return result
+        if self._chars_texto_original:
+            stats["reducao_texto_prompt"] = round(1 - self._chars_texto_prompt / self._chars_texto_original, 3)
+        if self._hedger is not None:
+            stats["hedging"] = self._hedger.get_statistics()
+        if (
+            self._saida_estruturada
+            or self._streams_encerrados_cedo
+            or self._sem_saida_estruturada
+            or self._sem_stream_options
+        ):
+            stats.update(
+                saida_estruturada=self._saida_estruturada,
+                streams_encerrados_cedo=self._streams_encerrados_cedo,
+                endpoints_sem_saida_estruturada=sorted(self._sem_saida_estruturada),
+                endpoints_sem_stream_options=sorted(self._sem_stream_options),
+            )
+        return stats
+
+    def _call_openai(
+        self,
+        prompt: str,
+        *,
+        system: str = SYSTEM_PROMPT,
+        max_tokens: int | None = None,
+        validate: Callable[[str], Any] | None = None,
+        structured: bool = True,
+        opening: str = "{",
+    ) -> str:
+        """Chama a API OpenAI via limitador adaptativo (taxa, concorrência e backoff).
+
+        *system* é a mensagem de sistema estática (prefixo reaproveitável pelo
+        cache do provedor); *prompt* traz o conteúdo variável.
+
+        Com hedging ativo, *validate* decide qual resposta vence: uma resposta
+        que não passa na validação não encerra a corrida com a cópia.
+
+        *structured* pede saída no schema de :data:`LLM_RESPONSE_SCHEMA` (só
+        para um documento por requisição); com streaming, a leitura para assim
+        que o valor JSON iniciado por *opening* fecha.
+        """
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            LOGGER.debug("Usando endpoint(s) %s", ", ".join(endpoint.name for endpoint in self._pool.endpoints))
+        structured = structured and self._structured_output != "off"
+        
+        def limite_tokens(usar_formato: bool) -> int:
+            # O teto curto só vale com response_format: texto livre (endpoint que o rejeita) usa o limite normal
+            if max_tokens is not None:
+                return max_tokens
+            return min(self._max_tokens, STRUCTURED_MAX_TOKENS) if usar_formato else self._max_tokens
+        
+        def create(client: openai.OpenAI, endpoint: BackendEndpoint) -> _Resposta:
+            kwargs: Dict[str, Any] = dict(
+                model=self._model if self._model_fixo else endpoint.model or self._model,
+                temperature=self._temperature,
+                messages=[
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": prompt},
+                ],
+                timeout=request_timeout(self._timeout),
+            )
+            record_upload(len(system.encode("utf-8")) + len(prompt.encode("utf-8")))
+            if self._stream:
+                kwargs["stream"] = True
+                if endpoint.name not in self._sem_stream_options:
+                    kwargs["stream_options"] = {"include_usage": True}
+            usar_formato = structured and endpoint.name not in self._sem_saida_estruturada
+            if usar_formato:
+                kwargs["response_format"] = RESPONSE_FORMAT
+            kwargs["max_tokens"] = limite_tokens(usar_formato)
+            try:
+                response = client.chat.completions.create(**kwargs)
+            except Exception as exc:
+                # Backend sem suporte a response_format/stream_options (modo auto): o parâmetro
+                # citado no erro deixa de ser enviado a este endpoint e a requisição volta ao pool
+                rejeitados = _rejected_options(exc, kwargs) if self._structured_output == "auto" else []
+                if not rejeitados:
+                    raise
+                LOGGER.warning("Endpoint %s rejeitou %s (%s); reenviando sem", endpoint.name, ", ".join(rejeitados), exc)
+                if "response_format" in rejeitados:
+                    self._sem_saida_estruturada.add(endpoint.name)
+                if "stream_options" in rejeitados:
+                    self._sem_stream_options.add(endpoint.name)
+                raise _OptionRejected(exc) from exc
+            if usar_formato:
+                self._saida_estruturada += 1
+            if self._stream:
+                content, encerrado_cedo, usage = read_json_stream(response, opening)
+                if encerrado_cedo:
+                    self._streams_encerrados_cedo += 1
+                return _Resposta.from_usage(content, usage)
+            return _Resposta.from_usage(response.choices[0].message.content, getattr(response, "usage", None))
+        
+        def attempt() -> _Resposta:
+            while True:
+                try:
+                    return self._pool.call(
+                        create,
+                        estimated_tokens=estimate_tokens(system, 0) + estimate_tokens(prompt, limite_tokens(structured)),
+                        usage=lambda resposta: resposta.total_tokens,
+                        description="classificação LLM",
+                    )
+                except _OptionRejected:
+                    continue  # Cada rejeição remove um parâmetro opcional: o laço termina
+        
+        try:
+            if self._hedger is not None:
+                validate_content = (lambda resposta: validate(resposta.content)) if validate else None
+                resposta = self._hedger.call(attempt, validate_content)
+            else:
+                resposta = attempt()
+        except DocumentProcessingError:
+            raise  # prazo do documento ou circuito aberto: falha imediata, sem embrulhar
+        except ValueError:
+            raise  # nenhuma resposta passou em *validate*: o chamador trata como resposta inválida
+        except Exception as e:
+            raise RuntimeError(f"Falha na classificação LLM: {e}") from e
+        self._record_usage(resposta)
+        LOGGER.info("✓ Classificação LLM bem-sucedida")
+        return resposta.content
+
+    def _record_usage(self, resposta: _Resposta) -> None:
+        self._uso.ultima = resposta
+        if resposta.prompt_tokens is None:
+            return
+        record_tokens(resposta.prompt_tokens, resposta.completion_tokens, resposta.cached_tokens)
+        self._tokens_prompt += resposta.prompt_tokens
+        self._tokens_cache += resposta.cached_tokens or 0
+        if resposta.cached_tokens:
+            LOGGER.debug("Cache de prompt: %d de %d tokens reaproveitados", resposta.cached_tokens, resposta.prompt_tokens)
+
+    def _build_result(self, data: Dict[str, Any]) -> LLMExtractionResult:
+        return build_extraction_result(data)
+
+
+class _Resposta(NamedTuple):
+    content: str
+    total_tokens: int | None  # None quando o servidor não informou o uso
+    prompt_tokens: int | None = None
+    cached_tokens: int | None = None  # Tokens do prompt servidos pelo cache de prefixo
+    completion_tokens: int | None = None
+
+    @classmethod
+    def from_usage(cls, content: str, usage: Any) -> _Resposta:
+        details = getattr(usage, "prompt_tokens_details", None)
+        return cls(
+            content,
+            getattr(usage, "total_tokens", None),
+            getattr(usage, "prompt_tokens", None),
+            getattr(details, "cached_tokens", None),
+            getattr(usage, "completion_tokens", None),
+        )
+
+
+# Parâmetros que o modo auto deixa de enviar quando o endpoint os rejeita
+_OPTIONAL_PARAMETERS = ("response_format", "stream_options")
+
+
+class _OptionRejected(Exception):
+    """O endpoint rejeitou um parâmetro opcional; a requisição é refeita sem ele."""
+
+    def __init__(self, cause: Exception) -> None:
+        super().__init__(str(cause))
+        self.status_code = status_code_of(cause)  # 400/422: o limitador não repete nem abre o circuito
+
+
+def _rejected_options(exc: Exception, kwargs: Dict[str, Any]) -> List[str]:
+    """Parâmetros opcionais enviados que o corpo do erro 400/422 cita pelo nome."""
+    if status_code_of(exc) not in {400, 422}:
+        return []
+    texto = f"{exc} {getattr(exc, 'body', None) or ''}"
+    return [nome for nome in _OPTIONAL_PARAMETERS if nome in kwargs and nome in texto]
+
+
+def _parse_batch_response(raw_response: str) -> Any:
+    return json.loads(strip_json_payload(raw_response, "[", "]"))
+
+
+def _calcular_confianca_extracao(data: Dict[str, Any]) -> float:
+    """Calcula nível de confiança da extração conforme SRS (0.0-1.0)."""
+    confianca = 1.0
+    
+    # Penalizar campos obrigatórios ausentes (SRS: campos obrigatórios)
+    campos_obrigatorios = ['nome_paciente', 'data_documento', 'tipo_documento']
+    for campo in campos_obrigatorios:
+        valor = data.get(campo)
+        if not valor or (isinstance(valor, str) and not valor.strip()):
+            confianca -= 0.3  # Penalidade por campo obrigatório ausente
     
-    def _calcular_confianca_extracao(self, data: Dict[str, Any]) -> float:
-        """Calcula nível de confiança da extração conforme SRS (0.0-1.0)."""
-        confianca = 1.0
+    # Bonificar campos opcionais preenchidos
+    campos_opcionais = ['especialidade', 'descricao_curta']
+    for campo in campos_opcionais:
+        valor = data.get(campo)
+        if valor and isinstance(valor, str) and valor.strip():
+            confianca += 0.1  # Bônus por campo opcional preenchido
+    
+    # Garantir que confiança fica entre 0.0 e 1.0
+    return max(0.0, min(1.0, confianca))
+
+
+def build_extraction_result(data: Dict[str, Any]) -> LLMExtractionResult:
+    """Converte o JSON validado do LLM em :class:`LLMExtractionResult`."""
+    try:
+        # Tratar casos onde data_documento pode ser None ou inválida
+        data_doc = data.get("data_documento")
+        if data_doc and isinstance(data_doc, str) and data_doc.strip():
+            try:
+                data_documento = date.fromisoformat(data_doc)
+            except ValueError:
+                # Se não conseguir fazer parse, usar data atual
+                data_documento = date.today()
+        else:
+            data_documento = date.today()
+        
+        # Calcular confiança conforme SRS (0.0-1.0)
+        confianca = _calcular_confianca_extracao(data)
         
-        # Penalizar campos obrigatórios ausentes (SRS: campos obrigatórios)
-        campos_obrigatorios = ['nome_paciente', 'data_documento', 'tipo_documento']
-        for campo in campos_obrigatorios:
-            valor = data.get(campo)
-            if not valor or (isinstance(valor, str) and not valor.strip()):
-                confianca -= 0.3  # Penalidade por campo obrigatório ausente
+        result = LLMExtractionResult(
+            nome_paciente=data.get("nome_paciente", "").strip() or None,
+            data_documento=data_documento,
+            tipo_documento=data.get("tipo_documento", "").strip() or None,
+            especialidade=data.get("especialidade", "").strip() or None,
+            descricao_curta=data.get("descricao_curta", "").strip() or None,
+        )
         
-        # Bonificar campos opcionais preenchidos
-        campos_opcionais = ['especialidade', 'descricao_curta']
-        for campo in campos_opcionais:
-            valor = data.get(campo)
-            if valor and isinstance(valor, str) and valor.strip():
-                confianca += 0.1  # Bônus por campo opcional preenchido
+        # Adicionar confiança aos extras (SRS requer campo confianca_extracao)
+        if not hasattr(result, 'extras') or result.extras is None:
+            result.extras = {}
+        result.extras['confianca_extracao'] = confianca
+        result.extras['extrator'] = 'llm'
         
-        # Garantir que confiança fica entre 0.0 e 1.0
-        return max(0.0, min(1.0, confianca))
+        return result
+    except Exception as e:
+        LOGGER.debug("Erro ao processar resultado: %s", e)
+        LOGGER.debug("Dados recebidos: %r", data)
+        # Retorna resultado com dados mínimos em caso de erro
+        result = LLMExtractionResult(
+            nome_paciente=None,
+            data_documento=date.today(),
+            tipo_documento=None,
+            especialidade=None,
+            descricao_curta=None,
+        )
+        result.extras = {'confianca_extracao': 0.0}
+        return result
 
 
 def build_extractor(config: Config, prompt_text: str | None) -> BaseExtractor:
     """Cria o extrator LLM - aplicação utiliza exclusivamente LLM."""
-    if not config.openai_api_key:
+    if not config.openai_api_key and config.llm_provider != "ollama":
         raise ValueError("OPENAI_API_KEY é obrigatória. Sistema requer LLM para funcionamento.")
     
+    def llm_extractor(**overrides: Any) -> BaseExtractor:
+        if config.llm_provider == "ollama":
+            from .ollama import OllamaExtractor
+
+            overrides.pop("api_key", None)
+            return OllamaExtractor(config, prompt_text, **overrides)
+        return OpenAILLMExtractor(config, prompt_text, **overrides)
+    
     try:
-        return OpenAILLMExtractor(config, prompt_text)
+        if config.llm_cascade:
+            from .cascade import CascadeExtractor
+
+            extractor: BaseExtractor = CascadeExtractor(
+                llm_extractor(
+                    model=config.effective_classification_model,
+                    api_base=config.effective_classification_api_base,
+                    api_key=config.effective_classification_api_key,
+                ),
+                llm_extractor(model=config.effective_escalation_model),
+                threshold=config.cascade_confidence_threshold,
+            )
+        else:
+            extractor = llm_extractor()
     except Exception as exc:
         raise RuntimeError(f"Falha ao inicializar extrator LLM: {exc}. Sistema requer LLM para funcionamento.") from exc
 
+    if config.local_classifier:
+        from .classifier import LocalClassifierExtractor
+
+        extractor = LocalClassifierExtractor.from_path(
+            extractor, config.classifier_model_path, threshold=config.local_classifier_threshold
+        )
+    if config.heuristic_fast_path:
+        from .heuristics import FastPathExtractor
+
+        extractor = FastPathExtractor(extractor, threshold=config.heuristic_confidence_threshold)
+    return extractor
+
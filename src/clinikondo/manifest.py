@@ -0,0 +1,136 @@
+"""Manifesto JSONL de cada execução do ``processar``.
+
+Cada documento visto pela execução vira uma linha em
+``.clinikondo/manifestos/execucao-<inicio>.jsonl``, gravada (e descarregada
+para o disco) assim que o documento termina — organizado, com falha ou
+ignorado por duplicata. O manifesto não guarda nada em memória e sobrevive a
+uma execução interrompida; relatórios e auditorias leem o manifesto em vez de
+varrer ou reclassificar a árvore de saída.
+
+Campos de cada linha: ``arquivo``, ``hash``, ``status`` (``organizado``,
+``falha`` ou ``duplicata``), ``destino``, ``campos`` extraídos, ``confianca``,
+``extrator``, ``metodo_extracao``, ``tempo_processamento_ms``, ``etapas_ms``,
+``tentativas_llm``, ``erro`` e ``registrado_em``.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional
+
+from .metrics import DocumentMetrics
+from .models import Document
+
+LOGGER = logging.getLogger(__name__)
+
+ORGANIZADO = "organizado"
+FALHA = "falha"
+DUPLICATA = "duplicata"
+
+
+def _campos(document: Document) -> Dict[str, Any]:
+    return {
+        "nome_paciente": document.nome_paciente_inferido,
+        "data_documento": document.data_documento.isoformat() if document.data_documento else None,
+        "tipo_documento": document.tipo_documento,
+        "especialidade": document.especialidade,
+        "descricao_curta": document.descricao_curta,
+        "compartilhado": document.classificado_como_compartilhado,
+        "nome_arquivo_final": document.nome_arquivo_final,
+    }
+
+
+def manifest_entry(
+    path: Path,
+    *,
+    status: str,
+    document: Document | None = None,
+    metrics: DocumentMetrics | None = None,
+    file_hash: str | None = None,
+    error: BaseException | str | None = None,
+) -> Dict[str, Any]:
+    """Monta a linha do manifesto de um documento."""
+    entry: Dict[str, Any] = {
+        "arquivo": str(path),
+        "hash": file_hash or (document.hash_sha256 if document is not None else None),
+        "status": status,
+        "destino": None,
+    }
+    if document is not None:
+        entry["destino"] = str(document.caminho_destino) if document.caminho_destino else None
+        entry["campos"] = _campos(document)
+        confianca = document.dados_extraidos.get("confianca_extracao")
+        entry["confianca"] = float(confianca) if confianca is not None else None
+        entry["extrator"] = document.dados_extraidos.get("extrator")
+        entry["metodo_extracao"] = document.metodo_extracao
+        entry["chars_extraidos"] = document.chars_extraidos
+    if metrics is not None:
+        entry["metodo_extracao"] = metrics.metodo_extracao or entry.get("metodo_extracao")
+        entry["tempo_processamento_ms"] = int(metrics.segundos_total * 1000)
+        entry["etapas_ms"] = {nome: int(etapa.segundos * 1000) for nome, etapa in metrics.etapas.items()}
+        llm = metrics.etapas.get("llm")
+        entry["tentativas_llm"] = round(llm.tentativas, 2) if llm is not None else 0
+    if error is not None:
+        entry["erro"] = str(error) if isinstance(error, str) else f"{type(error).__name__}: {error}"
+    entry["registrado_em"] = datetime.now().isoformat(timespec="seconds")
+    return entry
+
+
+class RunManifest:
+    """Escreve o manifesto da execução de forma incremental (uma linha por documento)."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._file: Optional[IO[str]] = None
+        self._lock = threading.Lock()
+        self.linhas = 0
+
+    def open(self) -> RunManifest:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open("a", encoding="utf-8")
+        return self
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + "\n")
+            self._file.flush()  # Execução interrompida mantém as linhas já gravadas
+            self.linhas += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self) -> RunManifest:
+        return self.open()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def read_manifest(path: Path) -> Iterator[Dict[str, Any]]:
+    """Lê as linhas de um manifesto (linhas truncadas por interrupção são ignoradas)."""
+    with path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                LOGGER.warning("Linha inválida no manifesto %s ignorada", path.name)
+
+
+def list_manifests(directory: Path) -> List[Path]:
+    """Manifestos em *directory*, do mais antigo ao mais recente."""
+    if not directory.exists():
+        return []
+    return sorted(directory.glob("execucao-*.jsonl"))
@@ -0,0 +1,311 @@
+"""Métricas por documento e por execução (tempo por etapa, tentativas, tokens e bytes).
+
+Cada documento ganha um :class:`DocumentMetrics` guardado em um
+:class:`contextvars.ContextVar`, como o prazo em :mod:`clinikondo.resilience`:
+o OCR, o limitador e o extrator registram o que fizeram sem receber o
+documento como parâmetro, inclusive em threads iniciadas com
+``contextvars.copy_context``. As etapas são aninhadas (``ocr`` acontece dentro
+de ``extracao``); tentativas, tokens e bytes vão para a etapa mais interna.
+
+No fim da execução, :class:`RunMetrics` agrega os documentos em um resumo
+(vazão, p50/p95/p99 por etapa, tokens por documento) salvo em JSON no
+diretório de estado.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import json
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+HASH = "hash"
+EXTRACAO = "extracao"
+OCR = "ocr"
+LLM = "llm"
+ORGANIZACAO = "organizacao"
+
+PERCENTIS = (50, 95, 99)
+# Amostras de tempo guardadas por série para os percentis (processos longos não crescem)
+MAX_AMOSTRAS = 4096
+
+
+class StageMetrics:
+    """Contadores de uma etapa do processamento de um documento."""
+
+    __slots__ = ("segundos", "tentativas", "tokens_prompt", "tokens_resposta", "tokens_cache", "bytes_enviados")
+
+    def __init__(self) -> None:
+        self.segundos = 0.0
+        self.tentativas = 0
+        self.tokens_prompt = 0
+        self.tokens_resposta = 0
+        self.tokens_cache = 0
+        self.bytes_enviados = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "ms": int(self.segundos * 1000),
+            "tentativas": round(self.tentativas, 2),
+            "tokens_prompt": self.tokens_prompt,
+            "tokens_resposta": self.tokens_resposta,
+            "tokens_cache": self.tokens_cache,
+            "bytes_enviados": self.bytes_enviados,
+        }
+
+
+class DocumentMetrics:
+    """Métricas acumuladas durante o processamento de um documento."""
+
+    def __init__(self) -> None:
+        self.etapas: Dict[str, StageMetrics] = {}
+        self.metodo_extracao: str | None = None
+        self.inicio = time.perf_counter()
+        self.segundos_total = 0.0
+        self._lock = threading.Lock()
+
+    def _etapa(self, nome: str) -> StageMetrics:
+        etapa = self.etapas.get(nome)
+        if etapa is None:
+            etapa = self.etapas[nome] = StageMetrics()
+        return etapa
+
+    def add(self, nome: str, **valores: float) -> None:
+        with self._lock:
+            etapa = self._etapa(nome)
+            for campo, valor in valores.items():
+                setattr(etapa, campo, getattr(etapa, campo) + valor)
+
+    def total(self, campo: str) -> float:
+        with self._lock:
+            return sum(getattr(etapa, campo) for etapa in self.etapas.values())
+
+    def absorb(self, outro: DocumentMetrics, fracao: float) -> None:
+        """Soma as métricas de uma requisição compartilhada (lote) a este documento.
+
+        O tempo entra inteiro — é a latência que o documento de fato esperou —
+        e tentativas, tokens e bytes entram proporcionalmente a *fracao*.
+        """
+        for nome, etapa in outro.etapas.items():
+            self.add(
+                nome,
+                segundos=etapa.segundos,
+                tentativas=etapa.tentativas * fracao,
+                tokens_prompt=round(etapa.tokens_prompt * fracao),
+                tokens_resposta=round(etapa.tokens_resposta * fracao),
+                tokens_cache=round(etapa.tokens_cache * fracao),
+                bytes_enviados=round(etapa.bytes_enviados * fracao),
+            )
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.inicio
+
+    def finish(self) -> None:
+        self.segundos_total = self.elapsed()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "tempo_processamento_ms": int(self.segundos_total * 1000),
+            "metodo_extracao": self.metodo_extracao,
+            "etapas": {nome: etapa.as_dict() for nome, etapa in self.etapas.items()},
+        }
+
+
+_CURRENT: contextvars.ContextVar[Optional[DocumentMetrics]] = contextvars.ContextVar(
+    "clinikondo_document_metrics", default=None
+)
+_STAGE: contextvars.ContextVar[str] = contextvars.ContextVar("clinikondo_stage", default=LLM)
+
+
+@contextmanager
+def track(metrics: DocumentMetrics | None = None) -> Iterator[DocumentMetrics]:
+    """Ativa as métricas de um documento no bloco (e nas threads com o contexto copiado).
+
+    Passar *metrics* já existente continua a contagem — no modo lote o texto é
+    extraído em um momento e o documento é organizado em outro.
+    """
+    metrics = metrics if metrics is not None else DocumentMetrics()
+    token = _CURRENT.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _CURRENT.reset(token)
+
+
+def current_metrics() -> Optional[DocumentMetrics]:
+    return _CURRENT.get()
+
+
+@contextmanager
+def stage(nome: str) -> Iterator[None]:
+    """Cronometra a etapa *nome* do documento atual (sem documento, não faz nada)."""
+    metrics = _CURRENT.get()
+    if metrics is None:
+        yield
+        return
+    token = _STAGE.set(nome)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(nome, segundos=time.perf_counter() - start)
+        _STAGE.reset(token)
+
+
+def _record(**valores: float) -> None:
+    metrics = _CURRENT.get()
+    if metrics is not None:
+        metrics.add(_STAGE.get(), **valores)
+
+
+def record_attempt() -> None:
+    """Uma requisição enviada (inclui novas tentativas do limitador)."""
+    _record(tentativas=1)
+
+
+def record_tokens(prompt: int | None = None, resposta: int | None = None, cache: int | None = None) -> None:
+    _record(tokens_prompt=prompt or 0, tokens_resposta=resposta or 0, tokens_cache=cache or 0)
+
+
+def record_upload(nbytes: int) -> None:
+    _record(bytes_enviados=nbytes)
+
+
+def set_extraction_method(metodo: str) -> None:
+    metrics = _CURRENT.get()
+    if metrics is not None:
+        metrics.metodo_extracao = metodo
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentil pelo posto mais próximo (*values* não precisa estar ordenado)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+class Reservoir:
+    """Amostra uniforme de tamanho fixo de uma série de valores (algoritmo R).
+
+    Até *capacidade* valores, guarda todos (percentis exatos); depois disso,
+    cada novo valor substitui um guardado com probabilidade
+    ``capacidade / vistos``, e a memória não cresce com ``--watch``/``servir``.
+    """
+
+    __slots__ = ("capacidade", "vistos", "amostras", "_random")
+
+    def __init__(self, capacidade: int = MAX_AMOSTRAS, *, seed: int | None = None) -> None:
+        self.capacidade = capacidade
+        self.vistos = 0
+        self.amostras: List[float] = []
+        self._random = random.Random(seed)
+
+    def add(self, valor: float) -> None:
+        self.vistos += 1
+        if len(self.amostras) < self.capacidade:
+            self.amostras.append(valor)
+            return
+        indice = self._random.randrange(self.vistos)
+        if indice < self.capacidade:
+            self.amostras[indice] = valor
+
+
+_TOTAIS = ("tentativas", "tokens_prompt", "tokens_resposta", "tokens_cache", "bytes_enviados")
+
+
+class RunMetrics:
+    """Agrega as métricas dos documentos de uma execução.
+
+    Guarda só os totais e uma amostra limitada dos tempos (para os
+    percentis): o detalhe de cada documento vai para o manifesto, então a
+    memória fica constante mesmo em processos longos (``--watch``, ``servir``).
+    """
+
+    def __init__(self) -> None:
+        self.inicio = datetime.now()
+        self._inicio_relogio = time.perf_counter()
+        self.segundos_total: float | None = None
+        self.documentos = 0
+        self.falhas = 0
+        self.duplicatas = 0
+        self._tempos_documento = Reservoir()
+        self._tempos_etapa: Dict[str, Reservoir] = {}
+        self._totais: Dict[str, float] = dict.fromkeys(_TOTAIS, 0)
+        self._lock = threading.Lock()
+
+    def add(self, metrics: DocumentMetrics, *, sucesso: bool = True) -> None:
+        with self._lock:
+            self.documentos += 1
+            if not sucesso:
+                self.falhas += 1
+            self._tempos_documento.add(metrics.segundos_total * 1000)
+            for nome, etapa in metrics.etapas.items():
+                tempos = self._tempos_etapa.get(nome)
+                if tempos is None:
+                    tempos = self._tempos_etapa[nome] = Reservoir()
+                tempos.add(etapa.segundos * 1000)
+            for campo in _TOTAIS:
+                self._totais[campo] += metrics.total(campo)
+
+    def finish(self) -> None:
+        self.segundos_total = time.perf_counter() - self._inicio_relogio
+
+    def summary(self) -> Dict[str, Any]:
+        segundos = (
+            self.segundos_total if self.segundos_total is not None else time.perf_counter() - self._inicio_relogio
+        )
+        with self._lock:
+            total = self.documentos
+            totais = {campo: int(valor) for campo, valor in self._totais.items()}
+            documento_ms = {f"p{pct}": int(percentile(self._tempos_documento.amostras, pct)) for pct in PERCENTIS}
+            etapas_ms = {
+                nome: {f"p{pct}": int(percentile(tempos.amostras, pct)) for pct in PERCENTIS}
+                for nome, tempos in self._tempos_etapa.items()
+            }
+        return {
+            "inicio": self.inicio.isoformat(timespec="seconds"),
+            "duracao_s": round(segundos, 3),
+            "documentos": total,
+            "falhas": self.falhas,
+            "duplicatas_ignoradas": self.duplicatas,
+            "documentos_por_minuto": round(total / segundos * 60, 2) if segundos > 0 else 0.0,
+            "documento_ms": documento_ms,
+            "etapas_ms": etapas_ms,
+            **totais,
+            "tokens_por_documento": (
+                round((totais["tokens_prompt"] + totais["tokens_resposta"]) / total, 1) if total else 0.0
+            ),
+        }
+
+    def save(self, directory: Path) -> Path:
+        """Grava o resumo em ``<directory>/execucao-<inicio>.json`` (o detalhe fica no manifesto)."""
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"execucao-{self.inicio.strftime('%Y%m%d-%H%M%S')}.json"
+        payload = {"resumo": self.summary()}
+        path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+        return path
+
+    def format_summary(self) -> str:
+        resumo = self.summary()
+        linhas = [
+            f"⏱️  {resumo['documentos']} documento(s) em {resumo['duracao_s']:.1f}s "
+            f"({resumo['documentos_por_minuto']:.1f}/min, {resumo['falhas']} falha(s))",
+        ]
+        documento = resumo["documento_ms"]
+        linhas.append(f"   documento: p50 {documento['p50']}ms | p95 {documento['p95']}ms | p99 {documento['p99']}ms")
+        for nome, valores in resumo["etapas_ms"].items():
+            linhas.append(f"   {nome}: p50 {valores['p50']}ms | p95 {valores['p95']}ms | p99 {valores['p99']}ms")
+        linhas.append(
+            f"   tokens: {resumo['tokens_prompt']} prompt ({resumo['tokens_cache']} em cache), "
+            f"{resumo['tokens_resposta']} resposta, {resumo['tokens_por_documento']:.0f}/documento; "
+            f"{resumo['tentativas']} requisição(ões), {resumo['bytes_enviados'] / 1024:.0f} KiB enviados"
+        )
+        return "\n".join(linhas)
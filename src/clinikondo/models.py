@@ -5,7 +5,7 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 from datetime import date, datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
 
 class DocumentProcessingError(Exception):
@@ -22,7 +22,7 @@ class LLMExtractionResult:
     especialidade: str | None = None
     descricao_curta: str | None = None
     classificar_como_compartilhado: bool = False
-    extras: Dict[str, str] = field(default_factory=dict)
+    extras: Dict[str, Any] = field(default_factory=dict)
 
 
 @dataclass(slots=True)
@@ -51,6 +51,8 @@ class Document:
     confianca_extracao: float = 0.0
     tempo_processamento_ms: int = 0
     tentativas_llm: int = 0
+    # Bytes de um documento recebido em memória (sem arquivo na entrada); liberados ao organizar
+    conteudo: bytes | memoryview | None = field(default=None, repr=False)
 
     @property
     def nome_arquivo_original(self) -> str:
@@ -0,0 +1,283 @@
+"""Backend nativo do Ollama (``/api/chat``) com ``keep_alive`` e aquecimento do modelo.
+
+A camada compatível com OpenAI (``/v1``) não expõe ``keep_alive``: com
+requisições esparsas o modelo é descarregado e o primeiro documento depois de
+um intervalo paga alguns segundos de carga. Com ``--provider ollama`` a
+classificação e o OCR multimodal usam a API nativa, mantendo o modelo
+carregado por ``--keep-alive``, pedindo JSON no schema da resposta via
+``format`` e aquecendo os modelos no início da execução. O tempo de carga
+informado pelo Ollama (``load_duration``) é contabilizado à parte.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+from .config import Config
+from .llm import (
+    DEFAULT_PROMPT,
+    LLM_RESPONSE_SCHEMA,
+    STRUCTURED_MAX_TOKENS,
+    BaseExtractor,
+    build_extraction_result,
+    parse_llm_response,
+    split_prompt,
+)
+from .metrics import record_tokens, record_upload
+from .models import Document, DocumentProcessingError, LLMExtractionResult
+from .patients import PatientRegistry
+from .prompting import compact_document_text
+from .ratelimit import AdaptiveRateLimiter, estimate_tokens, limiter_for_config
+from .resilience import request_timeout
+from .types import DocumentTypeCatalog
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_OLLAMA_BASE = "http://localhost:11434"
+
+# Acima disso, o load_duration indica que o modelo estava descarregado (não só um reuso)
+_COLD_LOAD_SECONDS = 0.5
+
+
+class OllamaAPIError(RuntimeError):
+    """Erro HTTP da API do Ollama (``status_code`` alimenta o limitador)."""
+
+    def __init__(self, message: str, status_code: int | None = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def native_base_url(api_base: str | None) -> str:
+    """URL da API nativa a partir da base compatível com OpenAI (remove ``/v1``)."""
+    base = (api_base or DEFAULT_OLLAMA_BASE).rstrip("/")
+    if base.endswith("/v1"):
+        base = base[: -len("/v1")]
+    return base
+
+
+class OllamaClient:
+    """Cliente mínimo de ``/api/chat`` que contabiliza o tempo de carga dos modelos."""
+
+    def __init__(self, base_url: str, *, keep_alive: str = "30m", timeout: float = 120.0) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.keep_alive = keep_alive
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self.cargas = 0
+        self.tempo_carga = 0.0
+        self.aquecimentos: Dict[str, float] = {}
+
+    def _post(self, path: str, payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        body = json.dumps(payload).encode("utf-8")
+        record_upload(len(body))
+        request = urllib.request.Request(
+            f"{self.base_url}{path}",
+            data=body,
+            method="POST",
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as exc:
+            detail = exc.read().decode("utf-8", errors="replace")[:500]
+            raise OllamaAPIError(f"POST {path} falhou ({exc.code}): {detail}", exc.code) from exc
+        except urllib.error.URLError as exc:
+            raise ConnectionError(f"Ollama indisponível em {self.base_url}: {exc.reason}") from exc
+
+    def chat(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        *,
+        format: Any = None,
+        options: Dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {
+            "model": model,
+            "messages": messages,
+            "stream": False,
+            "keep_alive": self.keep_alive,
+        }
+        if format is not None:
+            payload["format"] = format
+        if options:
+            payload["options"] = options
+        data = self._post("/api/chat", payload, timeout or self._timeout)
+        self._record_load(model, data)
+        record_tokens(data.get("prompt_eval_count"), data.get("eval_count"))
+        return data
+
+    def _record_load(self, model: str, data: Dict[str, Any]) -> float:
+        load = (data.get("load_duration") or 0) / 1e9
+        if load >= _COLD_LOAD_SECONDS:
+            with self._lock:
+                self.cargas += 1
+                self.tempo_carga += load
+            LOGGER.info("🐢 Modelo %s carregado em %.1fs", model, load)
+        return load
+
+    def warm_up(self, model: str) -> float:
+        """Carrega *model* (mensagens vazias) e retorna o tempo gasto em segundos."""
+        start = time.perf_counter()
+        data = self._post("/api/chat", {"model": model, "messages": [], "keep_alive": self.keep_alive}, self._timeout)
+        elapsed = time.perf_counter() - start
+        self._record_load(model, data)
+        with self._lock:
+            self.aquecimentos[model] = elapsed
+        LOGGER.info("🔥 Modelo %s aquecido em %.1fs (keep_alive=%s)", model, elapsed, self.keep_alive)
+        return elapsed
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            "cargas_modelo": self.cargas,
+            "tempo_carga_modelo_ms": int(self.tempo_carga * 1000),
+            "aquecimento_ms": {model: int(seconds * 1000) for model, seconds in self.aquecimentos.items()},
+            "keep_alive": self.keep_alive,
+        }
+
+
+_CLIENTS: Dict[str, OllamaClient] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def client_for_config(config: Config, api_base: str | None = None) -> OllamaClient:
+    """Cliente compartilhado por endpoint (classificação e OCR somam as cargas)."""
+    base_url = native_base_url(api_base or config.openai_api_base)
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(base_url)
+        if client is None:
+            client = OllamaClient(base_url, keep_alive=config.ollama_keep_alive, timeout=config.llm_timeout)
+            _CLIENTS[base_url] = client
+        return client
+
+
+def reset_clients() -> None:
+    with _CLIENTS_LOCK:
+        _CLIENTS.clear()
+
+
+def warm_up_models(config: Config) -> None:
+    """Aquece os modelos de classificação (e de OCR multimodal) no início da execução."""
+    targets = [(config.openai_api_base, config.modelo_llm)]
+    if config.llm_cascade:
+        targets.append((config.effective_classification_api_base, config.effective_classification_model))
+        targets.append((config.openai_api_base, config.effective_escalation_model))
+    if config.ocr_strategy == "multimodal":
+        targets.append((config.effective_ocr_api_base, config.effective_ocr_model or config.modelo_llm))
+    for api_base, model in dict.fromkeys(targets):
+        try:
+            client_for_config(config, api_base).warm_up(model)
+        except Exception as exc:
+            LOGGER.warning("Não foi possível aquecer o modelo %s: %s", model, exc)
+
+
+class OllamaExtractor(BaseExtractor):
+    """Extrator que classifica pela API nativa do Ollama."""
+
+    def __init__(
+        self,
+        config: Config,
+        prompt_template: str | None = None,
+        *,
+        model: str | None = None,
+        api_base: str | None = None,
+        client: OllamaClient | None = None,
+        limiter: AdaptiveRateLimiter | None = None,
+    ) -> None:
+        self._client = client or client_for_config(config, api_base)
+        self._limiter = limiter or limiter_for_config(config, self._client.base_url)
+        self._model = model or config.modelo_llm
+        self._temperature = config.llm_temperature
+        self._max_tokens = config.llm_max_tokens
+        self._timeout = config.llm_timeout
+        self._prompt_template = prompt_template or DEFAULT_PROMPT
+        self._prompt_token_budget = config.llm_prompt_token_budget
+        self._documentos = 0
+        self._tokens_prompt = 0
+        self._tokens_resposta = 0
+
+    def extract(
+        self,
+        document: Document,
+        *,
+        patient_registry: PatientRegistry,
+        type_catalog: DocumentTypeCatalog,
+    ) -> LLMExtractionResult:
+        texto = compact_document_text(document.texto_extraido or "", self._prompt_token_budget)
+        system, prompt = split_prompt(self._prompt_template, "texto", texto)
+        num_predict = min(self._max_tokens, STRUCTURED_MAX_TOKENS)
+        try:
+            data = self._limiter.call(
+                lambda: self._client.chat(
+                    self._model,
+                    [{"role": "system", "content": system}, {"role": "user", "content": prompt}],
+                    format=LLM_RESPONSE_SCHEMA,
+                    options={"temperature": self._temperature, "num_predict": num_predict},
+                    timeout=request_timeout(self._timeout),
+                ),
+                estimated_tokens=estimate_tokens(system + prompt, num_predict),
+                usage=lambda data: (data.get("prompt_eval_count") or 0) + (data.get("eval_count") or 0) or None,
+                description="classificação Ollama",
+            )
+        except DocumentProcessingError:
+            raise  # prazo do documento ou circuito aberto
+        except Exception as exc:
+            raise RuntimeError(f"Falha na classificação Ollama: {exc}") from exc
+
+        self._documentos += 1
+        self._tokens_prompt += data.get("prompt_eval_count") or 0
+        self._tokens_resposta += data.get("eval_count") or 0
+        raw_response = (data.get("message") or {}).get("content") or ""
+        try:
+            parsed = parse_llm_response(raw_response)
+        except json.JSONDecodeError as exc:
+            raise RuntimeError(f"Resposta do Ollama não é JSON válido: {exc}") from exc
+        result = build_extraction_result(parsed)
+        result.extras["tempo_carga_modelo_ms"] = int((data.get("load_duration") or 0) / 1e6)
+        result.extras["tempo_total_llm_ms"] = int((data.get("total_duration") or 0) / 1e6)
+        result.extras["tokens_prompt"] = data.get("prompt_eval_count") or 0
+        result.extras["tokens_resposta"] = data.get("eval_count") or 0
+        return result
+
+    def get_statistics(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "documentos": self._documentos,
+            "tokens_prompt": self._tokens_prompt,
+            "tokens_resposta": self._tokens_resposta,
+        }
+        stats.update(self._client.get_statistics())
+        stats["limitador"] = self._limiter.get_statistics()
+        return stats
+
+
+def ocr_page_native(
+    config: Config,
+    model: str,
+    img_base64: str,
+    prompt: str,
+    max_tokens: int,
+    api_base: Optional[str] = None,
+) -> str:
+    """OCR de uma página pela API nativa (imagens em ``images``)."""
+    client = client_for_config(config, api_base)
+    limiter = limiter_for_config(config, client.base_url)
+    data = limiter.call(
+        lambda: client.chat(
+            model,
+            [{"role": "user", "content": prompt, "images": [img_base64]}],
+            options={"temperature": 0.0, "num_predict": max_tokens},
+            timeout=request_timeout(config.llm_timeout),
+        ),
+        estimated_tokens=estimate_tokens("", max_tokens) + 1000,
+        description="OCR Ollama",
+    )
+    return (data.get("message") or {}).get("content") or ""
+
@@ -0,0 +1,202 @@
+"""Armazenamento SQLite do cadastro de pacientes."""
+
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .models import Patient
+
+LOGGER = logging.getLogger(__name__)
+
+SQLITE_SUFFIXES = {".db", ".sqlite", ".sqlite3"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS patients (
+    slug TEXT PRIMARY KEY,
+    nome_completo TEXT NOT NULL,
+    nome_normalizado TEXT NOT NULL,
+    genero TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_patients_nome ON patients (nome_normalizado);
+CREATE TABLE IF NOT EXISTS aliases (
+    slug TEXT NOT NULL REFERENCES patients (slug) ON DELETE CASCADE,
+    posicao INTEGER NOT NULL,
+    alias TEXT NOT NULL,
+    alias_normalizado TEXT NOT NULL,
+    PRIMARY KEY (slug, posicao)
+);
+CREATE INDEX IF NOT EXISTS idx_aliases_nome ON aliases (alias_normalizado);
+"""
+
+
+def is_sqlite_path(path: Path) -> bool:
+    """Indica se o caminho aponta para um banco SQLite de pacientes."""
+    return path.suffix.lower() in SQLITE_SUFFIXES
+
+
+class SQLitePatientStore:
+    """Persistência indexada de pacientes com upserts transacionais.
+
+    Os nomes e aliases são gravados também na forma normalizada, o que permite
+    localizar um paciente por nome sem carregar o cadastro inteiro.
+    """
+
+    def __init__(self, path: Path, normalizer: Callable[[str], str]) -> None:
+        self._path = path
+        self._normalize = normalizer
+        path.parent.mkdir(parents=True, exist_ok=True)
+        is_new = not path.exists()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript(_SCHEMA)
+        if is_new:
+            self._import_legacy_json(path.with_suffix(".json"))
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _import_legacy_json(self, json_path: Path) -> None:
+        """Migra um ``patients.json`` vizinho na primeira abertura do banco."""
+        if not json_path.exists():
+            return
+        try:
+            raw = json.loads(json_path.read_text(encoding="utf-8"))
+        except json.JSONDecodeError as exc:
+            LOGGER.warning("Não foi possível migrar pacientes de %s: %s", json_path, exc)
+            return
+        patients = [
+            Patient(
+                nome_completo=entry["nome_completo"],
+                slug_diretorio=entry["slug_diretorio"],
+                nomes_alternativos=entry.get("nomes_alternativos", []),
+                genero=entry.get("genero"),
+            )
+            for entry in raw
+        ]
+        self.upsert_many(patients)
+        LOGGER.info("Migrados %d paciente(s) de %s para %s", len(patients), json_path, self._path)
+
+    def _row_to_patient(self, row: tuple) -> Patient:
+        slug, nome_completo, genero = row
+        aliases = [
+            alias
+            for (alias,) in self._conn.execute(
+                "SELECT alias FROM aliases WHERE slug = ? ORDER BY posicao", (slug,)
+            )
+        ]
+        return Patient(
+            nome_completo=nome_completo,
+            slug_diretorio=slug,
+            nomes_alternativos=aliases,
+            genero=genero,
+        )
+
+    def get(self, slug: str) -> Optional[Patient]:
+        row = self._conn.execute(
+            "SELECT slug, nome_completo, genero FROM patients WHERE slug = ?", (slug,)
+        ).fetchone()
+        return self._row_to_patient(row) if row else None
+
+    def exists(self, slug: str) -> bool:
+        row = self._conn.execute("SELECT 1 FROM patients WHERE slug = ?", (slug,)).fetchone()
+        return row is not None
+
+    def find_slug_by_name(self, normalized: str) -> Optional[str]:
+        """Busca exata (via índice) pelo nome ou alias já normalizado."""
+        row = self._conn.execute(
+            """
+            SELECT p.slug FROM patients p
+            WHERE p.nome_normalizado = ?
+               OR p.slug IN (SELECT slug FROM aliases WHERE alias_normalizado = ?)
+            ORDER BY p.rowid
+            LIMIT 1
+            """,
+            (normalized, normalized),
+        ).fetchone()
+        return row[0] if row else None
+
+    def load_all(self) -> List[Patient]:
+        aliases: Dict[str, List[str]] = {}
+        for slug, alias in self._conn.execute(
+            "SELECT slug, alias FROM aliases ORDER BY slug, posicao"
+        ):
+            aliases.setdefault(slug, []).append(alias)
+        return [
+            Patient(
+                nome_completo=nome_completo,
+                slug_diretorio=slug,
+                nomes_alternativos=aliases.get(slug, []),
+                genero=genero,
+            )
+            for slug, nome_completo, genero in self._conn.execute(
+                "SELECT slug, nome_completo, genero FROM patients ORDER BY rowid"
+            )
+        ]
+
+    def load_names(self) -> Dict[str, List[str]]:
+        """Carrega apenas os nomes normalizados, na ordem de cadastro."""
+        names: Dict[str, List[str]] = {
+            slug: [nome]
+            for slug, nome in self._conn.execute(
+                "SELECT slug, nome_normalizado FROM patients ORDER BY rowid"
+            )
+        }
+        for slug, alias in self._conn.execute(
+            "SELECT slug, alias_normalizado FROM aliases ORDER BY slug, posicao"
+        ):
+            if slug in names:
+                names[slug].append(alias)
+        return names
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM patients").fetchone()[0]
+
+    def upsert_many(self, patients: Iterable[Patient]) -> None:
+        """Grava os pacientes informados em uma única transação."""
+        with self._conn:
+            for patient in patients:
+                self._upsert(patient)
+
+    def upsert(self, patient: Patient) -> None:
+        self.upsert_many([patient])
+
+    def _upsert(self, patient: Patient) -> None:
+        slug = patient.slug_diretorio
+        self._conn.execute(
+            """
+            INSERT INTO patients (slug, nome_completo, nome_normalizado, genero)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (slug) DO UPDATE SET
+                nome_completo = excluded.nome_completo,
+                nome_normalizado = excluded.nome_normalizado,
+                genero = excluded.genero
+            """,
+            (slug, patient.nome_completo, self._normalize(patient.nome_completo), patient.genero),
+        )
+        self._conn.execute("DELETE FROM aliases WHERE slug = ?", (slug,))
+        self._conn.executemany(
+            "INSERT INTO aliases (slug, posicao, alias, alias_normalizado) VALUES (?, ?, ?, ?)",
+            [
+                (slug, posicao, alias, self._normalize(alias))
+                for posicao, alias in enumerate(patient.nomes_alternativos)
+            ],
+        )
+
+    def delete(self, slug: str) -> None:
+        with self._conn:
+            self._delete(slug)
+
+    def merge(self, source_slug: str, target: Patient) -> None:
+        """Remove *source_slug* e grava *target* na mesma transação."""
+        with self._conn:
+            self._delete(source_slug)
+            self._upsert(target)
+
+    def _delete(self, slug: str) -> None:
+        self._conn.execute("DELETE FROM aliases WHERE slug = ?", (slug,))
+        self._conn.execute("DELETE FROM patients WHERE slug = ?", (slug,))
@@ -9,6 +9,7 @@ from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Tuple
 
 from .models import Patient
+from .patient_store import SQLitePatientStore, is_sqlite_path
 from .utils import sanitize_token, slugify, strip_accents
 
 LOGGER = logging.getLogger(__name__)
@@ -18,13 +19,29 @@ def _normalize_name(value: str) -> str:
     return sanitize_token(value, separator=" ", allow_digits=False)
 
 
+def _snapshot(patient: Patient) -> tuple:
+    return (patient.nome_completo, tuple(patient.nomes_alternativos), patient.genero)
+
+
 class PatientRegistry:
-    """Gerencia o cadastro e reconciliação de nomes de pacientes."""
+    """Gerencia o cadastro e reconciliação de nomes de pacientes.
+
+    O armazenamento é escolhido pela extensão de *storage_path*: ``.json``
+    carrega o cadastro inteiro em memória; ``.db``/``.sqlite`` usa o
+    :class:`SQLitePatientStore`, carregando pacientes sob demanda e gravando
+    cada alteração em uma transação própria.
+    """
 
     def __init__(self, storage_path: Path | None = None) -> None:
         self._storage_path = storage_path
         self._patients: Dict[str, Patient] = {}
-        if storage_path:
+        self._store: SQLitePatientStore | None = None
+        self._snapshots: Dict[str, tuple] = {}
+        self._names: Dict[str, List[str]] | None = None
+        self._fully_loaded = False
+        if storage_path and is_sqlite_path(storage_path):
+            self._store = SQLitePatientStore(storage_path, _normalize_name)
+        elif storage_path:
             self._load()
 
     def _load(self) -> None:
@@ -45,6 +62,17 @@ class PatientRegistry:
             self._patients[patient.slug_diretorio] = patient
 
     def save(self) -> None:
+        if self._store is not None:
+            changed = [
+                patient
+                for slug, patient in self._patients.items()
+                if self._snapshots.get(slug) != _snapshot(patient)
+            ]
+            if changed:
+                self._store.upsert_many(changed)
+                for patient in changed:
+                    self._remember(patient)
+            return
         if not self._storage_path:
             return
         data = [
@@ -59,21 +87,87 @@ class PatientRegistry:
         self._storage_path.parent.mkdir(parents=True, exist_ok=True)
         self._storage_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
 
+    def _remember(self, patient: Patient) -> None:
+        """Mantém o paciente no cache e sincroniza o índice de nomes (SQLite)."""
+        slug = patient.slug_diretorio
+        self._patients[slug] = patient
+        self._snapshots[slug] = _snapshot(patient)
+        if self._names is not None:
+            self._names[slug] = [_normalize_name(name) for name in patient.nomes_normalizados()]
+
+    def _persist(self, patient: Patient) -> None:
+        """Grava imediatamente a alteração de um paciente no SQLite."""
+        if self._store is None:
+            self._patients[patient.slug_diretorio] = patient
+            return
+        self._store.upsert(patient)
+        self._remember(patient)
+
+    def _forget(self, slug: str) -> None:
+        self._patients.pop(slug, None)
+        self._snapshots.pop(slug, None)
+        if self._names is not None:
+            self._names.pop(slug, None)
+
+    def _delete(self, slug: str) -> None:
+        self._forget(slug)
+        if self._store is not None:
+            self._store.delete(slug)
+
+    def _get(self, slug: str) -> Optional[Patient]:
+        patient = self._patients.get(slug)
+        if patient is None and self._store is not None:
+            patient = self._store.get(slug)
+            if patient:
+                self._remember(patient)
+        return patient
+
+    def _slug_exists(self, slug: str) -> bool:
+        if slug in self._patients:
+            return True
+        return self._store is not None and self._store.exists(slug)
+
+    def _name_index(self) -> Dict[str, List[str]]:
+        """Nomes normalizados (nome completo primeiro) por slug, na ordem de cadastro."""
+        if self._store is None:
+            return {
+                slug: [_normalize_name(name) for name in patient.nomes_normalizados()]
+                for slug, patient in self._patients.items()
+            }
+        if self._names is None:
+            self._names = self._store.load_names()
+        return self._names
+
     def list(self) -> Iterable[Patient]:
+        if self._store is not None and not self._fully_loaded:
+            loaded = self._patients
+            self._patients = {}
+            for patient in self._store.load_all():
+                cached = loaded.get(patient.slug_diretorio)
+                if cached is not None:
+                    self._patients[cached.slug_diretorio] = cached
+                else:
+                    self._remember(patient)
+            self._fully_loaded = True
         return list(self._patients.values())
 
     def get_by_slug(self, slug: str) -> Optional[Patient]:
-        return self._patients.get(slug)
+        return self._get(slug)
 
     def match(self, name: str) -> Optional[Patient]:
         """Tenta encontrar um paciente existente pelo nome informado."""
         normalized = _normalize_name(name)
         
         # Primeiro, tentar match exato
-        for patient in self._patients.values():
-            candidates = [_normalize_name(patient.nome_completo), *(_normalize_name(alias) for alias in patient.nomes_alternativos)]
-            if normalized in candidates:
-                return patient
+        if self._store is not None:
+            slug = self._store.find_slug_by_name(normalized)
+            if slug:
+                return self._get(slug)
+        else:
+            for patient in self._patients.values():
+                candidates = [_normalize_name(patient.nome_completo), *(_normalize_name(alias) for alias in patient.nomes_alternativos)]
+                if normalized in candidates:
+                    return patient
         
         # Se não encontrou match exato, tentar fuzzy match com threshold alto
         fuzzy_matches = self.fuzzy_match(name, threshold=0.9)
@@ -87,11 +181,10 @@ class PatientRegistry:
     def match_in_text(self, text: str) -> Optional[Patient]:
         """Tenta identificar um paciente baseado no texto extraído."""
         normalized_text = _normalize_name(strip_accents(text))
-        for patient in self._patients.values():
-            for name in patient.nomes_normalizados():
-                cleaned = _normalize_name(name)
+        for slug, names in self._name_index().items():
+            for cleaned in names:
                 if cleaned and cleaned in normalized_text:
-                    return patient
+                    return self._get(slug)
         return None
 
     def ensure_patient(self, name: str, *, create_if_missing: bool = True) -> Patient | None:
@@ -103,43 +196,32 @@ class PatientRegistry:
         slug = slugify(name)
         index = 1
         unique_slug = slug
-        while unique_slug in self._patients:
+        while self._slug_exists(unique_slug):
             index += 1
             unique_slug = f"{slug}-{index}"
         patient = Patient(nome_completo=name, slug_diretorio=unique_slug, nomes_alternativos=[])
-        self._patients[unique_slug] = patient
+        self._persist(patient)
         return patient
 
     def upsert(self, patient: Patient) -> None:
-        self._patients[patient.slug_diretorio] = patient
+        self._persist(patient)
 
     def fuzzy_match(self, name: str, threshold: float = 0.8) -> List[Tuple[Patient, float]]:
         """Encontra pacientes similares usando fuzzy matching."""
         normalized_input = _normalize_name(name).lower()
         matches = []
         
-        for patient in self._patients.values():
-            # Comparar com nome principal
-            patient_name = _normalize_name(patient.nome_completo).lower()
-            similarity = difflib.SequenceMatcher(None, normalized_input, patient_name).ratio()
-            
-            if similarity >= threshold:
-                matches.append((patient, similarity))
-            
-            # Comparar com aliases
-            for alias in patient.nomes_alternativos:
-                alias_normalized = _normalize_name(alias).lower()
-                alias_similarity = difflib.SequenceMatcher(None, normalized_input, alias_normalized).ratio()
-                
-                if alias_similarity >= threshold:
-                    # Usar maior similaridade se já existe match
-                    existing_match = next((m for m in matches if m[0] == patient), None)
-                    if existing_match:
-                        max_similarity = max(existing_match[1], alias_similarity)
-                        matches.remove(existing_match)
-                        matches.append((patient, max_similarity))
-                    else:
-                        matches.append((patient, alias_similarity))
+        for slug, names in self._name_index().items():
+            # Comparar com nome principal e aliases, mantendo a maior similaridade
+            best: float | None = None
+            for candidate in names:
+                similarity = difflib.SequenceMatcher(None, normalized_input, candidate.lower()).ratio()
+                if similarity >= threshold and (best is None or similarity > best):
+                    best = similarity
+            if best is not None:
+                patient = self._get(slug)
+                if patient:
+                    matches.append((patient, best))
         
         # Ordenar por similaridade (maior primeiro)
         matches.sort(key=lambda x: x[1], reverse=True)
@@ -151,7 +233,7 @@ class PatientRegistry:
 
     def add_alias(self, patient_slug: str, alias: str) -> bool:
         """Adiciona um alias a um paciente existente."""
-        patient = self._patients.get(patient_slug)
+        patient = self._get(patient_slug)
         if not patient:
             return False
         
@@ -166,12 +248,13 @@ class PatientRegistry:
             return False
         
         patient.nomes_alternativos.append(alias)
+        self._persist(patient)
         return True
 
     def merge_patients(self, source_slug: str, target_slug: str) -> bool:
         """Merge dois pacientes, movendo aliases do source para o target."""
-        source = self._patients.get(source_slug)
-        target = self._patients.get(target_slug)
+        source = self._get(source_slug)
+        target = self._get(target_slug)
         
         if not source or not target:
             return False
@@ -185,26 +268,32 @@ class PatientRegistry:
         if source.nome_completo not in target.nomes_alternativos:
             target.nomes_alternativos.append(source.nome_completo)
         
-        # Remover paciente source
-        del self._patients[source_slug]
+        # Remover paciente source e gravar o target na mesma transação
+        if self._store is not None:
+            self._store.merge(source_slug, target)
+            self._forget(source_slug)
+            self._remember(target)
+        else:
+            self._delete(source_slug)
+            self._persist(target)
         
         LOGGER.info(f"Pacientes mesclados: {source.nome_completo} -> {target.nome_completo}")
         return True
 
     def detect_possible_duplicates(self, threshold: float = 0.85) -> List[Tuple[Patient, Patient, float]]:
         """Detecta possíveis pacientes duplicados."""
-        duplicates = []
-        patients_list = list(self._patients.values())
+        duplicates: List[Tuple[Patient, Patient, float]] = []
+        names_list = [(slug, names[0].lower()) for slug, names in self._name_index().items()]
         
-        for i, patient1 in enumerate(patients_list):
-            for patient2 in patients_list[i+1:]:
+        for i, (slug1, name1) in enumerate(names_list):
+            for slug2, name2 in names_list[i+1:]:
                 # Comparar nomes principais
-                name1 = _normalize_name(patient1.nome_completo).lower()
-                name2 = _normalize_name(patient2.nome_completo).lower()
-                
                 similarity = difflib.SequenceMatcher(None, name1, name2).ratio()
                 
                 if similarity >= threshold:
+                    patient1, patient2 = self._get(slug1), self._get(slug2)
+                    if patient1 is None or patient2 is None:
+                        continue  # Índice de nomes desatualizado
                     duplicates.append((patient1, patient2, similarity))
         
         # Ordenar por similaridade (maior primeiro)
@@ -213,7 +302,7 @@ class PatientRegistry:
 
     def update_patient(self, slug: str, nome_completo: str = None, genero: str = None, aliases: List[str] = None) -> bool:
         """Atualiza informações de um paciente."""
-        patient = self._patients.get(slug)
+        patient = self._get(slug)
         if not patient:
             return False
         
@@ -226,13 +315,14 @@ class PatientRegistry:
         if aliases is not None:
             patient.nomes_alternativos = aliases
         
+        self._persist(patient)
         return True
 
     def remove_patient(self, slug: str) -> bool:
         """Remove um paciente do registro."""
-        if slug in self._patients:
-            patient = self._patients[slug]
-            del self._patients[slug]
+        patient = self._get(slug)
+        if patient:
+            self._delete(slug)
             LOGGER.info(f"Paciente removido: {patient.nome_completo}")
             return True
         return False
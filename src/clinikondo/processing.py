@@ -2,24 +2,130 @@
 
 from __future__ import annotations
 
+import contextvars
 import io
 import logging
+import os
 import shutil
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Iterable, List
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
 
+from .backends import (
+    BackendEndpoint,
+    pool_for_config,
+    uses_backend_pool,
+    validate_transport,
+)
+from .classifier import append_training_example
 from .config import Config
+from .discovery import SUPPORTED_EXTENSIONS, DiscoveredFile, prefetch, scan_documents
 from .hash_tracker import HashTracker
 from .llm import BaseExtractor
-from .models import Document, DocumentProcessingError
+from .manifest import DUPLICATA, FALHA, ORGANIZADO, RunManifest, manifest_entry
+from .metrics import (
+    EXTRACAO,
+    HASH,
+    LLM,
+    OCR,
+    ORGANIZACAO,
+    DocumentMetrics,
+    RunMetrics,
+    current_metrics,
+    record_tokens,
+    record_upload,
+    set_extraction_method,
+    stage,
+    track,
+)
+from .models import Document, DocumentProcessingError, LLMExtractionResult
 from .patients import PatientRegistry
+from .ratelimit import estimate_tokens
+from .resilience import (
+    CircuitOpenError,
+    DeadlineExceeded,
+    check_deadline,
+    current_deadline,
+    document_deadline,
+    document_deadline_until,
+    request_timeout,
+)
 from .types import DocumentTypeCatalog
-from .utils import ensure_directory, sanitize_token, short_description, slugify, validate_safe_path
+from .utils import (
+    ensure_directory,
+    sanitize_token,
+    short_description,
+    slugify,
+    validate_safe_path,
+)
+
+if TYPE_CHECKING:
+    import openai
 
 LOGGER = logging.getLogger(__name__)
 
-SUPPORTED_EXTENSIONS = {".pdf", ".png", ".jpg", ".jpeg", ".tif", ".tiff", ".heic", ".txt"}
+
+class InMemoryDocument(NamedTuple):
+    """Documento recebido em memória: *path* é só o nome (formato, logs e manifesto)."""
+
+    path: Path
+    content: bytes | memoryview
+
+
+def as_buffer(data: bytes | bytearray | memoryview | BinaryIO) -> bytes | memoryview:
+    """Normaliza o conteúdo de um upload sem copiá-lo.
+
+    ``bytes`` passam direto, ``bytearray``/``memoryview`` viram uma
+    ``memoryview`` de bytes e objetos com ``read()`` são lidos uma única vez.
+    """
+    if hasattr(data, "read"):
+        data = data.read()
+    if isinstance(data, bytes):
+        return data
+    return memoryview(data).cast("B")
+
+
+def _as_bytes(content: bytes | memoryview) -> bytes:
+    """``bytes`` para bibliotecas que não aceitam ``memoryview`` (PyMuPDF); evita a cópia se possível."""
+    if isinstance(content, bytes):
+        return content
+    if isinstance(content.obj, bytes) and content.nbytes == len(content.obj):
+        return content.obj
+    return content.tobytes()
+
+
+def _binary_stream(content: bytes | memoryview) -> io.BytesIO:
+    # Com ``bytes``, o BytesIO compartilha o buffer em vez de copiá-lo
+    return io.BytesIO(_as_bytes(content))
+
+
+def _open_pdf(fitz: Any, path: Path, content: bytes | memoryview | None) -> Any:
+    if content is not None:
+        return fitz.open(stream=_as_bytes(content), filetype="pdf")
+    return fitz.open(path)
+
+
+# Nos modos longos (``--watch``, ``servir``), pacientes e hashes são gravados no máximo a cada N segundos
+STATE_FLUSH_INTERVAL = 30.0
+
+MULTIMODAL_OCR_PROMPT = (
+    "Extraia todo o texto visível nesta imagem de documento médico. "
+    "Retorne apenas o texto, preservando a formatação."
+)
 
 
 class DocumentProcessor:
@@ -31,82 +137,425 @@ class DocumentProcessor:
         extractor: BaseExtractor,
         patient_registry: PatientRegistry,
         type_catalog: DocumentTypeCatalog,
+        metrics: RunMetrics | None = None,
     ) -> None:
         self.config = config
         self.extractor = extractor
         self.patient_registry = patient_registry
         self.type_catalog = type_catalog
         self.hash_tracker = HashTracker(config.processed_hashes_path)
+        self.metrics = metrics or RunMetrics()
+        # Métricas de documentos já extraídos que aguardam o lote do LLM
+        self._metricas_pendentes: Dict[Path, DocumentMetrics] = {}
+        # Prazo absoluto de cada documento do lote, fixado no início da extração
+        self._prazos_pendentes: Dict[Path, Optional[float]] = {}
+        self._manifest: RunManifest | None = None
+        self._ultima_gravacao = time.monotonic()
+        # Recebe cada linha do manifesto (o modo ``servir`` acompanha os documentos enviados)
+        self.entry_listener: Callable[[Dict[str, Any]], None] | None = None
+
+    @property
+    def scan_options(self) -> Dict[str, Any]:
+        """Regras da varredura da entrada (também aplicadas aos eventos do modo ``--watch``)."""
+        return dict(
+            extensions=SUPPORTED_EXTENSIONS,
+            include=self.config.input_include,
+            exclude=self.config.input_exclude,
+            recursive=self.config.input_recursive,
+            skip_dirs=[self.config.output_dir],
+        )
 
-    def collect_documents(self) -> List[Path]:
-        documents: list[Path] = []
-        for path in sorted(self.config.input_dir.iterdir()):
-            if path.is_file() and path.suffix.lower() in SUPPORTED_EXTENSIONS:
-                documents.append(path)
-        return documents
+    def discover_documents(self) -> Iterator[DiscoveredFile]:
+        """Arquivos da entrada (recursivo, com ``--include``/``--exclude``) à medida que a varredura avança."""
+        return prefetch(scan_documents(self.config.input_dir, **self.scan_options))
+
+    def collect_documents(self) -> Iterator[Path]:
+        for found in self.discover_documents():
+            yield found.path
 
     def process_all(self) -> List[Document]:
-        processed: list[Document] = []
+        """Processa todos os documentos e retorna os organizados (ver :meth:`iter_process`)."""
+        return list(self.iter_process())
+
+    def process_bytes(self, data: bytes | bytearray | memoryview | BinaryIO, filename: str) -> Document | None:
+        """Processa um documento recebido em memória (upload), sem gravar arquivo temporário.
+
+        Hash, extração de texto (inclusive OCR), classificação e cópia para o
+        destino trabalham sobre o buffer; *filename* define o formato e o nome
+        registrado no manifesto. Retorna o documento organizado, ou ``None`` se
+        ele falhou ou é duplicata (o motivo fica no manifesto).
+        """
+        documents = self.iter_process([InMemoryDocument(Path(filename), as_buffer(data))])
+        try:
+            return next(documents, None)
+        finally:
+            documents.close()
+
+    def iter_process(
+        self,
+        files: Iterable[DiscoveredFile | InMemoryDocument] | None = None,
+        *,
+        finish: bool = True,
+    ) -> Generator[Document, None, None]:
+        """Processa os documentos da entrada, entregando cada um assim que é organizado.
+
+        O texto extraído é liberado depois que o documento é organizado, então
+        a memória não cresce com o tamanho da execução: quem precisa de todos
+        os detalhes lê o manifesto. Registro de pacientes, hashes, manifesto e
+        métricas são salvos ao final, mesmo que o consumidor pare antes.
+
+        *files* restringe o processamento a arquivos já descobertos (modo
+        ``--watch``) ou recebidos em memória (:class:`InMemoryDocument`);
+        chamadas sucessivas acumulam no mesmo manifesto e nas mesmas métricas.
+        Com ``finish=False`` (um ciclo de um modo longo), o manifesto fica
+        aberto, pacientes e hashes são gravados no máximo a cada
+        :data:`STATE_FLUSH_INTERVAL` segundos e o resto fica para :meth:`close`.
+        """
+        processed = 0
         skipped_duplicates = 0
+        batch_size = self.config.llm_batch_size
+        pending: list[Document] = []
         
-        for path in self.collect_documents():
-            LOGGER.info("Processando %s", path.name)
-            
-            # Verificar duplicata por hash (SRS 6.0 - Detecção de Duplicatas)
-            if not self.config.force_reprocess:
+        if self._manifest is None:
+            self._manifest = self._open_manifest()
+        try:
+            for item in self.discover_documents() if files is None else files:
+                path = item.path
+                if isinstance(item, InMemoryDocument):
+                    content, stat = item.content, None
+                else:
+                    content, stat = None, item.stat
+                LOGGER.info("Processando %s", path.name)
+                
+                # Verificar duplicata por hash (SRS 6.0 - Detecção de Duplicatas)
+                if self._is_known_duplicate(path, content):
+                    skipped_duplicates += 1
+                    continue
+                
+                if batch_size <= 1:
+                    document = None
+                    with track() as metrics:
+                        try:
+                            document = self._process_single(path, stat, content)
+                        except Exception as exc:  # pragma: no cover - logging de erro
+                            self._handle_document_error(path, exc, content)
+                            self._finish_document(path, metrics, error=exc)
+                        else:
+                            self._finish_document(path, metrics, document=document)
+                    if document is not None:
+                        processed += 1
+                        yield document
+                    continue
+                
+                # Modo lote: documentos curtos aguardam para compartilhar uma requisição ao LLM
+                metrics = DocumentMetrics()
                 try:
-                    file_hash = self.hash_tracker.calculate_hash(path)
-                    if self.hash_tracker.is_processed(file_hash):
-                        existing_record = self.hash_tracker.get_record(file_hash)
-                        self.hash_tracker.log_duplicate_detection(
-                            file_hash=file_hash,
-                            arquivo_novo=str(path),
-                            arquivo_original=existing_record.arquivo_original,
-                            tipo_duplicata="hash_identico",
-                            acao="processamento_pulado",
-                            custo_economizado="1_chamada_llm"
-                        )
-                        LOGGER.info(f"⏭️  Arquivo duplicado detectado (hash: {file_hash[:12]}...) - pulando processamento")
-                        skipped_duplicates += 1
-                        continue
-                except Exception as e:
-                    LOGGER.warning(f"Erro ao calcular hash de {path}: {e}. Processando normalmente.")
+                    with track(metrics), document_deadline(self.config.document_timeout):
+                        prazo = current_deadline()
+                        document = self._prepare_document(path, stat, content)
+                except Exception as exc:  # pragma: no cover - logging de erro
+                    self._handle_document_error(path, exc, content)
+                    self._finish_document(path, metrics, error=exc)
+                    continue
+                file_hash = document.hash_sha256
+                assert file_hash is not None  # _prepare_document sempre calcula o hash
+                if any(item.hash_sha256 == file_hash for item in pending):
+                    LOGGER.info(f"⏭️  Arquivo duplicado no lote atual (hash: {file_hash[:12]}...) - pulando processamento")
+                    self._write_manifest(manifest_entry(path, status=DUPLICATA, file_hash=file_hash))
+                    skipped_duplicates += 1
+                    continue
+                self._metricas_pendentes[path] = metrics
+                self._prazos_pendentes[path] = prazo
+                if len(document.texto_extraido or "") > self.config.llm_batch_max_chars:
+                    for placed in self._process_batch([document]):
+                        processed += 1
+                        yield placed
+                    continue
+                pending.append(document)
+                if len(pending) >= batch_size:
+                    lote, pending = pending, []
+                    for placed in self._process_batch(lote):
+                        processed += 1
+                        yield placed
             
+            if pending:
+                lote, pending = pending, []
+                for placed in self._process_batch(lote):
+                    processed += 1
+                    yield placed
+        finally:
+            self._metricas_pendentes.clear()
+            self._prazos_pendentes.clear()
+            self.metrics.duplicatas += skipped_duplicates
+            if skipped_duplicates > 0:
+                LOGGER.info(f"📊 {skipped_duplicates} duplicata(s) ignorada(s), {processed} documento(s) processado(s)")
+            if finish:
+                self.close()
+            else:
+                self._save_state(force=False)
+
+    def _save_state(self, *, force: bool = True) -> None:
+        """Grava pacientes e hashes (sem *force*, só se a última gravação tiver mais de STATE_FLUSH_INTERVAL)."""
+        agora = time.monotonic()
+        if not force and agora - self._ultima_gravacao < STATE_FLUSH_INTERVAL:
+            return
+        self.patient_registry.save()
+        self.hash_tracker.save()
+        self._ultima_gravacao = agora
+
+    def close(self) -> None:
+        """Encerra a execução: fecha o manifesto, grava o estado e salva as métricas.
+
+        :meth:`iter_process` chama ao terminar; nos modos longos, que processam
+        em ciclos com ``finish=False``, é chamado uma vez ao sair.
+        """
+        if self._manifest is not None:
+            self._manifest.close()
+            LOGGER.info("🧾 Manifesto da execução: %s (%d linha(s))", self._manifest.path, self._manifest.linhas)
+            self._manifest = None
+        self._save_state()
+        
+        extractor_stats = self.extractor.get_statistics()
+        if extractor_stats:
+            LOGGER.info("📊 Estatísticas do extrator: %s", extractor_stats)
+        
+        self.metrics.finish()
+        try:
+            metrics_path = self.metrics.save(self.config.metrics_dir)
+            LOGGER.info("📈 Métricas da execução salvas em %s", metrics_path)
+        except OSError as exc:
+            LOGGER.warning("Não foi possível salvar as métricas da execução: %s", exc)
+
+    def _open_manifest(self) -> RunManifest | None:
+        path = self.config.manifests_dir / f"execucao-{self.metrics.inicio.strftime('%Y%m%d-%H%M%S')}.jsonl"
+        try:
+            return RunManifest(path).open()
+        except OSError as exc:
+            LOGGER.warning("Não foi possível criar o manifesto da execução: %s", exc)
+            return None
+
+    def _write_manifest(self, entry: Dict[str, Any]) -> None:
+        if self.entry_listener is not None:
+            self.entry_listener(entry)
+        if self._manifest is None:
+            return
+        try:
+            self._manifest.write(entry)
+        except OSError as exc:
+            LOGGER.warning("Falha ao gravar o manifesto da execução: %s", exc)
+
+    def _finish_document(
+        self,
+        path: Path,
+        metrics: DocumentMetrics,
+        *,
+        document: Document | None = None,
+        error: BaseException | None = None,
+    ) -> None:
+        """Fecha as métricas do documento e registra a linha do manifesto."""
+        metrics.finish()
+        self.metrics.add(metrics, sucesso=error is None)
+        status = FALHA if error is not None else ORGANIZADO
+        self._write_manifest(manifest_entry(path, status=status, document=document, metrics=metrics, error=error))
+
+    def _is_known_duplicate(self, path: Path, content: bytes | memoryview | None = None) -> bool:
+        """Indica (e registra no log) se o arquivo já foi processado antes."""
+        if self.config.force_reprocess:
+            return False
+        try:
+            if content is not None:
+                file_hash = self.hash_tracker.calculate_hash_bytes(content)
+            else:
+                file_hash = self.hash_tracker.calculate_hash(path)
+            if self.hash_tracker.is_processed(file_hash):
+                existing_record = self.hash_tracker.get_record(file_hash)
+                self.hash_tracker.log_duplicate_detection(
+                    file_hash=file_hash,
+                    arquivo_novo=str(path),
+                    arquivo_original=existing_record.arquivo_original,
+                    tipo_duplicata="hash_identico",
+                    acao="processamento_pulado",
+                    custo_economizado="1_chamada_llm"
+                )
+                LOGGER.info(f"⏭️  Arquivo duplicado detectado (hash: {file_hash[:12]}...) - pulando processamento")
+                self._write_manifest(manifest_entry(path, status=DUPLICATA, file_hash=file_hash))
+                return True
+        except Exception as e:
+            LOGGER.warning(f"Erro ao calcular hash de {path}: {e}. Processando normalmente.")
+        return False
+
+    def prepare_all(self, skip_hashes: Iterable[str] = ()) -> Generator[Document, None, None]:
+        """Extrai o texto dos documentos pendentes, sem consultar o LLM.
+
+        Usado pelo modo lote (``processar --modo-lote``): a classificação é feita
+        depois, por um job assíncrono, e aplicada com :meth:`place_extracted`.
+        Os documentos são produzidos um a um; ``skip_hashes`` exclui conteúdos
+        que já estão em jobs enviados e ainda não aplicados.
+        """
+        seen = set(skip_hashes)
+        for path, stat in self.discover_documents():
+            if self._is_known_duplicate(path):
+                continue
+            try:
+                document = self._prepare_document(path, stat)
+            except Exception as exc:  # pragma: no cover - logging de erro
+                self._handle_document_error(path, exc)
+                continue
+            file_hash = document.hash_sha256
+            assert file_hash is not None  # _prepare_document sempre calcula o hash
+            if file_hash in seen:
+                LOGGER.info(f"⏭️  Arquivo duplicado no lote (hash: {file_hash[:12]}...) - pulando processamento")
+                continue
+            seen.add(file_hash)
+            yield document
+
+    def place_extracted(
+        self, items: Iterable[Tuple[Document, LLMExtractionResult | Exception]]
+    ) -> List[Document]:
+        """Organiza documentos já classificados (resultado ou erro por documento)."""
+        placed: list[Document] = []
+        for document, outcome in items:
+            path = document.caminho_entrada
             try:
-                document = self._process_single(path)
-                processed.append(document)
+                if isinstance(outcome, Exception):
+                    raise outcome
+                if self._is_known_duplicate(path):
+                    continue
+                placed.append(self._place_document(document, outcome))
             except Exception as exc:  # pragma: no cover - logging de erro
-                LOGGER.exception("Erro ao processar %s: %s", path.name, exc)
-                if self.config.executar_copia_apos_erro:
+                LOGGER.error("Erro ao processar %s: %s", path.name, exc)
+                if self.config.executar_copia_apos_erro and path.exists():
                     self._preserve_on_error(path)
-        
         self.patient_registry.save()
         self.hash_tracker.save()
+        return placed
+
+    def _process_single(
+        self, path: Path, stat: os.stat_result | None = None, content: bytes | memoryview | None = None
+    ) -> Document:
+        # O prazo vale para todo o trabalho remoto do documento (OCR + LLM)
+        with document_deadline(self.config.document_timeout):
+            document = self._prepare_document(path, stat, content)
+            with stage(LLM):
+                extractor_result = self.extractor.extract(
+                    document,
+                    patient_registry=self.patient_registry,
+                    type_catalog=self.type_catalog,
+                )
+        return self._place_document(document, extractor_result)
+
+    def _handle_document_error(
+        self, path: Path, exc: Exception, content: bytes | memoryview | None = None
+    ) -> None:
+        """Registra a falha; prazo excedido sempre manda o arquivo para ``falhas``."""
+        if isinstance(exc, DeadlineExceeded):
+            LOGGER.error("⏱️  Prazo de %ss excedido para %s: %s", self.config.document_timeout, path.name, exc)
+        else:
+            LOGGER.exception("Erro ao processar %s: %s", path.name, exc)
+        if self.config.executar_copia_apos_erro or isinstance(exc, DeadlineExceeded):
+            self._preserve_on_error(path, content)
+
+    def _process_batch(self, documents: List[Document]) -> Iterator[Document]:
+        """Classifica vários documentos com uma única chamada ao extrator.
+
+        A chamada compartilhada respeita o prazo mais curto do lote; a extração
+        individual (fallback) usa o prazo de cada documento.
+        """
+        lote = DocumentMetrics()  # Tempo, tokens e bytes da requisição compartilhada
+        prazos = [self._prazos_pendentes.pop(document.caminho_entrada, None) for document in documents]
+        results: List[Optional[LLMExtractionResult]]
+        try:
+            prazo_lote = min((prazo for prazo in prazos if prazo is not None), default=None)
+            with track(lote), stage(LLM), document_deadline_until(prazo_lote):
+                results = list(self.extractor.extract_batch(
+                    documents,
+                    patient_registry=self.patient_registry,
+                    type_catalog=self.type_catalog,
+                ))
+            if len(results) != len(documents):
+                raise ValueError(f"{len(results)} resultado(s) para {len(documents)} documento(s)")
+        except Exception as exc:
+            LOGGER.warning(f"Falha na extração em lote ({len(documents)} documentos): {exc}. Extraindo individualmente.")
+            results = [None] * len(documents)
         
-        if skipped_duplicates > 0:
-            LOGGER.info(f"📊 {skipped_duplicates} duplicata(s) ignorada(s), {len(processed)} documento(s) processado(s)")
-        
-        return processed
+        for document, extractor_result, prazo in zip(documents, results, prazos, strict=True):
+            path = document.caminho_entrada
+            metrics = self._metricas_pendentes.pop(path, None) or DocumentMetrics()
+            metrics.absorb(lote, 1 / len(documents))
+            placed = None
+            with track(metrics):
+                try:
+                    if extractor_result is None:
+                        with stage(LLM), document_deadline_until(prazo):
+                            extractor_result = self.extractor.extract(
+                                document,
+                                patient_registry=self.patient_registry,
+                                type_catalog=self.type_catalog,
+                            )
+                    placed = self._place_document(document, extractor_result)
+                except Exception as exc:  # pragma: no cover - logging de erro
+                    self._handle_document_error(path, exc, document.conteudo)
+                    self._finish_document(path, metrics, document=document, error=exc)
+                    document.texto_extraido = ""
+                    document.conteudo = None
+                else:
+                    self._finish_document(path, metrics, document=document)
+            if placed is not None:
+                yield placed
 
-    def _process_single(self, path: Path) -> Document:
+    def _prepare_document(
+        self, path: Path, stat: os.stat_result | None = None, content: bytes | memoryview | None = None
+    ) -> Document:
+        """Valida o arquivo, calcula o hash e extrai o texto.
+
+        *stat* vem da varredura, se houver; com *content*, tudo é feito sobre o
+        buffer em memória e *path* é só o nome do documento.
+        """
         # Validar arquivo antes do processamento
-        validation_errors = self._validate_file(path)
+        size = len(content) if content is not None else None
+        validation_errors = self._validate_file(path, stat, size=size)
         if validation_errors:
             error_msg = f"Arquivo {path.name} falhou na validação: {'; '.join(validation_errors)}"
             LOGGER.warning(error_msg)
             raise DocumentProcessingError(error_msg)
         
         # Calcular hash do arquivo (SRS 6.0 - Detecção de Duplicatas)
-        file_hash = self.hash_tracker.calculate_hash(path)
+        with stage(HASH):
+            if content is not None:
+                file_hash = self.hash_tracker.calculate_hash_bytes(content)
+            else:
+                file_hash = self.hash_tracker.calculate_hash(path)
         
-        document = Document(caminho_entrada=path)
+        document = Document(caminho_entrada=path, conteudo=content)
         document.hash_sha256 = file_hash
-        document.texto_extraido = self._extract_text(path)
-        extractor_result = self.extractor.extract(
-            document,
-            patient_registry=self.patient_registry,
-            type_catalog=self.type_catalog,
-        )
+        with stage(EXTRACAO):
+            document.texto_extraido = self._extract_text(path, content)
+        document.chars_extraidos = len(document.texto_extraido)
+        metrics = current_metrics()
+        if metrics is not None and metrics.metodo_extracao:
+            document.metodo_extracao = metrics.metodo_extracao
+            document.ocr_aplicado = metrics.metodo_extracao.startswith("ocr")
+        return document
+
+    def _place_document(self, document: Document, extractor_result: LLMExtractionResult) -> Document:
+        """Aplica o resultado da extração e copia/move o documento para o destino."""
+        with stage(ORGANIZACAO):
+            self._organize_document(document, extractor_result)
+        # O texto já não é necessário: liberar mantém a memória constante em execuções longas
+        document.texto_extraido = ""
+        document.resposta_bruta_llm = None
+        document.conteudo = None
+        metrics = current_metrics()
+        if metrics is not None:
+            document.tempo_processamento_ms = int(metrics.elapsed() * 1000)
+            llm = metrics.etapas.get(LLM)
+            document.tentativas_llm = round(llm.tentativas) if llm is not None else 0
+        return document
+
+    def _organize_document(self, document: Document, extractor_result: LLMExtractionResult) -> None:
+        path = document.caminho_entrada
+        file_hash = document.hash_sha256
+        assert file_hash is not None  # _prepare_document sempre calcula o hash
         document.aplicar_extracao(extractor_result)
         if not document.descricao_curta:
             document.descricao_curta = short_description(document.texto_extraido)
@@ -136,7 +585,7 @@ class DocumentProcessor:
         
         document.caminho_destino = destination_path
         if not self.config.dry_run:
-            self._move_document(document.caminho_entrada, destination_path)
+            self._move_document(document.caminho_entrada, destination_path, document.conteudo)
             
             # Registrar hash processado (SRS 6.0 - Rastreamento de Hashes)
             self.hash_tracker.add_record(
@@ -146,6 +595,14 @@ class DocumentProcessor:
                 paciente_slug=patient.slug_diretorio,
                 tipo_documento=document.tipo_documento
             )
+            
+            # Resultados do LLM alimentam o classificador local (treinar-classificador); opt-in,
+            # pois o arquivo guarda uma cópia do texto dos documentos
+            if self.config.collect_training_examples and document.dados_extraidos.get("extrator") == "llm":
+                try:
+                    append_training_example(self.config.training_examples_path, document)
+                except OSError as exc:
+                    LOGGER.warning("Não foi possível registrar exemplo de treino: %s", exc)
         
         # Log adequado conforme a ação realizada
         if self.config.dry_run:
@@ -154,7 +611,6 @@ class DocumentProcessor:
             action = "copiado para" if not self.config.mover_arquivo_original else "movido para"
         
         document.log_processamento = f"Documento {action} {destination_path}"
-        return document
 
     def _resolve_patient(self, document: Document):
         inferred_name = document.nome_paciente_inferido or "Compartilhado"
@@ -213,19 +669,25 @@ class DocumentProcessor:
                 return candidate
             counter += 1
 
-    def _move_document(self, source: Path, destination: Path) -> None:
-        """Move ou copia o documento conforme configuração."""
+    def _move_document(
+        self, source: Path, destination: Path, content: bytes | memoryview | None = None
+    ) -> None:
+        """Move ou copia o documento conforme configuração (em memória, grava o buffer)."""
         # Validar caminho de destino para prevenir traversal
         validate_safe_path(destination, self.config.output_dir)
         
-        if self.config.mover_arquivo_original:
+        if content is not None:
+            # Documento recebido em memória: não há original para copiar ou mover
+            with destination.open("wb") as handle:
+                handle.write(content)
+        elif self.config.mover_arquivo_original:
             # Move o arquivo (deleta original)
             shutil.move(source, destination)
         else:
             # Copia o arquivo (preserva original) - comportamento padrão
             shutil.copy2(source, destination)
 
-    def _preserve_on_error(self, source: Path) -> None:
+    def _preserve_on_error(self, source: Path, content: bytes | memoryview | None = None) -> None:
         destino_base = self.config.output_dir / "falhas"
         ensure_directory(destino_base)
         destino = destino_base / source.name
@@ -237,25 +699,36 @@ class DocumentProcessor:
         # Validar caminho de destino para prevenir traversal
         validate_safe_path(destino, self.config.output_dir)
         
-        shutil.copy2(source, destino)
+        if content is not None:
+            destino.write_bytes(content)
+        else:
+            shutil.copy2(source, destino)
 
-    def _extract_text(self, path: Path) -> str:
+    def _extract_text(self, path: Path, content: bytes | memoryview | None = None) -> str:
         try:
             if path.suffix.lower() == ".txt":
-                text = path.read_text(encoding="utf-8")
+                set_extraction_method("texto")
+                text = str(content, "utf-8") if content is not None else path.read_text(encoding="utf-8")
                 return text
             elif path.suffix.lower() == ".pdf":
-                return self._extract_text_pdf(path)
+                return self._extract_text_pdf(path, content)
             elif path.suffix.lower() in {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".heic"}:
-                return self._extract_text_image(path)
+                set_extraction_method("ocr_traditional")
+                with stage(OCR):
+                    return self._extract_text_image(path, content)
             else:
+                set_extraction_method("texto")
+                if content is not None:
+                    return str(content, "utf-8", errors="ignore")
                 text = path.read_text(encoding="utf-8", errors="ignore")
                 return text
+        except DeadlineExceeded:
+            raise
         except Exception as exc:
             LOGGER.warning("Falha ao extrair texto de %s: %s", path.name, exc)
             return ""
 
-    def _extract_text_pdf(self, path: Path) -> str:
+    def _extract_text_pdf(self, path: Path, content: bytes | memoryview | None = None) -> str:
         """Extrai texto de PDF seguindo a estratégia configurada."""
         strategy = self.config.ocr_strategy
         
@@ -264,10 +737,10 @@ class DocumentProcessor:
             import PyPDF2  # type: ignore
         except ImportError:
             LOGGER.debug("PyPDF2 não instalado")
-            return self._apply_ocr_strategy(path, strategy, pypdf2_failed=True)
+            return self._apply_ocr_strategy(path, strategy, pypdf2_failed=True, content=content)
         
         text_parts: list[str] = []
-        with path.open("rb") as pdf_file:
+        with _binary_stream(content) if content is not None else path.open("rb") as pdf_file:
             reader = PyPDF2.PdfReader(pdf_file)
             for page in reader.pages:
                 text_parts.append(page.extract_text() or "")
@@ -280,42 +753,56 @@ class DocumentProcessor:
         # Se não conseguiu extrair texto, aplicar estratégia OCR
         if not extracted_text:
             LOGGER.info("PDF sem texto embutido detectado, tentando OCR: %s", path.name)
-            return self._apply_ocr_strategy(path, strategy, pypdf2_failed=True)
+            return self._apply_ocr_strategy(path, strategy, pypdf2_failed=True, content=content)
         
+        set_extraction_method("pypdf2")
         return extracted_text
     
-    def _apply_ocr_strategy(self, path: Path, strategy: str, pypdf2_failed: bool = False) -> str:
+    def _apply_ocr_strategy(
+        self,
+        path: Path,
+        strategy: str,
+        pypdf2_failed: bool = False,
+        content: bytes | memoryview | None = None,
+    ) -> str:
         """Aplica estratégia de OCR conforme configuração."""
-        if strategy == "multimodal":
-            # Apenas multimodal
-            return self._extract_text_pdf_with_multimodal_ocr(path)
-        
-        elif strategy == "traditional":
-            # Apenas OCR tradicional
-            return self._extract_text_pdf_with_ocr(path)
-        
-        else:  # hybrid (padrão)
-            # Tenta multimodal primeiro, fallback para traditional
-            try:
-                text = self._extract_text_pdf_with_multimodal_ocr(path)
-                if text and len(text.strip()) > 0:
-                    return text
-            except Exception as exc:
-                LOGGER.debug("Multimodal OCR falhou, tentando traditional: %s", exc)
+        with stage(OCR):
+            if strategy == "multimodal":
+                # Apenas multimodal
+                set_extraction_method("ocr_multimodal")
+                return self._extract_text_pdf_with_multimodal_ocr(path, content)
+            
+            elif strategy == "traditional":
+                # Apenas OCR tradicional
+                set_extraction_method("ocr_traditional")
+                return self._extract_text_pdf_with_ocr(path, content)
             
-            # Fallback para traditional
-            return self._extract_text_pdf_with_ocr(path)
+            else:  # hybrid (padrão)
+                # Tenta multimodal primeiro, fallback para traditional
+                try:
+                    text = self._extract_text_pdf_with_multimodal_ocr(path, content)
+                    if text and len(text.strip()) > 0:
+                        set_extraction_method("ocr_multimodal")
+                        return text
+                except DeadlineExceeded:
+                    raise
+                except Exception as exc:
+                    LOGGER.debug("Multimodal OCR falhou, tentando traditional: %s", exc)
+                
+                # Fallback para traditional
+                set_extraction_method("ocr_traditional")
+                return self._extract_text_pdf_with_ocr(path, content)
 
     @staticmethod
-    def _extract_text_image(path: Path) -> str:
+    def _extract_text_image(path: Path, content: bytes | memoryview | None = None) -> str:
         try:
-            from PIL import Image  # type: ignore
             import pytesseract  # type: ignore
+            from PIL import Image  # type: ignore
         except ImportError:  # pragma: no cover - depende de pip
             LOGGER.debug("Bibliotecas de OCR não instaladas, texto vazio para %s", path)
             return ""
         
-        with Image.open(path) as img:
+        with Image.open(_binary_stream(content) if content is not None else path) as img:
             extracted_text = pytesseract.image_to_string(img, lang='por')
             
             # Log detalhado em modo debug
@@ -331,12 +818,12 @@ class DocumentProcessor:
             return extracted_text
 
     @staticmethod
-    def _extract_text_pdf_with_ocr(path: Path) -> str:
+    def _extract_text_pdf_with_ocr(path: Path, content: bytes | memoryview | None = None) -> str:
         """Extrai texto de PDF escaneado usando OCR tradicional."""
         try:
             import fitz  # PyMuPDF
-            from PIL import Image  # type: ignore
             import pytesseract  # type: ignore
+            from PIL import Image  # type: ignore
         except ImportError:  # pragma: no cover - depende de pip
             LOGGER.debug("Bibliotecas de OCR/PDF não instaladas para %s", path)
             return ""
@@ -344,11 +831,12 @@ class DocumentProcessor:
         text_parts: list[str] = []
         
         # Abre o PDF com PyMuPDF
-        with fitz.open(path) as doc:
+        with _open_pdf(fitz, path, content) as doc:
             total_pages = len(doc)
             LOGGER.debug("Iniciando OCR tradicional em PDF com %d páginas: %s", total_pages, path.name)
             
             for page_num in range(total_pages):
+                check_deadline(f"OCR da página {page_num + 1}")
                 page = doc.load_page(page_num)
                 
                 # Converte página para imagem
@@ -374,135 +862,145 @@ class DocumentProcessor:
         LOGGER.info("OCR tradicional concluído para %s: %d caracteres extraídos", path.name, len(final_text))
         return final_text
     
-    def _extract_text_pdf_with_multimodal_ocr(self, path: Path) -> str:
+    def _extract_text_pdf_with_multimodal_ocr(self, path: Path, content: bytes | memoryview | None = None) -> str:
         """Extrai texto de PDF escaneado usando LLM multimodal (ex: GPT-4 Vision)."""
         try:
+            import base64
+
             import fitz  # PyMuPDF
             from PIL import Image  # type: ignore
-            import base64
-            from openai import OpenAI  # type: ignore
+            if self.config.llm_provider != "ollama":
+                import openai  # type: ignore  # noqa: F401
         except ImportError:  # pragma: no cover - depende de pip
             LOGGER.debug("Bibliotecas necessárias para OCR multimodal não instaladas")
             raise RuntimeError("Bibliotecas necessárias para OCR multimodal não instaladas")
         
         # Validar segurança da transmissão de dados médicos
-        api_base = self.config.effective_ocr_api_base or "https://api.openai.com/v1"
-        
-        # Permitir localhost/127.0.0.1 HTTP para Ollama local
-        is_localhost = any(host in api_base for host in ["localhost", "127.0.0.1"])
-        if not api_base.startswith("https://") and not is_localhost:
-            raise RuntimeError(
-                f"Transmissão insegura detectada: API base deve usar HTTPS para proteger dados médicos. "
-                f"URL atual: {api_base}. Configure uma URL HTTPS segura ou use localhost para testes."
-            )
+        native = self.config.llm_provider == "ollama"
+        default_base = "http://localhost:11434" if native else "https://api.openai.com/v1"
+        api_base = self.config.effective_ocr_api_base or default_base
         
-        if not self.config.effective_ocr_api_key:
-            raise RuntimeError("API key não configurada para OCR multimodal")
+        # Permitir localhost/127.0.0.1 HTTP para Ollama local (endpoints de --backends são validados na configuração)
+        if not uses_backend_pool(self.config, self.config.effective_ocr_api_base):
+            try:
+                validate_transport(api_base)
+            except ValueError as exc:
+                raise RuntimeError(str(exc)) from exc
+            
+            if not self.config.effective_ocr_api_key and not native:
+                raise RuntimeError("API key não configurada para OCR multimodal")
         
-        # Configurar timeout usando httpx.Timeout
-        try:
-            import httpx  # type: ignore
-        except ImportError:
-            LOGGER.warning("httpx não instalado, usando timeout padrão")
-            httpx = None
-        
-        if httpx:
-            timeout_config = httpx.Timeout(
-                connect=30.0,  # Timeout para conexão
-                read=self.config.llm_timeout,  # Timeout para leitura (padrão: 240s)
-                write=30.0,  # Timeout para escrita
-                pool=30.0  # Timeout para pool de conexões
-            )
-            client = OpenAI(
-                api_key=self.config.effective_ocr_api_key,
-                base_url=api_base,
-                timeout=timeout_config
-            )
+        if native:
+            from .ollama import ocr_page_native
         else:
-            client = OpenAI(
-                api_key=self.config.effective_ocr_api_key,
-                base_url=api_base
-            )
+            # Mesmo pool/limitadores do extrator (taxa, concorrência e failover compartilhados)
+            pool = pool_for_config(self.config, self.config.effective_ocr_api_base, self.config.effective_ocr_api_key)
+        # Usa o modelo OCR específico se configurado, senão usa o modelo principal
+        ocr_model = self.config.effective_ocr_model or self.config.modelo_llm
+        max_tokens = self.config.llm_max_tokens * 2  # Mais tokens para OCR
         
-        text_parts: list[str] = []
+        def ocr_page(page_num: int, total_pages: int, img_base64: str) -> str:
+            def create(client: openai.OpenAI, endpoint: BackendEndpoint) -> Any:
+                record_upload(len(img_base64) + len(MULTIMODAL_OCR_PROMPT))
+                return client.chat.completions.create(
+                    model=endpoint.ocr_model or ocr_model,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {"type": "text", "text": MULTIMODAL_OCR_PROMPT},
+                                {
+                                    "type": "image_url",
+                                    "image_url": {"url": f"data:image/png;base64,{img_base64}"}
+                                }
+                            ]
+                        }
+                    ],
+                    max_tokens=max_tokens,
+                    temperature=0.0,  # Determinístico para OCR
+                    timeout=request_timeout(self.config.llm_timeout),
+                )
+            
+            try:
+                if native:
+                    page_text = ocr_page_native(
+                        self.config, ocr_model, img_base64, MULTIMODAL_OCR_PROMPT, max_tokens, api_base
+                    )
+                else:
+                    response = pool.call(
+                        create,
+                        estimated_tokens=estimate_tokens("", max_tokens) + 1000,  # ~1k tokens por imagem
+                        description=f"OCR da página {page_num + 1}",
+                    )
+                    usage = getattr(response, "usage", None)
+                    record_tokens(getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None))
+                    page_text = response.choices[0].message.content or ""
+            except (DeadlineExceeded, CircuitOpenError):
+                raise  # Sem sentido tentar as demais páginas
+            except Exception as page_exc:
+                LOGGER.error(f"Falha ao processar página {page_num + 1} com OCR multimodal: {page_exc}")
+                return ""  # Continuar com as demais páginas mesmo após falha
+            
+            if LOGGER.isEnabledFor(logging.DEBUG):
+                char_count = len(page_text.strip())
+                if char_count > 0:
+                    preview = page_text[:150] + "..." if len(page_text) > 150 else page_text
+                    LOGGER.debug("✓ OCR multimodal página %d/%d (%d chars): %s", page_num + 1, total_pages, char_count, preview)
+                else:
+                    LOGGER.debug("✓ OCR multimodal página %d/%d: nenhum texto encontrado", page_num + 1, total_pages)
+            return page_text
         
-        with fitz.open(path) as doc:
+        # As páginas são enviadas em paralelo; o limitador decide quantas ficam em voo
+        futures = []
+        with _open_pdf(fitz, path, content) as doc, ThreadPoolExecutor(max_workers=self.config.llm_max_concurrency) as executor:
             total_pages = len(doc)
             LOGGER.debug("Iniciando OCR multimodal em PDF com %d páginas: %s", total_pages, path.name)
             
             for page_num in range(total_pages):
                 page = doc.load_page(page_num)
                 
-                # Converte página para imagem
+                # Converte página para imagem e codifica em base64
                 pix = page.get_pixmap()
-                img_data = pix.tobytes("png")
-                
-                # Encode para base64
-                img_base64 = base64.b64encode(img_data).decode('utf-8')
-                
-                # Retry com delay configurável para cada página
-                page_text = ""
-                for attempt in range(1, self.config.llm_max_retries + 1):
-                    try:
-                        LOGGER.debug(f"OCR página {page_num + 1}/{total_pages} - Tentativa {attempt}/{self.config.llm_max_retries}")
-                        
-                        # Chama LLM multimodal para extrair texto
-                        # Usa o modelo OCR específico se configurado, senão usa o modelo principal
-                        ocr_model = self.config.effective_ocr_model or self.config.modelo_llm
-                        response = client.chat.completions.create(
-                            model=ocr_model,
-                            messages=[
-                                {
-                                    "role": "user",
-                                    "content": [
-                                        {"type": "text", "text": "Extraia todo o texto visível nesta imagem de documento médico. Retorne apenas o texto, preservando a formatação."},
-                                        {
-                                            "type": "image_url",
-                                            "image_url": {"url": f"data:image/png;base64,{img_base64}"}
-                                        }
-                                    ]
-                                }
-                            ],
-                            max_tokens=self.config.llm_max_tokens * 2,  # Mais tokens para OCR
-                            temperature=0.0  # Determinístico para OCR
-                        )
-                        
-                        page_text = response.choices[0].message.content or ""
-                        text_parts.append(page_text)
-                        
-                        if LOGGER.isEnabledFor(logging.DEBUG):
-                            char_count = len(page_text.strip())
-                            if char_count > 0:
-                                preview = page_text[:150] + "..." if len(page_text) > 150 else page_text
-                                LOGGER.debug("✓ OCR multimodal página %d/%d (%d chars): %s", page_num + 1, total_pages, char_count, preview)
-                            else:
-                                LOGGER.debug("✓ OCR multimodal página %d/%d: nenhum texto encontrado", page_num + 1, total_pages)
-                        
-                        break  # Sucesso, sair do loop de retry
-                    
-                    except Exception as page_exc:
-                        LOGGER.warning(f"Tentativa {attempt}/{self.config.llm_max_retries} falhou para página {page_num + 1}: {page_exc}")
-                        if attempt < self.config.llm_max_retries:
-                            LOGGER.info(f"Aguardando {self.config.llm_retry_delay}s antes de tentar novamente...")
-                            time.sleep(self.config.llm_retry_delay)
-                        else:
-                            LOGGER.error(f"Falha ao processar página {page_num + 1} com OCR multimodal após {self.config.llm_max_retries} tentativas")
-                            # Continuar com próxima página mesmo após falha
+                img_base64 = base64.b64encode(pix.tobytes("png")).decode('utf-8')
+                # copy_context: as threads herdam o prazo do documento
+                futures.append(
+                    executor.submit(contextvars.copy_context().run, ocr_page, page_num, total_pages, img_base64)
+                )
+            
+            try:
+                text_parts = [future.result() for future in futures]
+            except (DeadlineExceeded, CircuitOpenError):
+                # Cancela as páginas que ainda não começaram
+                for future in futures:
+                    future.cancel()
+                raise
+        text_parts = [part for part in text_parts if part]
         
         final_text = "\n".join(text_parts)
         LOGGER.info("OCR multimodal concluído para %s: %d caracteres extraídos", path.name, len(final_text))
         return final_text
 
-    def _validate_file(self, file_path: Path) -> List[str]:
-        """Valida um arquivo conforme as regras do SRS do CliniKondo."""
+    def _validate_file(
+        self, file_path: Path, stat: os.stat_result | None = None, *, size: int | None = None
+    ) -> List[str]:
+        """Valida um arquivo conforme as regras do SRS do CliniKondo.
+
+        *stat* (da varredura) evita um novo ``stat`` do arquivo; *size* é usado
+        para documentos em memória, que não têm arquivo.
+        """
         errors = []
         
-        if not file_path.exists():
-            errors.append(f"Arquivo não encontrado: {file_path}")
-            return errors
+        if size is None:
+            if stat is None:
+                try:
+                    stat = file_path.stat()
+                except FileNotFoundError:
+                    errors.append(f"Arquivo não encontrado: {file_path}")
+                    return errors
+            size = stat.st_size
         
         # Verificar tamanho (limite de 50MB)
-        size_mb = file_path.stat().st_size / (1024 * 1024)
+        size_mb = size / (1024 * 1024)
         if size_mb > 50:
             errors.append(f"Arquivo muito grande: {size_mb:.1f}MB (máximo: 50MB)")
         
@@ -521,7 +1019,7 @@ class DocumentProcessor:
             errors.append(f"Nome de arquivo muito longo: {len(file_path.name)} caracteres (máximo: 255)")
         
         # Verificar se arquivo não está vazio
-        if file_path.stat().st_size == 0:
+        if size == 0:
             errors.append("Arquivo está vazio")
         
         return errors
@@ -0,0 +1,180 @@
+"""Compactação do texto extraído para caber no orçamento de tokens do prompt.
+
+Um laudo de 60 páginas vira um prompt enorme, cheio de ruído de OCR,
+cabeçalhos repetidos e linhas em branco. Antes de montar o prompt, o texto:
+
+1. tem espaços colapsados e linhas sem informação (lixo de OCR, linhas só com
+   pontuação) removidas;
+2. perde as repetições de cabeçalhos/rodapés de página (linhas idênticas que
+   se repetem várias vezes e marcadores como "Página 3 de 60", cujos números
+   são ignorados); linhas que só diferem nos valores ("Dose 1", "Dose 2",
+   "Glicose: 92 mg/dL") são mantidas;
+3. se ainda passar do orçamento, mantém o início do documento (primeira
+   página) e as linhas mais informativas — rótulos de paciente, datas, tipo de
+   exame, conclusão — com uma linha de contexto, na ordem original.
+
+O tamanho é medido com :func:`clinikondo.ratelimit.estimate_tokens`, o mesmo
+estimador local usado pelo limitador de taxa.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from typing import List, Set
+
+from .ratelimit import estimate_tokens
+from .utils import strip_accents
+
+DEFAULT_PROMPT_TOKEN_BUDGET = 3000
+
+# Fração do orçamento reservada ao início do documento
+HEAD_SHARE = 0.4
+
+# Linhas que se repetem ao menos isso são tratadas como cabeçalho/rodapé
+REPEATED_LINE_MIN = 3
+
+
+GAP_MARKER = "[...]"
+
+# Linhas longas (texto de PDF sem quebras) são divididas para a seleção ter granularidade
+MAX_LINE_CHARS = 300
+
+_SPACES = re.compile(r"[ \t\u00a0\u200b]+")
+_DIGITS = re.compile(r"\d+")
+# Marcadores de página ("Página 3 de 60", "Pág. 3/60", "3 / 60", "- 3 -"): só neles os números são ignorados
+_PAGE_MARKER = re.compile(
+    r"^[-–—\s]*(?:(?:p[aá]gina|p[aá]g\.?|page|folha|fls?\.?)\s*)?\d{1,3}(?:\s*(?:de|of|/)\s*\d{1,3})?[-–—\s]*$",
+    re.IGNORECASE,
+)
+_DATE = re.compile(r"\b\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}\b|\b20\d{2}-\d{2}-\d{2}\b")
+_INFORMATIVE = re.compile(
+    r"\b(?:paciente|nome|data|emissao|coleta|atendimento|nascimento|laudo|exame|resultado|"
+    r"conclusao|impressao|diagnostico|receita|prescricao|solicitante|medico|crm|especialidade|"
+    r"atestado|vacina|relatorio|cirurgia|internacao)\b",
+    re.IGNORECASE,
+)
+
+
+def _is_noise(line: str) -> bool:
+    """Linha sem informação útil (vazia, só pontuação ou lixo típico de OCR)."""
+    alnum = sum(char.isalnum() for char in line)
+    if alnum < 2:
+        return True
+    return alnum / len(line) < 0.4
+
+
+def _line_key(line: str) -> str:
+    """Chave de repetição: a própria linha; em marcadores de página os números são ignorados."""
+    key = line.lower()
+    if _PAGE_MARKER.match(key):
+        key = _DIGITS.sub("#", key)
+    return key
+
+
+def _split_long(line: str) -> List[str]:
+    if len(line) <= MAX_LINE_CHARS:
+        return [line]
+    pieces: List[str] = []
+    while len(line) > MAX_LINE_CHARS:
+        cut = line.rfind(" ", 0, MAX_LINE_CHARS)
+        if cut <= 0:
+            cut = MAX_LINE_CHARS
+        pieces.append(line[:cut].rstrip())
+        line = line[cut:].lstrip()
+    if line:
+        pieces.append(line)
+    return pieces
+
+
+def clean_text(text: str) -> List[str]:
+    """Linhas normalizadas, sem ruído e sem cabeçalhos/rodapés repetidos."""
+    lines = [
+        piece
+        for raw in text.splitlines()
+        for piece in _split_long(_SPACES.sub(" ", raw).strip())
+        if not _is_noise(piece)
+    ]
+    counts = Counter(_line_key(line) for line in lines)
+    seen: Set[str] = set()
+    cleaned: List[str] = []
+    for line in lines:
+        key = _line_key(line)
+        if counts[key] >= REPEATED_LINE_MIN or (cleaned and _line_key(cleaned[-1]) == key):
+            if key in seen:
+                continue
+        seen.add(key)
+        cleaned.append(line)
+    return cleaned
+
+
+def _score(line: str) -> int:
+    normalized = strip_accents(line)
+    score = 0
+    if _INFORMATIVE.search(normalized):
+        score += 2
+    if _DATE.search(line):
+        score += 2
+    if ":" in line:
+        score += 1  # "Rótulo: valor"
+    return score
+
+
+def _tokens(lines: List[str]) -> int:
+    return sum(estimate_tokens(line) + 1 for line in lines)
+
+
+def compact_document_text(text: str, token_budget: int = DEFAULT_PROMPT_TOKEN_BUDGET) -> str:
+    """Texto limpo que cabe em *token_budget* tokens (0 = só limpeza, sem limite)."""
+    lines = clean_text(text)
+    if token_budget <= 0 or _tokens(lines) <= token_budget:
+        return "\n".join(lines)
+
+    selected: Set[int] = set()
+    # Cada trecho omitido vira um GAP_MARKER; de início, o documento inteiro é um trecho
+    marker_cost = estimate_tokens(GAP_MARKER) + 1
+    used = marker_cost
+
+    def omitted(index: int) -> bool:
+        return 0 <= index < len(lines) and index not in selected
+
+    def cost_of(index: int) -> int:
+        """Tokens da linha mais a variação no número de marcadores ao selecioná-la."""
+        before, after = omitted(index - 1), omitted(index + 1)
+        markers = 1 if before and after else (-1 if not before and not after else 0)
+        return estimate_tokens(lines[index]) + 1 + markers * marker_cost
+
+    # 1. Início do documento (primeira página: paciente, data e tipo costumam estar aí)
+    head_budget = token_budget * HEAD_SHARE
+    for index in range(len(lines)):
+        cost = cost_of(index)
+        if used + cost > head_budget:
+            break
+        selected.add(index)
+        used += cost
+
+    # 2. Linhas mais informativas do restante, com uma linha de contexto de cada lado
+    ranked = sorted(
+        (index for index in range(len(lines)) if index not in selected and _score(lines[index]) > 0),
+        key=lambda index: (-_score(lines[index]), index),
+    )
+    for index in ranked:
+        for neighbour in (index, index + 1, index - 1):
+            if neighbour in selected or not 0 <= neighbour < len(lines):
+                continue
+            cost = cost_of(neighbour)
+            if used + cost > token_budget:
+                continue
+            selected.add(neighbour)
+            used += cost
+
+    parts: List[str] = []
+    previous = -1
+    for index in sorted(selected):
+        if index != previous + 1:
+            parts.append(GAP_MARKER)
+        parts.append(lines[index])
+        previous = index
+    if previous != len(lines) - 1:
+        parts.append(GAP_MARKER)
+    return "\n".join(parts)
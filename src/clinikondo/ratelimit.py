@@ -0,0 +1,422 @@
+"""Limitação de taxa e concorrência adaptativa para chamadas aos endpoints LLM.
+
+Cada endpoint (``api_base``) tem um :class:`AdaptiveRateLimiter` compartilhado
+entre o extrator de classificação e o OCR multimodal. Ele combina:
+
+- dois *token buckets* (requisições/min e tokens/min) configuráveis;
+- um controle de concorrência AIMD: +1 vaga a cada janela de sucessos,
+  metade das vagas a cada 429/5xx/timeout;
+- novas tentativas com backoff exponencial com jitter, respeitando
+  ``Retry-After`` quando o servidor o informa;
+- o circuit breaker do endpoint e o prazo do documento atual
+  (:mod:`clinikondo.resilience`): nenhuma espera ultrapassa o prazo.
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from .metrics import record_attempt
+from .resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceeded,
+    check_deadline,
+    remaining_time,
+    shared_breaker,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Status HTTP que indicam sobrecarga do endpoint (reduzem a concorrência)
+THROTTLE_STATUS = {429}
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Balde de fichas com reposição contínua (taxa por minuto)."""
+
+    def __init__(
+        self,
+        per_minute: float,
+        *,
+        capacity: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._rate = per_minute / 60.0
+        self._capacity = capacity if capacity is not None else per_minute
+        self._tokens = self._capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Reserva *amount* fichas e retorna quantos segundos aguardar antes de usá-las.
+
+        Pedidos maiores que a capacidade são limitados a ela, para não bloquear
+        para sempre; o saldo pode ficar negativo (dívida paga pelas próximas).
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= min(amount, self._capacity)
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self._rate
+
+    def adjust(self, amount: float) -> None:
+        """Devolve (positivo) ou cobra (negativo) fichas após conhecer o custo real."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._capacity, self._tokens + amount)
+
+
+class AIMDController:
+    """Limite de concorrência com aumento aditivo e redução multiplicativa."""
+
+    def __init__(
+        self,
+        *,
+        initial: int = 2,
+        minimum: int = 1,
+        maximum: int = 8,
+        decrease_factor: float = 0.5,
+    ) -> None:
+        self._minimum = max(1, minimum)
+        self._maximum = max(self._minimum, maximum)
+        self._limit = float(min(max(initial, self._minimum), self._maximum))
+        self._decrease_factor = decrease_factor
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def maximum(self) -> int:
+        return self._maximum
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self) -> None:
+        """Ocupa uma vaga; sem vaga até o prazo do documento, levanta :class:`DeadlineExceeded`."""
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                remaining = remaining_time()
+                if remaining is not None and remaining <= 0:
+                    raise DeadlineExceeded("Prazo do documento excedido aguardando vaga de concorrência")
+                self._condition.wait(timeout=remaining)
+            self._in_flight += 1
+
+    def release(self) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    def on_success(self) -> None:
+        """+1 vaga a cada ``limit`` sucessos (uma "janela" de requisições)."""
+        with self._condition:
+            self._limit = min(self._maximum, self._limit + 1.0 / self._limit)
+            self._condition.notify_all()
+
+    def on_overload(self) -> None:
+        with self._condition:
+            self._limit = max(self._minimum, self._limit * self._decrease_factor)
+
+
+def status_code_of(exc: BaseException) -> Optional[int]:
+    """Status HTTP de exceções do SDK OpenAI/httpx (ou ``None``)."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after_seconds(exc: BaseException, *, now: Callable[[], float] = time.time) -> Optional[float]:
+    """Lê ``Retry-After``/``retry-after-ms`` da resposta HTTP anexada à exceção."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return max(0.0, float(value) / 1000.0)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - now())
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_timeout(exc: BaseException) -> bool:
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    name = type(exc).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def backoff_delay(attempt: int, base: float, cap: float, rng: random.Random | None = None) -> float:
+    """Backoff exponencial com *full jitter*: uniforme em [0, min(cap, base·2^(n-1))]."""
+    ceiling = min(cap, base * (2 ** max(0, attempt - 1)))
+    return (rng or random).uniform(0, ceiling)
+
+
+class AdaptiveRateLimiter:
+    """Executa chamadas a um endpoint respeitando taxa, concorrência e backoff."""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_concurrency: int = 8,
+        initial_concurrency: int = 2,
+        max_attempts: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+        rng: random.Random | None = None,
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
+        self.name = name
+        self.breaker = breaker
+        self._requests = TokenBucket(requests_per_minute, clock=clock) if requests_per_minute > 0 else None
+        self._tokens = TokenBucket(tokens_per_minute, clock=clock) if tokens_per_minute > 0 else None
+        self.concurrency = AIMDController(initial=initial_concurrency, maximum=max_concurrency)
+        self._max_attempts = max(1, max_attempts)
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._sleep = sleep
+        self._rng = rng or random.Random()
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, float] = {
+            "requisicoes": 0,
+            "sucessos": 0,
+            "tentativas_repetidas": 0,
+            "limitadas_429": 0,
+            "erros_servidor": 0,
+            "timeouts": 0,
+            "espera_taxa_s": 0.0,
+            "espera_backoff_s": 0.0,
+        }
+
+    @property
+    def max_attempts(self) -> int:
+        return self._max_attempts
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _wait_for_rate(self, estimated_tokens: float) -> None:
+        wait = 0.0
+        if self._requests is not None:
+            wait = max(wait, self._requests.reserve(1))
+        if self._tokens is not None and estimated_tokens > 0:
+            wait = max(wait, self._tokens.reserve(estimated_tokens))
+        if wait > 0:
+            remaining = remaining_time()
+            if remaining is not None and wait >= remaining:
+                raise DeadlineExceeded(f"Limite de taxa de {self.name} excede o prazo do documento")
+            self._count("espera_taxa_s", wait)
+            LOGGER.debug("Limite de taxa em %s: aguardando %.2fs", self.name, wait)
+            self._sleep(wait)
+
+    def call(
+        self,
+        func: Callable[[], T],
+        *,
+        estimated_tokens: float = 0,
+        usage: Callable[[T], Optional[float]] | None = None,
+        description: str = "requisição LLM",
+        max_attempts: int | None = None,
+    ) -> T:
+        """Executa *func* com limite de taxa, vaga de concorrência e novas tentativas.
+
+        *usage* recebe a resposta e retorna os tokens realmente consumidos, usados
+        para corrigir a estimativa cobrada do balde de tokens. *max_attempts*
+        substitui o limite de tentativas do limitador (o pool de backends usa 1
+        e faz as novas tentativas em outros endpoints).
+        """
+        max_attempts = max(1, max_attempts) if max_attempts is not None else self._max_attempts
+        for attempt in range(1, max_attempts + 1):
+            check_deadline(description)
+            self._wait_for_rate(estimated_tokens)
+            # A vaga vem antes da sonda do circuito: um prazo esgotado na fila
+            # não pode deixar a sonda do estado meio aberto marcada para sempre
+            self.concurrency.acquire()
+            if self.breaker is not None:
+                try:
+                    self.breaker.before_call()
+                except CircuitOpenError:
+                    self.concurrency.release()
+                    raise
+            self._count("requisicoes")
+            record_attempt()
+            try:
+                result = func()
+            except Exception as exc:
+                self.concurrency.release()
+                delay, endpoint_failure = self._handle_failure(exc, attempt, max_attempts, description)
+                if self.breaker is not None:
+                    if endpoint_failure is None:
+                        self.breaker.record_neutral()
+                    elif endpoint_failure:
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.record_success()
+                if delay is None:
+                    raise
+                self._pause(delay, exc, description)
+                continue
+            self.concurrency.release()
+            self.concurrency.on_success()
+            if self.breaker is not None:
+                self.breaker.record_success()
+            self._count("sucessos")
+            if usage is not None and self._tokens is not None:
+                actual = usage(result)
+                if actual:
+                    self._tokens.adjust(estimated_tokens - actual)
+            return result
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    def _pause(self, delay: float, exc: BaseException, description: str) -> None:
+        remaining = remaining_time()
+        if remaining is not None and delay >= remaining:
+            raise DeadlineExceeded(f"Prazo do documento esgotado durante {description}: {exc}") from exc
+        self._count("tentativas_repetidas")
+        self._count("espera_backoff_s", delay)
+        LOGGER.info(f"Aguardando {delay:.1f}s antes de tentar novamente ({self.name})...")
+        self._sleep(delay)
+
+    def _retry_delay(self, exc: BaseException, attempt: int) -> float:
+        delay = backoff_delay(attempt, self._backoff_base, self._backoff_max, self._rng)
+        retry_after = retry_after_seconds(exc)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self._backoff_max))
+        return delay
+
+    def wait_before_retry(self, exc: BaseException, attempt: int, description: str = "requisição LLM") -> None:
+        """Backoff antes da *attempt*-ésima nova tentativa (usado pelo pool entre rodadas de failover)."""
+        self._pause(self._retry_delay(exc, attempt), exc, description)
+
+    def _handle_failure(
+        self, exc: BaseException, attempt: int, max_attempts: int, description: str
+    ) -> tuple[Optional[float], Optional[bool]]:
+        """Registra a falha; retorna (atraso até a próxima tentativa ou ``None``, falha do endpoint).
+
+        429 indica endpoint vivo (só sobrecarregado) e não conta para o circuit
+        breaker. Erros do cliente não retentáveis (400, 401...) são neutros
+        (``None``): não dizem se o endpoint está saudável.
+        """
+        status = status_code_of(exc)
+        endpoint_failure: Optional[bool] = True
+        if status in THROTTLE_STATUS:
+            self._count("limitadas_429")
+            self.concurrency.on_overload()
+            endpoint_failure = False
+        elif status is not None and status >= 500:
+            self._count("erros_servidor")
+            self.concurrency.on_overload()
+        elif status is None and _is_timeout(exc):
+            self._count("timeouts")
+            self.concurrency.on_overload()
+        elif status is not None and status not in RETRYABLE_STATUS:
+            # Erros do cliente (401, 400...) não melhoram com novas tentativas
+            LOGGER.error(f"{description} falhou com status {status}: {exc}")
+            return None, None
+        elif status is not None:
+            endpoint_failure = False
+
+        LOGGER.warning(f"Tentativa {attempt}/{max_attempts} de {description} falhou em {self.name}: {exc}")
+        if attempt >= max_attempts:
+            if max_attempts > 1:
+                LOGGER.error(f"Falha em {description} após {max_attempts} tentativas")
+            return None, endpoint_failure
+        return self._retry_delay(exc, attempt), endpoint_failure
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats: Dict[str, Any] = {
+                key: round(value, 2) if isinstance(value, float) else int(value)
+                for key, value in self._stats.items()
+            }
+        stats["limite_concorrencia"] = self.concurrency.limit
+        if self.breaker is not None:
+            stats["circuito"] = self.breaker.get_statistics()
+        return stats
+
+
+_LIMITERS: Dict[str, AdaptiveRateLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def shared_limiter(endpoint: str | None, **settings: Any) -> AdaptiveRateLimiter:
+    """Limitador único por endpoint, compartilhado por classificação e OCR.
+
+    As configurações só são aplicadas na primeira criação do limitador.
+    """
+    key = (endpoint or "https://api.openai.com/v1").rstrip("/")
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(key)
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(key, **settings)
+            _LIMITERS[key] = limiter
+        return limiter
+
+
+def limiter_for_config(
+    config: Any, endpoint: str | None, *, max_concurrency: int | None = None
+) -> AdaptiveRateLimiter:
+    """Cria/obtém o limitador de *endpoint* com os parâmetros da configuração."""
+    return shared_limiter(
+        endpoint,
+        requests_per_minute=config.llm_requests_per_minute,
+        tokens_per_minute=config.llm_tokens_per_minute,
+        max_concurrency=max_concurrency or config.llm_max_concurrency,
+        max_attempts=config.llm_max_retries,
+        backoff_base=config.llm_retry_delay,
+        backoff_max=config.llm_backoff_max,
+        breaker=shared_breaker(
+            endpoint,
+            failure_threshold=config.circuit_failure_threshold,
+            reset_timeout=config.circuit_reset_timeout,
+        ),
+    )
+
+
+def estimate_tokens(text: str, max_tokens: int = 0) -> int:
+    """Estimativa grosseira (4 caracteres por token) do custo de uma requisição."""
+    return len(text) // 4 + max_tokens
+
+
+def reset_limiters() -> None:
+    """Descarta os limitadores compartilhados (usado entre execuções e em testes)."""
+    with _LIMITERS_LOCK:
+        _LIMITERS.clear()
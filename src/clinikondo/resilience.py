@@ -0,0 +1,196 @@
+"""Circuit breaker por endpoint e prazo (deadline) por documento.
+
+Um host LLM fora do ar não deve travar a execução inteira: após
+``failure_threshold`` falhas consecutivas o circuito abre e as chamadas
+seguintes falham imediatamente com :class:`CircuitOpenError`. Depois de
+``reset_timeout`` segundos, uma única chamada de sonda é liberada; se ela
+passar, o circuito fecha de novo.
+
+O prazo por documento fica em um :class:`contextvars.ContextVar`, então vale
+para todo o trabalho (OCR e LLM) disparado durante o processamento do
+documento, inclusive em threads iniciadas com ``contextvars.copy_context``.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from .models import DocumentProcessingError
+
+LOGGER = logging.getLogger(__name__)
+
+FECHADO = "fechado"
+ABERTO = "aberto"
+MEIO_ABERTO = "meio_aberto"
+
+
+class DeadlineExceeded(DocumentProcessingError):
+    """O prazo total de processamento do documento foi excedido."""
+
+
+class CircuitOpenError(DocumentProcessingError):
+    """O endpoint está com o circuito aberto; a chamada nem foi tentada."""
+
+
+class CircuitBreaker:
+    """Circuit breaker simples (fechado → aberto → meio aberto)."""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_threshold: int = 5,
+        reset_timeout: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self._failure_threshold = max(1, failure_threshold)
+        self._reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = FECHADO
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.aberturas = 0
+        self.rejeitadas = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == ABERTO and self._clock() - self._opened_at >= self._reset_timeout:
+                return MEIO_ABERTO
+            return self._state
+
+    def before_call(self) -> None:
+        """Libera a chamada ou levanta :class:`CircuitOpenError`."""
+        with self._lock:
+            if self._state == FECHADO:
+                return
+            if self._state == ABERTO and self._clock() - self._opened_at >= self._reset_timeout:
+                self._state = MEIO_ABERTO
+            if self._state == MEIO_ABERTO and not self._probe_in_flight:
+                self._probe_in_flight = True
+                LOGGER.info("🔌 Circuito de %s meio aberto: enviando requisição de sonda", self.name)
+                return
+            self.rejeitadas += 1
+            restante = max(0.0, self._reset_timeout - (self._clock() - self._opened_at))
+        raise CircuitOpenError(
+            f"Endpoint {self.name} indisponível (circuito aberto, nova sonda em {restante:.0f}s)"
+        )
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != FECHADO:
+                LOGGER.info("🔌 Circuito de %s fechado: endpoint respondeu", self.name)
+            self._state = FECHADO
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_neutral(self) -> None:
+        """Resposta que não diz nada sobre a saúde do endpoint (ex.: 400): só libera a sonda."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            probe_failed = self._state == MEIO_ABERTO
+            self._probe_in_flight = False
+            if probe_failed or self._failures >= self._failure_threshold:
+                if self._state != ABERTO:
+                    self.aberturas += 1
+                    LOGGER.warning(
+                        "🔌 Circuito de %s aberto após %d falha(s) consecutiva(s)", self.name, self._failures
+                    )
+                self._state = ABERTO
+                self._opened_at = self._clock()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {"estado": self.state, "aberturas": self.aberturas, "rejeitadas": self.rejeitadas}
+
+
+_DEADLINE: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("clinikondo_deadline", default=None)
+
+
+@contextmanager
+def document_deadline(seconds: float | None) -> Iterator[None]:
+    """Define o prazo (em segundos a partir de agora) para o bloco; ``None``/0 desativa.
+
+    Prazos aninhados nunca estendem o prazo externo.
+    """
+    with document_deadline_until(time.monotonic() + seconds if seconds else None):
+        yield
+
+
+@contextmanager
+def document_deadline_until(expiry: float | None) -> Iterator[None]:
+    """Como :func:`document_deadline`, mas com um instante absoluto (``time.monotonic``).
+
+    Permite retomar depois o prazo de um documento registrado com
+    :func:`current_deadline`, por exemplo quando a classificação acontece em
+    um lote montado após a extração.
+    """
+    if expiry is None:
+        yield
+        return
+    current = _DEADLINE.get()
+    if current is not None:
+        expiry = min(expiry, current)
+    token = _DEADLINE.set(expiry)
+    try:
+        yield
+    finally:
+        _DEADLINE.reset(token)
+
+
+def current_deadline() -> Optional[float]:
+    """Instante (``time.monotonic``) em que vence o prazo atual (``None`` sem prazo)."""
+    return _DEADLINE.get()
+
+
+def remaining_time() -> Optional[float]:
+    """Segundos restantes até o prazo do documento atual (``None`` sem prazo)."""
+    deadline = current_deadline()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline(description: str = "processamento") -> None:
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded(f"Prazo do documento excedido antes de {description}")
+
+
+def request_timeout(default: float) -> float:
+    """Timeout de uma requisição: o menor entre *default* e o prazo restante."""
+    remaining = remaining_time()
+    if remaining is None:
+        return default
+    return max(0.1, min(default, remaining))
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def shared_breaker(endpoint: str | None, **settings: Any) -> CircuitBreaker:
+    """Circuit breaker único por endpoint (mesma chave do limitador de taxa)."""
+    key = (endpoint or "https://api.openai.com/v1").rstrip("/")
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(key, **settings)
+            _BREAKERS[key] = breaker
+        return breaker
+
+
+def reset_breakers() -> None:
+    with _BREAKERS_LOCK:
+        _BREAKERS.clear()
@@ -0,0 +1,387 @@
+"""Modo ``servir``: API local (HTTP ou socket Unix) sobre um pipeline já carregado.
+
+Scripts de digitalização que chamam ``python -m clinikondo processar`` para
+poucos arquivos pagam, a cada chamada, a inicialização do interpretador, os
+imports, a leitura de ``patients.json``/``processed_hashes.json`` e a criação
+do cliente do LLM. No ``servir`` isso acontece uma única vez: um
+:class:`~clinikondo.processing.DocumentProcessor` fica carregado e atende os
+documentos enviados pela API.
+
+Endpoints (respostas em JSON):
+
+* ``POST /documentos?nome=laudo.pdf`` — corpo com os bytes do arquivo;
+* ``POST /documentos`` com ``{"caminho": "..."}`` — arquivo já presente na
+  pasta de entrada (copiado para o destino; movido só com ``--mover``);
+  reenviar um caminho que ainda está na fila devolve o mesmo documento;
+* ``GET /documentos/<id>?esperar=30`` — status (``na_fila``, ``processando``,
+  ``organizado``, ``falha`` ou ``duplicata``) e, quando concluído, a linha do
+  manifesto com destino e campos extraídos; ``esperar`` aguarda a conclusão
+  por até N segundos;
+* ``GET /saude`` — tamanho da fila e contadores da execução.
+
+Os documentos entram em uma fila limitada (``--queue-size``; cheia, a API
+responde ``503`` com ``Retry-After``) e uma única thread os entrega ao
+pipeline em ciclos com tudo o que estiver na fila — o paralelismo fica com o
+próprio pipeline (``--batch-size``, ``--max-concurrency``). Arquivos enviados
+por bytes são processados em memória (:class:`~clinikondo.processing.InMemoryDocument`),
+sem arquivo temporário.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import queue
+import socketserver
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from .discovery import DiscoveredFile
+from .manifest import FALHA
+from .processing import SUPPORTED_EXTENSIONS, DocumentProcessor, InMemoryDocument
+from .utils import validate_safe_path
+
+LOGGER = logging.getLogger(__name__)
+
+NA_FILA = "na_fila"
+PROCESSANDO = "processando"
+
+# Documentos entregues ao pipeline por ciclo (o restante fica para o próximo)
+MAX_DOCUMENTOS_POR_CICLO = 64
+# Resultados concluídos mantidos para consulta (os mais antigos são descartados)
+MAX_RESULTADOS = 10_000
+# Limite de espera de ``GET /documentos/<id>?esperar=``
+MAX_ESPERA = 300.0
+
+
+class QueueFullError(RuntimeError):
+    """A fila do serviço está cheia; o cliente deve tentar novamente mais tarde."""
+
+
+class Job:
+    """Documento enviado ao serviço e o seu resultado."""
+
+    def __init__(self, path: Path, nome: str, *, content: bytes | memoryview | None = None) -> None:
+        self.id = uuid.uuid4().hex
+        # Uploads não têm arquivo: o caminho é só um nome único para o manifesto
+        self.path = path if content is None else Path(self.id) / nome
+        self.nome = nome
+        self.content = content
+        self.status = NA_FILA
+        self.resultado: Dict[str, Any] | None = None
+        self.criado_em = datetime.now()
+        self.concluido_em: datetime | None = None
+        self.concluido = threading.Event()
+
+    def finish(self, entry: Dict[str, Any] | None) -> None:
+        self.content = None
+        self.resultado = entry
+        self.status = entry["status"] if entry else FALHA
+        self.concluido_em = datetime.now()
+        self.concluido.set()
+
+    def as_dict(self) -> Dict[str, Any]:
+        dados: Dict[str, Any] = {
+            "id": self.id,
+            "nome": self.nome,
+            "status": self.status,
+            "criado_em": self.criado_em.isoformat(timespec="seconds"),
+        }
+        if self.concluido_em is not None:
+            dados["concluido_em"] = self.concluido_em.isoformat(timespec="seconds")
+            dados["resultado"] = self.resultado
+            if self.resultado is None:
+                dados["erro"] = "Documento não produziu resultado no pipeline"
+        return dados
+
+
+class DocumentService:
+    """Fila de documentos atendida por um único :class:`DocumentProcessor` carregado."""
+
+    def __init__(self, processor: DocumentProcessor, *, queue_size: int = 100) -> None:
+        self.processor = processor
+        self._fila: queue.Queue[Job | None] = queue.Queue(maxsize=queue_size)
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._por_caminho: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        processor.entry_listener = self._on_entry
+
+    @property
+    def pendentes(self) -> int:
+        return self._fila.qsize()
+
+    def start(self) -> DocumentService:
+        self._thread = threading.Thread(target=self._run, name="clinikondo-servico", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self, timeout: float | None = None) -> None:
+        """Encerra depois do ciclo em andamento; documentos ainda na fila não são processados.
+
+        Grava pacientes, hashes e métricas do processo (os ciclos só gravam o
+        estado periodicamente).
+        """
+        if self._thread is None:
+            return
+        while True:
+            try:
+                descartado = self._fila.get_nowait()
+            except queue.Empty:
+                break
+            if descartado is not None:
+                with self._lock:
+                    self._por_caminho.pop(str(descartado.path), None)
+        self._fila.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+        self.processor.close()
+
+    def submit_path(self, path: Path) -> Job:
+        """Enfileira um arquivo que já está na pasta de entrada.
+
+        O arquivo é copiado para o destino, ou movido se a configuração tiver
+        ``mover_arquivo_original``. Um caminho que ainda está na fila ou em
+        processamento não é enfileirado de novo: o documento pendente é devolvido.
+        """
+        path = Path(path)
+        validate_safe_path(path, self.processor.config.input_dir)
+        if not path.is_file():
+            raise FileNotFoundError(f"Arquivo não encontrado: {path}")
+        self._check_extension(path.name)
+        return self._enqueue(Job(path, path.name))
+
+    def submit_bytes(self, data: bytes | memoryview, filename: str) -> Job:
+        """Enfileira o conteúdo de um arquivo enviado pela API (*filename* dá nome e formato).
+
+        O conteúdo fica em memória até o documento ser organizado.
+        """
+        nome = Path(filename.replace("\\", "/")).name
+        if not nome or nome.startswith("."):
+            raise ValueError(f"Nome de arquivo inválido: {filename!r}")
+        self._check_extension(nome)
+        if not data:
+            raise ValueError("Arquivo vazio")
+        return self._enqueue(Job(Path(nome), nome, content=data))
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def health(self) -> Dict[str, Any]:
+        metrics = self.processor.metrics
+        return {
+            "status": "ok",
+            "fila": self.pendentes,
+            "documentos": metrics.documentos,
+            "falhas": metrics.falhas,
+            "duplicatas_ignoradas": metrics.duplicatas,
+        }
+
+    @staticmethod
+    def _check_extension(nome: str) -> None:
+        if os.path.splitext(nome)[1].lower() not in SUPPORTED_EXTENSIONS:
+            raise ValueError(f"Formato não suportado: {nome}")
+
+    def _enqueue(self, job: Job) -> Job:
+        with self._lock:
+            pendente = self._por_caminho.get(str(job.path))
+            if pendente is not None:
+                return pendente  # Caminho ainda pendente: mesmo documento
+            self._jobs[job.id] = job
+            try:
+                self._fila.put_nowait(job)
+            except queue.Full:
+                del self._jobs[job.id]
+                raise QueueFullError("Fila do serviço cheia") from None
+            self._por_caminho[str(job.path)] = job
+            self._forget_old_jobs()
+        return job
+
+    def _forget_old_jobs(self) -> None:
+        excesso = len(self._jobs) - MAX_RESULTADOS
+        for job_id in list(self._jobs)[: max(0, excesso)]:
+            if self._jobs[job_id].concluido.is_set():
+                del self._jobs[job_id]
+
+    def _on_entry(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            job = self._por_caminho.get(entry["arquivo"])
+        if job is not None:
+            job.resultado = entry
+
+    def _next_cycle(self) -> List[Job] | None:
+        primeiro = self._fila.get()
+        if primeiro is None:
+            return None
+        ciclo = [primeiro]
+        while len(ciclo) < MAX_DOCUMENTOS_POR_CICLO:
+            try:
+                job = self._fila.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                self._fila.put(None)  # Encerramento vale depois deste ciclo
+                break
+            ciclo.append(job)
+        return ciclo
+
+    def _run(self) -> None:
+        while True:
+            ciclo = self._next_cycle()
+            if ciclo is None:
+                return
+            self._process_cycle(ciclo)
+
+    def _process_cycle(self, ciclo: List[Job]) -> None:
+        files: List[DiscoveredFile | InMemoryDocument] = []
+        for job in ciclo:
+            job.status = PROCESSANDO
+            if job.content is not None:
+                files.append(InMemoryDocument(job.path, job.content))
+                continue
+            try:
+                files.append(DiscoveredFile(job.path, job.path.stat()))
+            except OSError as exc:
+                LOGGER.warning("Arquivo enviado ao serviço não está mais disponível: %s", exc)
+        try:
+            for _document in self.processor.iter_process(files, finish=False):
+                pass
+        except Exception:  # pragma: no cover - falha inesperada do pipeline
+            LOGGER.exception("Falha no ciclo do serviço com %d documento(s)", len(ciclo))
+        finally:
+            with self._lock:
+                for job in ciclo:
+                    self._por_caminho.pop(str(job.path), None)
+            for job in ciclo:
+                job.finish(job.resultado)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "CliniKondo"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self) -> DocumentService:
+        return self.server.service  # type: ignore[attr-defined]
+
+    def address_string(self) -> str:
+        # Conexões pelo socket Unix não têm endereço (client_address vazio)
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        LOGGER.debug("%s - %s", self.address_string(), format % args)
+
+    def _reply(self, status: HTTPStatus, payload: Dict[str, Any], headers: Dict[str, str] | None = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for nome, valor in (headers or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: HTTPStatus, mensagem: str, headers: Dict[str, str] | None = None) -> None:
+        self._reply(status, {"erro": mensagem}, headers)
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        partes = [parte for parte in url.path.split("/") if parte]
+        if partes == ["saude"]:
+            self._reply(HTTPStatus.OK, self.service.health())
+            return
+        if len(partes) != 2 or partes[0] != "documentos":
+            self._error(HTTPStatus.NOT_FOUND, "Recurso não encontrado")
+            return
+        job = self.service.get(partes[1])
+        if job is None:
+            self._error(HTTPStatus.NOT_FOUND, "Documento não encontrado")
+            return
+        esperar = parse_qs(url.query).get("esperar")
+        if esperar:
+            try:
+                job.concluido.wait(min(max(float(esperar[0]), 0.0), MAX_ESPERA))
+            except ValueError:
+                self._error(HTTPStatus.BAD_REQUEST, "Parâmetro 'esperar' inválido")
+                return
+        self._reply(HTTPStatus.OK, job.as_dict())
+
+    def do_POST(self) -> None:
+        url = urlsplit(self.path)
+        if url.path.rstrip("/") != "/documentos":
+            self._error(HTTPStatus.NOT_FOUND, "Recurso não encontrado")
+            return
+        tamanho = self.headers.get("Content-Length")
+        if tamanho is None or not tamanho.isdigit():
+            self._error(HTTPStatus.LENGTH_REQUIRED, "Content-Length obrigatório")
+            return
+        if int(tamanho) > self.server.max_upload_bytes:  # type: ignore[attr-defined]
+            self.close_connection = True  # O corpo não é lido
+            self._error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Arquivo maior que o limite do serviço")
+            return
+        corpo = self.rfile.read(int(tamanho))
+        try:
+            if self.headers.get_content_type() == "application/json":
+                caminho = json.loads(corpo or b"{}").get("caminho")
+                if not caminho:
+                    raise ValueError("Informe 'caminho' ou envie os bytes do arquivo")
+                job = self.service.submit_path(Path(caminho))
+            else:
+                nome = parse_qs(url.query).get("nome", [unquote(self.headers.get("X-Filename", ""))])[0]
+                job = self.service.submit_bytes(corpo, nome)
+        except QueueFullError as exc:
+            self._error(HTTPStatus.SERVICE_UNAVAILABLE, str(exc), {"Retry-After": "5"})
+            return
+        except FileNotFoundError as exc:
+            self._error(HTTPStatus.NOT_FOUND, str(exc))
+            return
+        except (ValueError, AttributeError) as exc:
+            self._error(HTTPStatus.BAD_REQUEST, str(exc))
+            return
+        self._reply(HTTPStatus.ACCEPTED, job.as_dict(), {"Location": f"/documentos/{job.id}"})
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(
+    service: DocumentService,
+    *,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    socket_path: Optional[Path] = None,
+    max_upload_mb: float = 50.0,
+) -> ThreadingHTTPServer | _UnixHTTPServer:
+    """Servidor HTTP da API (em *socket_path*, se informado, com permissão só do usuário)."""
+    if socket_path is not None:
+        if socket_path.exists() and socket_path.is_socket():
+            socket_path.unlink()  # Socket órfão de uma execução anterior
+        server: ThreadingHTTPServer | _UnixHTTPServer = _UnixHTTPServer(os.fspath(socket_path), _Handler)
+        os.chmod(socket_path, 0o600)
+    else:
+        server = ThreadingHTTPServer((host, port), _Handler)
+    server.service = service  # type: ignore[union-attr]
+    server.max_upload_bytes = int(max_upload_mb * 1024 * 1024)  # type: ignore[union-attr]
+    return server
+
+
+def server_address(server: ThreadingHTTPServer | _UnixHTTPServer) -> str:
+    endereco = server.server_address
+    if isinstance(endereco, (str, bytes)):
+        return f"unix:{os.fsdecode(endereco)}"
+    if isinstance(endereco, tuple):
+        host, porta = endereco[0], endereco[1]
+        if isinstance(host, (bytes, bytearray)):
+            host = host.decode()
+        return f"http://{host}:{porta}"
+    return str(endereco)
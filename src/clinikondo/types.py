@@ -2,8 +2,9 @@
 
 from __future__ import annotations
 
+import re
 from dataclasses import dataclass
-from typing import Dict, Iterable, Optional
+from typing import Dict, Iterable, List, Optional
 
 from .models import DocumentType
 from .utils import sanitize_token
@@ -78,14 +79,68 @@ _TYPE_SYNONYMS = {
 }
 
 
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Monta uma expressão regular em forma de trie que casa a palavra mais longa."""
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        if len(branches) == 1 and "" not in node:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if "" in node else group
+
+    return build(trie)
+
+
 class DocumentTypeCatalog:
-    """Catálogo com estratégias para mapear um nome de tipo para uma subpasta."""
+    """Catálogo com estratégias para mapear um nome de tipo para uma subpasta.
+
+    As palavras-chave e sinônimos são normalizados uma única vez na construção;
+    a inferência por texto percorre o documento em uma só passada com uma
+    expressão em trie que reconhece todas as palavras-chave simultaneamente.
+    """
 
     def __init__(self, types: Iterable[DocumentType] | None = None) -> None:
         self._types: Dict[str, DocumentType] = {}
         for doc_type in types or _default_types():
             self._types[self._key(doc_type.nome_tipo)] = doc_type
 
+        self._synonym_index: Dict[str, DocumentType] = {}
+        for synonym, target in _TYPE_SYNONYMS.items():
+            target_type = self._types.get(self._key(target))
+            if target_type:
+                self._synonym_index[synonym] = target_type
+
+        self._keyword_index: Dict[str, DocumentType] = {}
+        # palavra-chave normalizada para texto -> [(chave do tipo, peso)]
+        self._text_keywords: Dict[str, List[tuple[str, float]]] = {}
+        for type_key, doc_type in self._types.items():
+            for keyword in doc_type.palavras_chave:
+                self._keyword_index.setdefault(sanitize_token(keyword, separator="_"), doc_type)
+                text_keyword = sanitize_token(keyword, separator=" ")
+                weight = float(len(text_keyword.split()))
+                self._text_keywords.setdefault(text_keyword, []).append((type_key, weight))
+
+        # Na mesma posição a trie captura apenas a palavra mais longa; as
+        # palavras-chave que são prefixo dela ocorrem ali também.
+        self._prefixes: Dict[str, List[str]] = {
+            keyword: [other for other in self._text_keywords if keyword.startswith(other)]
+            for keyword in self._text_keywords
+        }
+        self._text_matcher = (
+            re.compile(f"(?=({_trie_pattern(self._text_keywords)}))")
+            if self._text_keywords
+            else None
+        )
+
     @staticmethod
     def _key(name: str) -> str:
         return sanitize_token(name, separator="_")
@@ -102,25 +157,45 @@ class DocumentTypeCatalog:
             return self._types[key]
         
         # Usar mapeamento de sinônimos se disponível
-        if key in _TYPE_SYNONYMS:
-            synonym_key = self._key(_TYPE_SYNONYMS[key])
-            if synonym_key in self._types:
-                return self._types[synonym_key]
+        if key in self._synonym_index:
+            return self._synonym_index[key]
         
-        # Busca fuzzy nas palavras-chave dos tipos
-        for doc_type in self._types.values():
-            for keyword in doc_type.palavras_chave:
-                if sanitize_token(keyword, separator="_") == key:
-                    return doc_type
+        # Busca nas palavras-chave (pré-normalizadas) dos tipos
+        if key in self._keyword_index:
+            return self._keyword_index[key]
         
         # Fallback para documento padrão
         return self._types[self._key("documento")]
 
-    def infer_from_text(self, text: str) -> DocumentType:
+    def _keyword_hits(self, text: str) -> Dict[str, int]:
+        """Conta as ocorrências (como substring) de cada palavra-chave no texto."""
+        hits: Dict[str, int] = {}
+        if self._text_matcher is None:
+            return hits
         text_clean = sanitize_token(text, separator=" ")
-        for doc_type in self._types.values():
-            for keyword in doc_type.palavras_chave:
-                if sanitize_token(keyword, separator=" ") in text_clean:
+        for match in self._text_matcher.finditer(text_clean):
+            for keyword in self._prefixes[match.group(1)]:
+                hits[keyword] = hits.get(keyword, 0) + 1
+        return hits
+
+    def score_text(self, text: str) -> Dict[str, float]:
+        """Pontua cada tipo pelas palavras-chave encontradas no texto.
+
+        Cada ocorrência soma o número de palavras da palavra-chave, de modo que
+        termos compostos ("uso continuo") pesam mais que termos isolados.
+        """
+        scores: Dict[str, float] = {}
+        for keyword, count in self._keyword_hits(text).items():
+            for type_key, weight in self._text_keywords[keyword]:
+                nome_tipo = self._types[type_key].nome_tipo
+                scores[nome_tipo] = scores.get(nome_tipo, 0.0) + weight * count
+        return scores
+
+    def infer_from_text(self, text: str) -> DocumentType:
+        hits = self._keyword_hits(text)
+        if hits:
+            matched_types = {type_key for keyword in hits for type_key, _ in self._text_keywords[keyword]}
+            for type_key, doc_type in self._types.items():
+                if type_key in matched_types:
                     return doc_type
         return self.resolve("documento")
-
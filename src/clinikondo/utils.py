@@ -6,6 +6,7 @@ import logging
 import re
 import unicodedata
 from datetime import date
+from functools import lru_cache
 from pathlib import Path
 from typing import Iterable
 
@@ -21,27 +22,97 @@ _DATE_PATTERNS = (
 _WORD_PATTERN = re.compile(r"[A-Za-zÀ-ÖØ-öø-ÿ]+", re.UNICODE)
 
 
-def strip_accents(value: str) -> str:
-    """Remove acentos preservando apenas caracteres ASCII."""
+class _UnsafeDecomposition(Exception):
+    """Caractere cuja decomposição depende do reordenamento canônico do NFKD."""
+
+
+class _AccentTable(dict):
+    """Tabela de tradução preenchida sob demanda com a forma sem acentos de cada caractere.
+
+    Decompor caractere a caractere equivale ao NFKD da string inteira, exceto pelo
+    reordenamento canônico de marcas combinantes. As marcas ``Mn`` são removidas de
+    qualquer forma; caracteres cuja decomposição contém outras marcas combinantes
+    sinalizam :class:`_UnsafeDecomposition` para que a string use o caminho exato.
+    """
+
+    def __missing__(self, codepoint: int) -> str:
+        decomposed = unicodedata.normalize("NFKD", chr(codepoint))
+        if any(
+            unicodedata.combining(ch) and unicodedata.category(ch) != "Mn" for ch in decomposed
+        ):
+            raise _UnsafeDecomposition(codepoint)
+        stripped = "".join(ch for ch in decomposed if unicodedata.category(ch) != "Mn")
+        self[codepoint] = stripped
+        return stripped
+
+
+class _TokenTable(dict):
+    """Tabela de tradução de :func:`sanitize_token` para um separador/allow_digits."""
+
+    def __init__(self, separator: str, allow_digits: bool) -> None:
+        super().__init__()
+        self._separator = separator
+        self._allow_digits = allow_digits
+
+    def __missing__(self, codepoint: int) -> str:
+        ch = chr(codepoint)
+        if ch.isalpha() or (self._allow_digits and ch.isdigit()):
+            value = ch
+        elif ch in {" ", "-", "_"}:
+            value = self._separator
+        else:
+            value = ""
+        self[codepoint] = value
+        return value
+
+
+_ACCENT_TABLE = _AccentTable()
+_SHORT_TOKEN_LENGTH = 64
+
+
+@lru_cache(maxsize=32)
+def _token_table(separator: str, allow_digits: bool) -> _TokenTable:
+    return _TokenTable(separator, allow_digits)
+
+
+@lru_cache(maxsize=32)
+def _separator_run(separator: str) -> re.Pattern[str]:
+    return re.compile(rf"{separator}+")
+
+
+def _strip_accents_nfkd(value: str) -> str:
     normalized = unicodedata.normalize("NFKD", value)
     return "".join(ch for ch in normalized if unicodedata.category(ch) != "Mn")
 
 
-def sanitize_token(value: str, *, separator: str = "-", allow_digits: bool = True) -> str:
-    """Normaliza um token para ser usado em nomes seguros de arquivo ou diretório."""
+def strip_accents(value: str) -> str:
+    """Remove acentos preservando apenas caracteres ASCII."""
+    if value.isascii():
+        return value
+    try:
+        return value.translate(_ACCENT_TABLE)
+    except _UnsafeDecomposition:
+        return _strip_accents_nfkd(value)
+
+
+def _sanitize(value: str, separator: str, allow_digits: bool) -> str:
     ascii_value = strip_accents(value).lower()
-    safe_chars: list[str] = []
-    for ch in ascii_value:
-        if ch.isalpha() or (allow_digits and ch.isdigit()):
-            safe_chars.append(ch)
-        elif ch in {" ", "-", "_"}:
-            safe_chars.append(separator)
-    sanitized = "".join(safe_chars)
-    sanitized = re.sub(rf"{separator}+", separator, sanitized)
+    sanitized = ascii_value.translate(_token_table(separator, allow_digits))
+    sanitized = _separator_run(separator).sub(separator, sanitized)
     sanitized = sanitized.strip(separator)
     return sanitized or "na"
 
 
+_sanitize_short = lru_cache(maxsize=8192)(_sanitize)
+
+
+def sanitize_token(value: str, *, separator: str = "-", allow_digits: bool = True) -> str:
+    """Normaliza um token para ser usado em nomes seguros de arquivo ou diretório."""
+    if len(value) <= _SHORT_TOKEN_LENGTH:
+        return _sanitize_short(value, separator, allow_digits)
+    return _sanitize(value, separator, allow_digits)
+
+
 def slugify(value: str, *, separator: str = "_") -> str:
     """Cria um slug seguro para diretórios de pacientes."""
     return sanitize_token(value, separator=separator)
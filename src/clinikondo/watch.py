@@ -0,0 +1,261 @@
+"""Modo ``processar --watch``: processo contínuo que organiza a entrada à medida que ela muda.
+
+Em vez de um ``processar`` por cron — que a cada execução varre a entrada
+inteira, recarrega ``patients.json``/``processed_hashes.json`` e recria o
+cliente do LLM — um único :class:`~clinikondo.processing.DocumentProcessor`
+fica carregado e recebe só os arquivos novos:
+
+* no Linux, os eventos vêm do inotify (``IN_CLOSE_WRITE``/``IN_MOVED_TO``,
+  com subpastas novas observadas automaticamente); em outros sistemas, em
+  compartilhamentos de rede (onde o inotify não vê escritas remotas) ou com
+  ``--watch-backend polling``, a entrada é varrida a cada ``--watch-interval``;
+* um arquivo só é processado depois de ficar ``--watch-settle`` segundos sem
+  mudar de tamanho nem de ``mtime`` (cópias lentas e scanners que gravam aos
+  poucos não são lidos pela metade);
+* todos os arquivos do mesmo ciclo passam pelo mesmo pipeline (lotes do LLM
+  incluídos); manifesto e métricas acumulam desde o início do processo.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import signal
+import struct
+import threading
+import time
+from pathlib import Path
+from types import FrameType
+from typing import Any, Callable, Dict, Generator, List, Optional, Set, Tuple
+
+from .discovery import DiscoveredFile, accepts_dir, accepts_path, scan_documents
+from .models import Document
+from .processing import DocumentProcessor
+
+LOGGER = logging.getLogger(__name__)
+
+# Constantes de <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+_EVENT = struct.Struct("iIII")
+
+
+class PollingWatcher:
+    """Detecta mudanças comparando varreduras periódicas (tamanho e ``mtime``)."""
+
+    name = "polling"
+
+    def __init__(self, root: Path, scan_options: Dict[str, Any], interval: float) -> None:
+        self._root = root
+        self._options = scan_options
+        self._interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[Path, Tuple[int, int]]:
+        return {
+            found.path: (found.stat.st_size, found.stat.st_mtime_ns)
+            for found in scan_documents(self._root, **self._options)
+        }
+
+    def poll(self, timeout: float, stop: threading.Event) -> Set[Path]:
+        if stop.wait(min(timeout, self._interval)):
+            return set()
+        current = self._scan()
+        changed = {path for path, signature in current.items() if self._snapshot.get(path) != signature}
+        self._snapshot = current
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Eventos do inotify (Linux) para a entrada e suas subpastas."""
+
+    name = "inotify"
+
+    def __init__(self, root: Path, scan_options: Dict[str, Any]) -> None:
+        libc_name = ctypes.util.find_library("c")
+        if not hasattr(select, "poll") or libc_name is None:
+            raise OSError("inotify indisponível nesta plataforma")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify indisponível nesta plataforma")
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falhou")
+        self._root = root
+        self._options = scan_options
+        self._watches: Dict[int, Path] = {}
+        self._add_tree(root)
+
+    def _add_watch(self, directory: Path) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            LOGGER.warning("Não foi possível observar %s (errno %d)", directory, ctypes.get_errno())
+            return
+        self._watches[wd] = directory
+
+    def _add_tree(self, directory: Path) -> None:
+        pending = [directory]
+        while pending:
+            current = pending.pop()
+            if not accepts_dir(self._root, current, **self._options):
+                continue
+            self._add_watch(current)
+            if not self._options.get("recursive", True):
+                continue
+            try:
+                with os.scandir(current) as entries:
+                    pending.extend(Path(entry.path) for entry in entries if entry.is_dir(follow_symlinks=False))
+            except OSError as exc:
+                LOGGER.debug("Falha ao listar %s: %s", current, exc)
+
+    def poll(self, timeout: float, stop: threading.Event) -> Set[Path]:
+        poller = select.poll()
+        poller.register(self._fd, select.POLLIN)
+        if not poller.poll(int(timeout * 1000)):
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed: Set[Path] = set()
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size : offset + _EVENT.size + length].rstrip(b"\0")
+            offset += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                LOGGER.warning("Fila do inotify transbordou: varrendo a entrada novamente")
+                changed.update(found.path for found in scan_documents(self._root, **self._options))
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            directory = self._watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = directory / os.fsdecode(name)
+            if mask & IN_ISDIR:
+                if self._options.get("recursive", True):
+                    # Pasta nova (ou movida para dentro): observar e pegar o que já está nela.
+                    # Os globs são relativos à entrada; quem chama filtra com accepts_path.
+                    self._add_tree(path)
+                    changed.update(
+                        found.path
+                        for found in scan_documents(path, **{**self._options, "include": (), "exclude": ()})
+                    )
+                continue
+            changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def create_watcher(
+    root: Path, scan_options: Dict[str, Any], backend: str, interval: float
+) -> PollingWatcher | InotifyWatcher:
+    """Watcher do *backend* pedido; ``auto`` usa inotify e cai para varredura periódica."""
+    if backend in {"auto", "inotify"}:
+        try:
+            return InotifyWatcher(root, scan_options)
+        except OSError as exc:
+            if backend == "inotify":
+                raise
+            LOGGER.info("inotify indisponível (%s): usando varredura periódica", exc)
+    return PollingWatcher(root, scan_options, interval)
+
+
+class StabilityTracker:
+    """Libera um arquivo só depois de *settle* segundos sem mudar de tamanho nem de ``mtime``."""
+
+    def __init__(self, settle: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self._settle = settle
+        self._clock = clock
+        self._pending: Dict[Path, Tuple[Tuple[int, int], float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def observe(self, path: Path) -> None:
+        try:
+            stat = path.stat()
+        except OSError:
+            self._pending.pop(path, None)
+            return
+        self._pending[path] = ((stat.st_size, stat.st_mtime_ns), self._clock())
+
+    def ready(self) -> List[DiscoveredFile]:
+        now = self._clock()
+        stable: List[DiscoveredFile] = []
+        for path, (signature, since) in list(self._pending.items()):
+            try:
+                stat = path.stat()
+            except OSError:
+                del self._pending[path]  # Removido ou renomeado antes de estabilizar
+                continue
+            current = (stat.st_size, stat.st_mtime_ns)
+            if current != signature:
+                self._pending[path] = (current, now)
+            elif now - since >= self._settle:
+                del self._pending[path]
+                stable.append(DiscoveredFile(path, stat))
+        return stable
+
+
+def watch_documents(
+    processor: DocumentProcessor,
+    *,
+    stop: threading.Event,
+    backend: str = "auto",
+    interval: float = 5.0,
+    settle: float = 2.0,
+    on_ready: Optional[Callable[[], None]] = None,
+) -> Generator[Document, None, None]:
+    """Processa o que já está na entrada e, depois, cada arquivo novo assim que estabiliza.
+
+    Os ciclos não regravam o histórico a cada arquivo: o estado é salvo
+    periodicamente e o manifesto e as métricas são fechados ao sair.
+    """
+    root = processor.config.input_dir
+    options = processor.scan_options
+    watcher = create_watcher(root, options, backend, interval)  # Antes da carga inicial: nada se perde
+    tracker = StabilityTracker(settle)
+    try:
+        yield from processor.iter_process(finish=False)
+        LOGGER.info("👀 Observando %s (%s); Ctrl+C encerra", root, watcher.name)
+        if on_ready is not None:
+            on_ready()
+        while not stop.is_set():
+            timeout = min(interval, settle / 2) if len(tracker) else interval
+            for path in watcher.poll(timeout, stop):
+                if accepts_path(root, path, **options):
+                    tracker.observe(path)
+            ready = tracker.ready()
+            if ready:
+                LOGGER.info("📥 %d arquivo(s) novo(s) na entrada", len(ready))
+                yield from processor.iter_process(ready, finish=False)
+    finally:
+        watcher.close()
+        processor.close()
+
+
+def install_stop_handlers(stop: threading.Event) -> None:
+    """SIGTERM (systemd, docker stop) encerra o modo ``--watch`` entre dois ciclos."""
+
+    def handler(signum: int, frame: FrameType | None) -> None:  # pragma: no cover - depende de sinal externo
+        LOGGER.info("Sinal %s recebido: encerrando o modo watch", signum)
+        stop.set()
+
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, handler)
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import pytest
+
+from clinikondo import Config
+from clinikondo.backends import (
+    BackendEndpoint,
+    BackendPool,
+    parse_backends,
+    uses_backend_pool,
+)
+from clinikondo.ratelimit import AdaptiveRateLimiter
+from clinikondo.resilience import CircuitBreaker, CircuitOpenError
+
+
+def _pool(endpoints, failing=(), *, max_attempts=1, failure_threshold=1, sleeps=None):
+    calls = []
+
+    def client_factory(endpoint):
+        return endpoint.name
+
+    def limiter_factory(endpoint):
+        return AdaptiveRateLimiter(
+            endpoint.name,
+            max_attempts=max_attempts,
+            max_concurrency=endpoint.max_concurrency or 8,
+            breaker=CircuitBreaker(endpoint.name, failure_threshold=failure_threshold, reset_timeout=60),
+            sleep=(sleeps.append if sleeps is not None else lambda _: None),
+        )
+
+    def request(client, endpoint):
+        calls.append(client)
+        if client in failing:
+            raise ConnectionError(f"{client} fora do ar")
+        return client
+
+    return BackendPool(endpoints, limiter_factory, client_factory), request, calls
+
+
+def test_pool_fails_over_and_skips_unhealthy_endpoint():
+    endpoints = [BackendEndpoint("http://localhost:1/v1"), BackendEndpoint("http://localhost:2/v1")]
+    pool, request, calls = _pool(endpoints, failing={"http://localhost:1/v1"})
+
+    assert pool.call(request) == "http://localhost:2/v1"
+    assert calls == ["http://localhost:1/v1", "http://localhost:2/v1"]
+
+    # Com o circuito do primeiro aberto, as próximas requisições vão direto ao segundo
+    calls.clear()
+    assert [pool.call(request) for _ in range(3)] == ["http://localhost:2/v1"] * 3
+    assert calls == ["http://localhost:2/v1"] * 3
+    stats = pool.get_statistics()
+    assert stats["http://localhost:1/v1"]["failovers"] == 1
+    assert stats["http://localhost:1/v1"]["saudavel"] is False
+
+
+def test_pool_fails_over_without_per_endpoint_backoff_and_spreads_retries():
+    endpoints = [BackendEndpoint("http://localhost:1/v1"), BackendEndpoint("http://localhost:2/v1")]
+    sleeps = []
+    pool, request, calls = _pool(
+        endpoints, failing={"http://localhost:1/v1"}, max_attempts=3, failure_threshold=10, sleeps=sleeps
+    )
+    assert pool.call(request) == "http://localhost:2/v1"
+    assert calls == ["http://localhost:1/v1", "http://localhost:2/v1"]
+    assert sleeps == []  # Endpoint fora do ar não consome o backoff antes do failover
+
+    pool, request, calls = _pool(
+        endpoints, failing={endpoint.name for endpoint in endpoints}, max_attempts=3, failure_threshold=10, sleeps=sleeps
+    )
+    with pytest.raises(ConnectionError):
+        pool.call(request)
+    assert len(calls) == 3 and set(calls) == {"http://localhost:1/v1", "http://localhost:2/v1"}
+    assert len(sleeps) == 1  # Backoff só entre rodadas pelo pool
+
+
+def test_pool_fails_fast_when_every_circuit_is_open():
+    endpoints = [BackendEndpoint("http://localhost:1/v1"), BackendEndpoint("http://localhost:2/v1")]
+    sleeps = []
+    pool, request, calls = _pool(endpoints, failing={e.name for e in endpoints}, max_attempts=3, sleeps=sleeps)
+    with pytest.raises(CircuitOpenError):
+        pool.call(request)  # Primeira rodada abre os dois circuitos
+    assert len(calls) == 2
+    calls.clear()
+    sleeps.clear()
+
+    with pytest.raises(CircuitOpenError):
+        pool.call(request)
+    assert calls == []
+    assert sleeps == []  # Sem backoff entre rodadas que nem chegam aos endpoints
+
+
+def test_pool_prefers_least_outstanding_relative_to_weight():
+    endpoints = [
+        BackendEndpoint("http://localhost:1/v1", weight=1),
+        BackendEndpoint("http://localhost:2/v1", weight=3),
+    ]
+    pool, _request, _calls = _pool(endpoints)
+    escolhidos = [pool._select(set()).endpoint.name for _ in range(4)]
+    # Sem liberar as vagas: o endpoint de peso 3 recebe 3 das 4 primeiras requisições
+    assert escolhidos.count("http://localhost:2/v1") == 3
+
+
+def test_parse_backends_rejects_insecure_remote_endpoint():
+    assert parse_backends('[{"api_base": "http://localhost:11434/v1", "weight": 2}]')[0].weight == 2
+    with pytest.raises(ValueError):
+        parse_backends('[{"api_base": "http://gpu1.lan:11434/v1"}]')
+    assert parse_backends('[{"api_base": "http://gpu1.lan:11434/v1", "allow_insecure": true}]')
+
+
+def test_role_specific_endpoint_stays_out_of_backend_pool(tmp_path):
+    config = Config(
+        input_dir=tmp_path,
+        output_dir=tmp_path,
+        openai_api_key="chave-teste",
+        openai_api_base="http://localhost:11434/v1",
+        ocr_api_base="https://ocr.exemplo/v1",
+        llm_backends=[BackendEndpoint(api_base="http://gpu1:11434/v1")],
+    )
+
+    assert uses_backend_pool(config, config.openai_api_base)
+    assert uses_backend_pool(config, config.effective_classification_api_base)
+    assert not uses_backend_pool(config, config.effective_ocr_api_base)
+    config.llm_backends = []
+    assert not uses_backend_pool(config, config.openai_api_base)
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from clinikondo import Config
+from clinikondo.__main__ import main
+from clinikondo.batch import (
+    BatchAPIClient,
+    apply_batch_job,
+    list_jobs,
+    refresh_job,
+    submit_pipeline_batch,
+)
+
+
+class _BatchStandIn(BaseHTTPRequestHandler):
+    """Servidor local com os endpoints /files e /batches usados pelo modo lote."""
+
+    files: dict = {}
+    batches: dict = {}
+
+    def log_message(self, *args):  # silencia o log do http.server
+        pass
+
+    def _reply(self, payload, status=200, raw=False):
+        body = payload if raw else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path == "/v1/files":
+            content = re.search(rb"Content-Type: application/jsonl\r\n\r\n(.*)\r\n--", body, re.S).group(1)
+            file_id = f"file-{len(self.files) + 1}"
+            self.files[file_id] = content
+            return self._reply({"id": file_id})
+        if self.path == "/v1/batches":
+            payload = json.loads(body)
+            batch_id = f"batch-{len(self.batches) + 1}"
+            self.batches[batch_id] = {"id": batch_id, "status": "in_progress", "input": payload["input_file_id"]}
+            return self._reply(self.batches[batch_id])
+        self._reply({"error": "not found"}, status=404)
+
+    def do_GET(self):
+        match = re.fullmatch(r"/v1/batches/([\w-]+)", self.path)
+        if match:
+            return self._reply(self.batches[match.group(1)])
+        match = re.fullmatch(r"/v1/files/([\w-]+)/content", self.path)
+        if match:
+            return self._reply(self.files[match.group(1)], raw=True)
+        self._reply({"error": "not found"}, status=404)
+
+
+def _complete(batch_id):
+    """Simula o provedor concluindo o job: uma resposta por requisição."""
+    batch = _BatchStandIn.batches[batch_id]
+    linhas = []
+    for line in _BatchStandIn.files[batch["input"]].decode().splitlines():
+        request = json.loads(line)
+        nome = "Ana Souza" if "Ana Souza" in request["body"]["messages"][1]["content"] else "Bruno Lima"
+        content = json.dumps(
+            {
+                "nome_paciente": nome,
+                "data_documento": "2023-03-12",
+                "tipo_documento": "exame",
+                "especialidade": "laboratorial",
+                "descricao_curta": "hemograma",
+            }
+        )
+        linhas.append(
+            {
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "body": {"choices": [{"message": {"content": content}}]}},
+                "error": None,
+            }
+        )
+    _BatchStandIn.files["file-out"] = "\n".join(json.dumps(linha) for linha in linhas).encode()
+    batch.update(status="completed", output_file_id="file-out")
+
+
+@pytest.fixture()
+def stand_in():
+    _BatchStandIn.files, _BatchStandIn.batches = {}, {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _BatchStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+
+
+def test_batch_job_round_trip(tmp_path, stand_in):
+    input_dir = tmp_path / "entrada"
+    output_dir = tmp_path / "saida"
+    input_dir.mkdir()
+    (input_dir / "ana.txt").write_text("Paciente: Ana Souza\nHemograma completo", encoding="utf-8")
+    (input_dir / "bruno.txt").write_text("Paciente: Bruno Lima\nHemograma completo", encoding="utf-8")
+    config = Config(
+        input_dir=input_dir,
+        output_dir=output_dir,
+        openai_api_key="chave-teste",
+        openai_api_base=stand_in,
+        modo_lote=True,
+    )
+
+    job = submit_pipeline_batch(config)
+    assert (job.status, job.documentos) == ("in_progress", 2)
+    assert len(job.requests_path.read_text(encoding="utf-8").splitlines()) == 2
+
+    # Ainda em andamento: aplicar-lote apenas informa o status
+    assert main(["aplicar-lote", "--output-dir", str(output_dir), "--api-key", "x", "--api-base", stand_in]) == 0
+    assert list_jobs(config.state_dir)[0].status == "in_progress"
+
+    _complete(job.batch_id)
+    [job] = list_jobs(config.state_dir)
+    client = BatchAPIClient("chave-teste", stand_in)
+    placed, falhas = apply_batch_job(refresh_job(job, client), output_dir, client)
+
+    assert falhas == 0
+    assert sorted(document.caminho_destino.parent.parent.name for document in placed) == ["ana_souza", "bruno_lima"]
+    assert all(document.caminho_destino.exists() for document in placed)
+    assert list_jobs(config.state_dir)[0].status == "aplicado"
+    # Documentos já organizados não entram em um novo job
+    assert submit_pipeline_batch(config) is None
+
+
+def test_documents_in_pending_job_are_not_resubmitted(tmp_path, stand_in):
+    input_dir = tmp_path / "entrada"
+    input_dir.mkdir()
+    (input_dir / "ana.txt").write_text("Paciente: Ana Souza\nHemograma completo", encoding="utf-8")
+    (input_dir / "ana-copia.txt").write_text("Paciente: Ana Souza\nHemograma completo", encoding="utf-8")
+    config = Config(
+        input_dir=input_dir,
+        output_dir=tmp_path / "saida",
+        openai_api_key="chave-teste",
+        openai_api_base=stand_in,
+        modo_lote=True,
+    )
+
+    assert submit_pipeline_batch(config).documentos == 1  # Cópia no mesmo lote é descartada
+    assert submit_pipeline_batch(config) is None  # Job ainda não aplicado
+    assert len(list_jobs(config.state_dir)) == 1
+
+    (input_dir / "bruno.txt").write_text("Paciente: Bruno Lima\nHemograma completo", encoding="utf-8")
+    job = submit_pipeline_batch(config)
+    assert job.documentos == 1
+    assert "bruno.txt" in job.documents_path.read_text(encoding="utf-8")
+
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from datetime import date
+from pathlib import Path
+
+from clinikondo import DocumentTypeCatalog, PatientRegistry
+from clinikondo.cascade import CascadeExtractor
+from clinikondo.llm import BaseExtractor
+from clinikondo.models import Document, LLMExtractionResult
+
+
+class _Scripted(BaseExtractor):
+    """Extrator que responde por nome de arquivo: confiança ou exceção."""
+
+    def __init__(self, respostas):
+        self.respostas = respostas
+        self.chamados = []
+
+    def extract(self, document, *, patient_registry, type_catalog):
+        self.chamados.append(document.nome_arquivo_original)
+        resposta = self.respostas[document.nome_arquivo_original]
+        if isinstance(resposta, Exception):
+            raise resposta
+        result = LLMExtractionResult(
+            nome_paciente="Ana Souza", data_documento=date(2024, 1, 2), tipo_documento="exame"
+        )
+        result.extras["confianca_extracao"] = resposta
+        return result
+
+
+def _documents(*nomes):
+    return [Document(caminho_entrada=Path(nome), texto_extraido="texto") for nome in nomes]
+
+
+def test_cascade_batch_escalates_only_low_confidence_documents():
+    rapido = _Scripted({"a.pdf": 1.0, "b.pdf": 0.7, "c.pdf": 0.5})
+    maior = _Scripted({"b.pdf": 1.0, "c.pdf": 1.0})
+    cascade = CascadeExtractor(rapido, maior, threshold=0.9)
+
+    results = cascade.extract_batch(
+        _documents("a.pdf", "b.pdf", "c.pdf"),
+        patient_registry=PatientRegistry(),
+        type_catalog=DocumentTypeCatalog(),
+    )
+
+    assert [result.extras["cascata"] for result in results] == ["rapido", "escalonado", "escalonado"]
+    assert maior.chamados == ["b.pdf", "c.pdf"]
+    stats = cascade.get_statistics()
+    assert stats["niveis"]["rapido"]["aceitos"] == 1
+    assert stats["niveis"]["rapido"]["baixa_confianca"] == 2
+    assert stats["taxa_escalonamento"] == round(2 / 3, 3)
+
+
+def test_cascade_escalates_invalid_fast_response():
+    rapido = _Scripted({"a.pdf": 0.95, "b.pdf": ValueError("Campo obrigatório ausente")})
+    maior = _Scripted({"b.pdf": 1.0})
+    cascade = CascadeExtractor(rapido, maior, threshold=0.95)
+    kwargs = dict(patient_registry=PatientRegistry(), type_catalog=DocumentTypeCatalog())
+
+    a, b = _documents("a.pdf", "b.pdf")
+    assert cascade.extract(a, **kwargs).extras["cascata"] == "rapido"
+    assert cascade.extract(b, **kwargs).extras["cascata"] == "escalonado"
+    assert maior.chamados == ["b.pdf"]
+    assert cascade.get_statistics()["niveis"]["rapido"]["invalidos"] == 1
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import json
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from clinikondo import DocumentTypeCatalog, PatientRegistry
+from clinikondo.classifier import LocalClassifierExtractor, train_classifier
+from clinikondo.llm import BaseExtractor
+from clinikondo.models import Document, LLMExtractionResult
+
+EXEMPLOS = [
+    ("Receita médica: amoxicilina 500mg tomar de 8 em 8 horas por 7 dias", "receita", "clinica_geral"),
+    ("Prescrição: losartana 50mg uso contínuo, tomar 1 comprimido ao dia", "receita", "cardiologia"),
+    ("Hemograma completo: hemácias, leucócitos, plaquetas dentro da normalidade", "exame", "laboratorial"),
+    ("Glicemia em jejum 92 mg/dL, colesterol total 180 mg/dL, resultado laboratorial", "exame", "laboratorial"),
+]
+
+
+class _LLMStub(BaseExtractor):
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def extract(self, document, *, patient_registry, type_catalog):
+        self.calls += 1
+        return LLMExtractionResult(
+            nome_paciente="Ana Lima", data_documento=date(2024, 1, 1), tipo_documento="documento"
+        )
+
+
+def test_incremental_training_and_local_answers(tmp_path):
+    examples_path = tmp_path / "exemplos_classificacao.jsonl"
+    model_path = tmp_path / "classificador.npz"
+    with examples_path.open("w", encoding="utf-8") as handle:
+        for texto, tipo, especialidade in EXEMPLOS * 5:
+            handle.write(json.dumps({"texto": texto, "tipo_documento": tipo, "especialidade": especialidade}) + "\n")
+
+    assert train_classifier(examples_path, model_path)["exemplos_novos"] == 20
+    # Sem exemplos novos, o treino incremental não reprocessa o arquivo
+    assert train_classifier(examples_path, model_path)["exemplos_total"] == 20
+
+    registry = PatientRegistry()
+    registry.ensure_patient("Ana Lima")
+    llm = _LLMStub()
+    extractor = LocalClassifierExtractor.from_path(llm, model_path, threshold=0.9)
+    document = Document(
+        caminho_entrada=Path("hemo.pdf"),
+        texto_extraido="Paciente: Ana Lima - 05/02/2024\nHemograma completo: leucócitos e plaquetas normais",
+    )
+    result = extractor.extract(document, patient_registry=registry, type_catalog=DocumentTypeCatalog())
+
+    assert (result.tipo_documento, result.especialidade) == ("exame", "laboratorial")
+    assert result.data_documento == date(2024, 2, 5)
+    assert llm.calls == 0
+    assert extractor.get_statistics()["respondidos_localmente"] == 1
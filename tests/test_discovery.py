@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import pytest
+
+from clinikondo.discovery import prefetch, scan_documents
+from clinikondo.processing import SUPPORTED_EXTENSIONS
+
+
+def _scan(root, **options):
+    return sorted(
+        found.path.relative_to(root).as_posix()
+        for found in scan_documents(root, extensions=SUPPORTED_EXTENSIONS, **options)
+    )
+
+
+@pytest.fixture
+def inbox(tmp_path):
+    for relative in (
+        "laudo.pdf",
+        "notas.docx",
+        "clinica_a/2024/exame.txt",
+        "clinica_a/rascunhos/rascunho.txt",
+        "clinica_b/receita.jpg",
+        ".clinikondo/cache.txt",
+        "saida/organizado.txt",
+    ):
+        path = tmp_path / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("conteúdo", encoding="utf-8")
+    return tmp_path
+
+
+def test_scan_is_recursive_and_skips_hidden_and_output_dirs(inbox):
+    assert _scan(inbox, skip_dirs=[inbox / "saida"]) == [
+        "clinica_a/2024/exame.txt",
+        "clinica_a/rascunhos/rascunho.txt",
+        "clinica_b/receita.jpg",
+        "laudo.pdf",
+    ]
+    assert _scan(inbox, recursive=False) == ["laudo.pdf"]
+
+
+def test_scan_include_and_exclude_globs(inbox):
+    assert _scan(inbox, include=["clinica_a/*"], exclude=["rascunhos"]) == ["clinica_a/2024/exame.txt"]
+    assert _scan(inbox, include=["*.jpg", "*.pdf"]) == ["clinica_b/receita.jpg", "laudo.pdf"]
+
+
+def test_scan_reuses_direntry_stat(inbox):
+    [found] = scan_documents(inbox, extensions={".pdf"}, recursive=False)
+    assert found.stat.st_size == (inbox / "laudo.pdf").stat().st_size
+
+
+def test_prefetch_forwards_items_and_errors():
+    def numbers():
+        yield from range(3)
+        raise OSError("compartilhamento indisponível")
+
+    iterator = prefetch(numbers(), maxsize=1)
+    assert [next(iterator) for _ in range(3)] == [0, 1, 2]
+    with pytest.raises(OSError, match="indisponível"):
+        next(iterator)
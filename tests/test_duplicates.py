@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from clinikondo.__main__ import find_duplicates, main
+from clinikondo.hash_tracker import PARTIAL_BLOCK_SIZE, HashTracker
+
+
+def _conteudo(meio: bytes) -> bytes:
+    bloco = b"%PDF" + b"a" * (PARTIAL_BLOCK_SIZE - 4)
+    return bloco + meio + bloco
+
+
+def test_find_duplicates_separates_same_size_and_same_edges(tmp_path):
+    (tmp_path / "ana").mkdir()
+    (tmp_path / "ana" / "laudo.pdf").write_bytes(_conteudo(b"original"))
+    (tmp_path / "copia.pdf").write_bytes(_conteudo(b"original"))
+    (tmp_path / "mesmas-bordas.pdf").write_bytes(_conteudo(b"diferent"))  # Mesmo tamanho e 1º/último bloco
+    (tmp_path / "unico.pdf").write_bytes(b"%PDF tamanho unico")
+    (tmp_path / "a.txt").write_text("igual", encoding="utf-8")
+    (tmp_path / "b.txt").write_text("igual", encoding="utf-8")
+    (tmp_path / "c.txt").write_text("outro", encoding="utf-8")
+    (tmp_path / "planilha.xlsx").write_text("igual", encoding="utf-8")
+
+    duplicates = find_duplicates(tmp_path, workers=4)
+
+    assert list(duplicates.values()) == [
+        [tmp_path / "a.txt", tmp_path / "b.txt"],
+        [tmp_path / "ana" / "laudo.pdf", tmp_path / "copia.pdf"],
+    ]
+    assert HashTracker.calculate_hash_bytes(_conteudo(b"original")) in duplicates
+
+
+def test_find_duplicates_reuses_cached_hashes_until_file_changes(tmp_path, monkeypatch):
+    for nome in ("a.txt", "b.txt", "c.txt"):
+        (tmp_path / nome).write_text("igual", encoding="utf-8")
+    find_duplicates(tmp_path)
+    assert not (tmp_path / ".clinikondo").exists()  # Sem --cache-hashes nada é gravado na pasta
+    find_duplicates(tmp_path, cache=True)
+    assert (tmp_path / ".clinikondo" / "hash_cache.json").exists()
+
+    lidos = []
+    calculate_hash = HashTracker.calculate_hash
+    monkeypatch.setattr(
+        HashTracker, "calculate_hash", staticmethod(lambda path: lidos.append(path.name) or calculate_hash(path))
+    )
+    (tmp_path / "c.txt").write_text("mudou", encoding="utf-8")
+    (tmp_path / "b.txt").unlink()
+
+    monkeypatch.chdir(tmp_path)
+    assert find_duplicates(Path("."), cache=True) == {}
+    assert lidos == []  # Sem outro arquivo de mesmo tamanho: nada é lido inteiro
+    (tmp_path / "d.txt").write_text("igual", encoding="utf-8")
+    assert list(find_duplicates(tmp_path, cache=True).values()) == [[tmp_path / "a.txt", tmp_path / "d.txt"]]
+    assert lidos == ["d.txt"]  # a.txt veio do cache
+
+    tracker = HashTracker(tmp_path / ".clinikondo" / "processed_hashes.json")
+    assert str(tmp_path / "b.txt") not in tracker._load_cache()  # Podado mesmo varrendo "."
+
+
+def test_rewrite_with_restored_mtime_invalidates_cached_hash(tmp_path):
+    a, b = tmp_path / "a.txt", tmp_path / "b.txt"
+    a.write_text("igual", encoding="utf-8")
+    b.write_text("igual", encoding="utf-8")
+    assert len(find_duplicates(tmp_path, cache=True)) == 1
+
+    original = b.stat()
+    b.write_text("outro", encoding="utf-8")  # Mesmo tamanho, mtime restaurado (cp -p, rsync -t)
+    os.utime(b, ns=(original.st_atime_ns, original.st_mtime_ns))
+    assert find_duplicates(tmp_path, cache=True) == {}
+
+
+def test_remover_checks_bytes_before_deleting(tmp_path, monkeypatch):
+    a, b, c = tmp_path / "a.txt", tmp_path / "b.txt", tmp_path / "c.txt"
+    for arquivo in (a, b, c):
+        arquivo.write_text("igual", encoding="utf-8")
+    b.write_text("outro", encoding="utf-8")  # Mudou entre a verificação e a remoção
+    monkeypatch.setattr("clinikondo.__main__.find_duplicates", lambda *args, **kwargs: {"hash": [a, b, c]})
+
+    assert main(["verificar-duplicatas", str(tmp_path), "--acao", "remover"]) == 0
+    assert a.exists() and b.exists() and not c.exists()
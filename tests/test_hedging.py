@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from clinikondo.hedging import Hedger, LatencyTracker
+
+
+def _warm_tracker(seconds=0.01, samples=20):
+    tracker = LatencyTracker(min_samples=samples)
+    for _ in range(samples):
+        tracker.record(seconds)
+    return tracker
+
+
+def test_hedge_fires_after_p95_and_first_valid_response_wins():
+    release = threading.Event()
+    calls = []
+
+    def attempt():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            release.wait(2)  # primeira requisição "presa" na cauda
+            return "lenta"
+        return "rapida"
+
+    hedger = Hedger(max_rate=1.0, tracker=_warm_tracker())
+    assert hedger.call(attempt) == "rapida"
+    release.set()
+    stats = hedger.get_statistics()
+    assert (stats["copias"], stats["vitorias_copia"]) == (1, 1)
+
+
+def test_invalid_primary_response_waits_for_hedge():
+    responses = iter(["não é json", '{"ok": true}'])
+    lock = threading.Lock()
+    gate = threading.Event()
+
+    def attempt():
+        with lock:
+            value = next(responses)
+        if value == "não é json":
+            gate.wait(0.2)  # passa do p95 para a cópia ser disparada
+        return value
+
+    def validate(value):
+        if not value.startswith("{"):
+            raise ValueError("resposta inválida")
+
+    hedger = Hedger(max_rate=1.0, tracker=_warm_tracker())
+    assert hedger.call(attempt, validate) == '{"ok": true}'
+
+
+def test_hedge_rate_cap_limits_copies():
+    hedger = Hedger(max_rate=0.0, tracker=_warm_tracker(seconds=0.001))
+    event = threading.Event()
+    assert hedger.call(lambda: event.wait(0.05) or "ok") == "ok"
+    stats = hedger.get_statistics()
+    assert (stats["copias"], stats["negadas_por_limite"]) == (0, 1)
+
+
+def test_no_hedge_without_enough_samples():
+    hedger = Hedger(max_rate=1.0, tracker=LatencyTracker(min_samples=5))
+    with pytest.raises(ConnectionError):
+        hedger.call(lambda: (_ for _ in ()).throw(ConnectionError("fora do ar")))
+    assert hedger.get_statistics()["copias"] == 0
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from datetime import date
+from pathlib import Path
+
+from clinikondo import DocumentTypeCatalog, PatientRegistry
+from clinikondo.heuristics import FastPathExtractor
+from clinikondo.llm import BaseExtractor
+from clinikondo.models import Document, LLMExtractionResult
+
+LAUDO_LABORATORIO = (
+    "LABORATÓRIO SÃO LUCAS\n"
+    "Paciente: José da Silva    Idade: 54 anos\n"
+    "Data da coleta: 12/03/2023\n"
+    "Resultado de exame laboratorial - hemograma completo\n"
+    "Exame: glicemia em jejum\n"
+)
+
+
+class _LLMStub(BaseExtractor):
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def extract(self, document, *, patient_registry, type_catalog):
+        self.calls += 1
+        return LLMExtractionResult(
+            nome_paciente="LLM", data_documento=date(2020, 1, 1), tipo_documento="documento"
+        )
+
+
+def test_fast_path_skips_llm_only_for_confident_documents():
+    registry = PatientRegistry()
+    registry.ensure_patient("José da Silva")
+    catalog = DocumentTypeCatalog()
+    llm = _LLMStub()
+    extractor = FastPathExtractor(llm, threshold=0.85)
+
+    conhecido = Document(caminho_entrada=Path("lab.pdf"), texto_extraido=LAUDO_LABORATORIO)
+    result = extractor.extract(conhecido, patient_registry=registry, type_catalog=catalog)
+    assert (result.nome_paciente, result.data_documento, result.tipo_documento) == (
+        "José da Silva",
+        date(2023, 3, 12),
+        "exame",
+    )
+    assert result.especialidade == "laboratorial"
+
+    # Sem paciente cadastrado a confiança fica abaixo do limiar
+    desconhecido = Document(caminho_entrada=Path("lab2.pdf"), texto_extraido=LAUDO_LABORATORIO)
+    result = extractor.extract(desconhecido, patient_registry=PatientRegistry(), type_catalog=catalog)
+    assert result.nome_paciente == "LLM"
+
+    stats = extractor.get_statistics()
+    assert (stats["llm_evitadas"], stats["llm_consultadas"], llm.calls) == (1, 1, 1)
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import json
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from clinikondo import Config, DocumentTypeCatalog, PatientRegistry
+from clinikondo.backends import BackendEndpoint, BackendPool
+from clinikondo.llm import (
+    BATCH_PROMPT,
+    DEFAULT_PROMPT,
+    ESPECIALIDADES,
+    RESPONSE_FORMAT,
+    SYSTEM_PROMPT,
+    TIPOS_DOCUMENTO,
+    OpenAILLMExtractor,
+    read_json_stream,
+    split_prompt,
+    validate_llm_response,
+)
+from clinikondo.models import Document
+from clinikondo.ratelimit import AdaptiveRateLimiter
+
+
+def _item(nome, tipo="exame"):
+    return {
+        "nome_paciente": nome,
+        "data_documento": "2023-03-12",
+        "tipo_documento": tipo,
+        "especialidade": "laboratorial",
+        "descricao_curta": "hemograma",
+    }
+
+
+class _Chunk:
+    def __init__(self, text, usage=None):
+        self.choices = [type("Choice", (), {"delta": type("Delta", (), {"content": text})()})()] if text else []
+        self.usage = usage
+
+
+class _Stream:
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.lidos = 0
+        self.fechado = False
+
+    def __iter__(self):
+        for piece in self.pieces:
+            self.lidos += 1
+            yield piece if isinstance(piece, _Chunk) else _Chunk(piece)
+
+    def close(self):
+        self.fechado = True
+
+
+def test_read_json_stream_stops_when_object_closes():
+    stream = _Stream(['```json\n{"descricao_curta": "a } b", ', '"x": {"y": 1}}', "\n```", " texto extra"])
+    content, encerrado_cedo, usage = read_json_stream(stream)
+    assert content == '```json\n{"descricao_curta": "a } b", "x": {"y": 1}}'
+    assert stream.fechado and usage is None
+
+
+class _Completions:
+    """``client.chat.completions`` falso: responde *respostas* em ordem (ou um item válido)."""
+
+    def __init__(self, respostas=None, rejeitar=(), mensagem=None):
+        self.respostas = list(respostas or [])
+        self.rejeitar = rejeitar
+        self.mensagem = mensagem
+        self.chamadas = []
+
+    def create(self, **kwargs):
+        self.chamadas.append(kwargs)
+        for nome in self.rejeitar:
+            if nome in kwargs:
+                erro = RuntimeError(self.mensagem or f"{nome} não suportado")
+                erro.status_code = 400
+                raise erro
+        conteudo = self.respostas.pop(0) if self.respostas else json.dumps(_item("Ana Souza"))
+        if kwargs.get("stream"):
+            return _Stream([conteudo, "lixo depois do JSON"])
+        message = type("Message", (), {"content": conteudo})()
+        return type("Response", (), {"choices": [type("Choice", (), {"message": message})()], "usage": None})()
+
+    def prompts(self):
+        return [chamada["messages"][1]["content"] for chamada in self.chamadas]
+
+
+class _CountingPool(BackendPool):
+    chamadas = 0
+
+    def call(self, request, **kwargs):
+        self.chamadas += 1
+        return super().call(request, **kwargs)
+
+
+def _extractor(completions, **settings):
+    """Extrator real com um pool de um endpoint cujo cliente é *completions*."""
+    client = type("Client", (), {"chat": type("Chat", (), {"completions": completions})()})()
+    pool = _CountingPool(
+        [BackendEndpoint("http://localhost:11434/v1")],
+        limiter_factory=lambda endpoint: AdaptiveRateLimiter(endpoint.name, sleep=lambda _: None),
+        client_factory=lambda endpoint: client,
+    )
+    config = Config(input_dir=Path("entrada"), output_dir=Path("saida"), modelo_llm="teste", **settings)
+    return OpenAILLMExtractor(config, pool=pool)
+
+
+def test_extract_batch_uses_one_request_and_falls_back_for_invalid_items():
+    lote = [dict(_item("Ana Souza"), id=1), dict(_item("Bruno Lima", tipo="inexistente"), id=2)]
+    completions = _Completions([json.dumps(lote), json.dumps(_item("Bruno Lima"))])
+    extractor = _extractor(completions, llm_max_tokens=100, llm_stream=False)
+    documents = [
+        Document(caminho_entrada=Path(f"doc{indice}.pdf"), texto_extraido=f"texto {indice}")
+        for indice in (1, 2)
+    ]
+
+    results = extractor.extract_batch(
+        documents, patient_registry=PatientRegistry(), type_catalog=DocumentTypeCatalog()
+    )
+
+    assert [result.nome_paciente for result in results] == ["Ana Souza", "Bruno Lima"]
+    assert results[0].data_documento == date(2023, 3, 12)
+    assert '<documento id="2">' in completions.prompts()[0]
+    assert len(completions.chamadas) == 2  # lote + fallback individual do elemento inválido
+    assert completions.chamadas[0]["max_tokens"] == 200
+    stats = extractor.get_statistics()
+    assert (stats["lotes"], stats["documentos_em_lote"], stats["fallback_individual"]) == (1, 2, 1)
+
+
+def test_call_uses_structured_output_and_falls_back_when_rejected():
+    completions = _Completions(rejeitar=["response_format"])
+    extractor = _extractor(completions)
+
+    assert json.loads(extractor._call_openai("prompt"))["nome_paciente"] == "Ana Souza"
+    assert completions.chamadas[0]["response_format"] == RESPONSE_FORMAT
+    assert completions.chamadas[0]["max_tokens"] == 256
+    assert "response_format" not in completions.chamadas[1]
+    assert completions.chamadas[1]["stream_options"] == {"include_usage": True}  # Só o parâmetro citado sai
+    assert completions.chamadas[1]["max_tokens"] == 512  # Texto livre não herda o teto da saída estruturada
+    assert extractor._pool.chamadas == 2  # A nova requisição passa de novo pelo pool (taxa, vaga, circuito)
+    # O endpoint fica marcado: a próxima chamada já vai sem response_format
+    extractor._call_openai("prompt")
+    assert len(completions.chamadas) == 3 and "response_format" not in completions.chamadas[2]
+    assert completions.chamadas[2]["max_tokens"] == 512
+    stats = extractor.get_statistics()
+    assert stats["endpoints_sem_saida_estruturada"] == ["http://localhost:11434/v1"]
+    assert stats["endpoints_sem_stream_options"] == []
+
+
+def test_rejected_stream_options_keeps_structured_output():
+    completions = _Completions(rejeitar=["stream_options"])
+    extractor = _extractor(completions)
+
+    extractor._call_openai("prompt")
+    extractor._call_openai("prompt")
+    assert [("stream_options" in c, "response_format" in c) for c in completions.chamadas] == [
+        (True, True),
+        (False, True),
+        (False, True),
+    ]
+    assert extractor.get_statistics()["endpoints_sem_stream_options"] == ["http://localhost:11434/v1"]
+
+
+def test_bad_request_not_naming_an_option_is_not_downgraded():
+    completions = _Completions(rejeitar=["response_format"], mensagem="contexto excede o limite do modelo")
+    extractor = _extractor(completions)
+
+    with pytest.raises(RuntimeError, match="contexto excede"):
+        extractor._call_openai("prompt")
+    assert len(completions.chamadas) == 1
+    assert extractor._sem_saida_estruturada == set()
+
+
+def test_split_prompt_keeps_static_instructions_in_system_message():
+    system, user = split_prompt(DEFAULT_PROMPT, "texto", "Paciente: Ana Souza")
+    assert system.startswith(SYSTEM_PROMPT) and "CATEGORIAS VÁLIDAS" in system
+    assert '"nome_paciente": "<texto>"' in system  # chaves escapadas do template restauradas
+    assert "Ana Souza" not in system
+    assert user.startswith("Documento:") and "Paciente: Ana Souza" in user
+    # O prefixo é idêntico para qualquer documento
+    assert split_prompt(DEFAULT_PROMPT, "texto", "outro")[0] == system
+
+
+def test_prompts_list_exactly_the_values_the_validator_accepts():
+    for prompt in (DEFAULT_PROMPT, BATCH_PROMPT):
+        for tipo in TIPOS_DOCUMENTO:
+            assert f"- {tipo} →" in prompt
+        for especialidade in ESPECIALIDADES:
+            assert f"- {especialidade}\n" in prompt
+    validate_llm_response(dict(_item("Ana Souza", tipo="agenda"), especialidade="infectologia"))
+    with pytest.raises(ValueError):
+        validate_llm_response(dict(_item("Ana Souza"), especialidade="neurologia"))
+
+
+def test_read_json_stream_records_cached_tokens_from_final_usage_chunk():
+    details = type("Details", (), {"cached_tokens": 1024})()
+    usage = type("Usage", (), {"prompt_tokens": 1500, "total_tokens": 1560, "prompt_tokens_details": details})()
+    stream = _Stream(['{"a": 1}', _Chunk(None, usage=usage), "nunca lido"])
+    content, _encerrado, lido = read_json_stream(stream)
+    assert content == '{"a": 1}' and lido is usage and stream.lidos == 2
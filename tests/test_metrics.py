@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+
+from clinikondo import Config, DocumentTypeCatalog, PatientRegistry
+from clinikondo.llm import BaseExtractor
+from clinikondo.manifest import list_manifests, read_manifest
+from clinikondo.metrics import (
+    LLM,
+    OCR,
+    DocumentMetrics,
+    Reservoir,
+    RunMetrics,
+    percentile,
+    record_attempt,
+    record_tokens,
+    record_upload,
+    stage,
+    track,
+)
+from clinikondo.models import LLMExtractionResult
+from clinikondo.processing import DocumentProcessor
+
+
+class _LLMStub(BaseExtractor):
+    """Simula uma requisição com uma nova tentativa e uso de tokens informado."""
+
+    def extract(self, document, *, patient_registry, type_catalog):
+        record_attempt()
+        record_attempt()
+        record_upload(len(document.texto_extraido.encode("utf-8")))
+        record_tokens(prompt=120, resposta=30, cache=100)
+        return LLMExtractionResult(
+            nome_paciente="Ana Souza", data_documento=date(2024, 5, 2), tipo_documento="exame"
+        )
+
+
+def test_percentile_uses_nearest_rank():
+    valores = list(range(1, 101))
+    assert percentile(valores, 50) == 50
+    assert percentile(valores, 95) == 95
+    assert percentile(valores, 99) == 99
+    assert percentile([7.0], 99) == 7.0
+    assert percentile([], 50) == 0.0
+
+
+def test_reservoir_keeps_bounded_uniform_sample():
+    amostra = Reservoir(100, seed=7)
+    for valor in range(10_000):
+        amostra.add(valor)
+
+    assert amostra.vistos == 10_000
+    assert len(amostra.amostras) == 100
+    assert 3_000 < percentile(amostra.amostras, 50) < 7_000
+
+
+def test_stage_records_go_to_innermost_stage_across_threads():
+    with track() as metrics:
+        with stage("extracao"), stage(OCR):
+            ctx = contextvars.copy_context()
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                for _ in range(4):
+                    executor.submit(ctx.run, record_upload, 1000)
+        with stage(LLM):
+            record_attempt()
+
+    assert metrics.etapas[OCR].bytes_enviados == 4000
+    assert metrics.etapas["extracao"].bytes_enviados == 0
+    assert metrics.etapas[LLM].tentativas == 1
+    assert metrics.etapas["extracao"].segundos >= metrics.etapas[OCR].segundos
+
+    # Fora de um documento as chamadas não têm efeito
+    record_attempt()
+    assert metrics.etapas[LLM].tentativas == 1
+
+
+def test_batch_request_is_shared_between_documents():
+    lote = DocumentMetrics()
+    with track(lote), stage(LLM):
+        record_tokens(prompt=300, resposta=90)
+
+    documentos = [DocumentMetrics() for _ in range(3)]
+    for metrics in documentos:
+        metrics.absorb(lote, 1 / 3)
+
+    assert [metrics.etapas[LLM].tokens_prompt for metrics in documentos] == [100, 100, 100]
+    assert all(metrics.etapas[LLM].segundos == lote.etapas[LLM].segundos for metrics in documentos)
+
+
+def test_processor_fills_document_fields_and_saves_run_summary(tmp_path):
+    input_dir = tmp_path / "entrada"
+    input_dir.mkdir()
+    texto = "Paciente: Ana Souza\nData: 02/05/2024\nHemograma completo"
+    (input_dir / "hemograma.txt").write_text(texto, encoding="utf-8")
+    config = Config(input_dir=input_dir, output_dir=tmp_path / "saida", openai_api_key="chave-teste")
+    run_metrics = RunMetrics()
+    processor = DocumentProcessor(
+        config, _LLMStub(), PatientRegistry(), DocumentTypeCatalog(), metrics=run_metrics
+    )
+
+    [documento] = processor.process_all()
+
+    assert documento.metodo_extracao == "texto"
+    assert documento.chars_extraidos == len(texto)
+    assert documento.tentativas_llm == 2
+    assert documento.tempo_processamento_ms >= 0
+
+    resumo = run_metrics.summary()
+    assert resumo["documentos"] == 1
+    assert resumo["tokens_prompt"] == 120 and resumo["tokens_cache"] == 100
+    assert resumo["tokens_por_documento"] == 150.0
+    assert set(resumo["etapas_ms"]) == {"hash", "extracao", "llm", "organizacao"}
+
+    [salvo] = config.metrics_dir.glob("execucao-*.json")
+    dados = json.loads(salvo.read_text(encoding="utf-8"))
+    assert dados["resumo"]["bytes_enviados"] == len(texto.encode("utf-8"))
+    assert dados["resumo"]["tentativas"] == 2
+    assert "p99" in run_metrics.format_summary()
+
+
+def test_manifest_has_one_line_per_document_including_failures_and_duplicates(tmp_path):
+    input_dir = tmp_path / "entrada"
+    input_dir.mkdir()
+    texto = "Paciente: Ana Souza\nData: 02/05/2024\nHemograma completo"
+    (input_dir / "a_hemograma.txt").write_text(texto, encoding="utf-8")
+    (input_dir / "b_copia.txt").write_text(texto, encoding="utf-8")
+    (input_dir / "c_vazio.txt").write_text("", encoding="utf-8")
+    config = Config(input_dir=input_dir, output_dir=tmp_path / "saida", openai_api_key="chave-teste", llm_batch_size=4)
+    processor = DocumentProcessor(config, _LLMStub(), PatientRegistry(), DocumentTypeCatalog())
+
+    processor.process_all()
+
+    [manifesto] = list_manifests(config.manifests_dir)
+    # A varredura segue a ordem do sistema de arquivos: qualquer uma das cópias pode ser a duplicata
+    linhas = {linha["status"]: linha for linha in read_manifest(manifesto)}
+    assert sorted(linhas) == ["duplicata", "falha", "organizado"]
+    organizado = linhas["organizado"]
+    assert organizado["campos"]["nome_paciente"] == "Ana Souza"
+    assert organizado["destino"].endswith(".txt")
+    assert set(organizado["etapas_ms"]) >= {"extracao", "llm", "organizacao"}
+    assert linhas["duplicata"]["hash"] == organizado["hash"]
+    assert Path(linhas["falha"]["arquivo"]).name == "c_vazio.txt"
+    assert "vazio" in linhas["falha"]["erro"].lower()
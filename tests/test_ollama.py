@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from clinikondo import Config, DocumentTypeCatalog, PatientRegistry
+from clinikondo.backends import BackendEndpoint
+from clinikondo.llm import LLM_RESPONSE_SCHEMA, build_extractor
+from clinikondo.models import Document
+from clinikondo.ollama import native_base_url, reset_clients, warm_up_models
+
+
+class _OllamaStandIn(BaseHTTPRequestHandler):
+    """Servidor local com /api/chat: o primeiro uso de cada modelo "carrega" o modelo."""
+
+    requests: list = []
+    loaded: set = set()
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append(payload)
+        load = 0 if payload["model"] in self.loaded else 2_500_000_000
+        self.loaded.add(payload["model"])
+        reply = {"model": payload["model"], "done": True, "load_duration": load}
+        if payload["messages"]:
+            reply["message"] = {
+                "role": "assistant",
+                "content": json.dumps(
+                    {
+                        "nome_paciente": "Ana Souza",
+                        "data_documento": "2023-03-12",
+                        "tipo_documento": "exame",
+                        "especialidade": "laboratorial",
+                        "descricao_curta": "hemograma",
+                    }
+                ),
+            }
+            reply.update(prompt_eval_count=420, eval_count=38, total_duration=900_000_000)
+        else:
+            reply["done_reason"] = "load"
+        body = json.dumps(reply).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture()
+def stand_in():
+    _OllamaStandIn.requests, _OllamaStandIn.loaded = [], set()
+    reset_clients()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _OllamaStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    reset_clients()
+
+
+def test_native_ollama_warm_up_keep_alive_and_load_metrics(tmp_path, stand_in):
+    config = Config(
+        input_dir=tmp_path,
+        output_dir=tmp_path / "saida",
+        openai_api_base=stand_in,
+        modelo_llm="qwen2.5:7b",
+        llm_provider="ollama",
+        ollama_keep_alive="1h",
+        ocr_strategy="traditional",
+    )
+    config.validar()  # sem OPENAI_API_KEY: o Ollama nativo não usa chave
+    extractor = build_extractor(config, None)
+
+    warm_up_models(config)
+    document = Document(caminho_entrada=Path("ana.txt"), texto_extraido="Paciente: Ana Souza\nHemograma")
+    result = extractor.extract(document, patient_registry=PatientRegistry(), type_catalog=DocumentTypeCatalog())
+
+    aquecimento, chat = _OllamaStandIn.requests
+    assert aquecimento["messages"] == [] and aquecimento["keep_alive"] == "1h"
+    assert chat["keep_alive"] == "1h" and chat["format"] == LLM_RESPONSE_SCHEMA and chat["stream"] is False
+    assert result.nome_paciente == "Ana Souza"
+    assert result.extras["tempo_carga_modelo_ms"] == 0  # o aquecimento já pagou a carga
+    stats = extractor.get_statistics()
+    assert (stats["cargas_modelo"], stats["tempo_carga_modelo_ms"]) == (1, 2500)
+    assert "qwen2.5:7b" in stats["aquecimento_ms"]
+
+
+def test_native_base_url_strips_openai_suffix():
+    assert native_base_url("http://localhost:11434/v1/") == "http://localhost:11434"
+    assert native_base_url(None) == "http://localhost:11434"
+
+
+def test_native_ollama_rejects_pool_and_hedging(tmp_path):
+    base = dict(input_dir=tmp_path, output_dir=tmp_path / "saida", llm_provider="ollama")
+    with pytest.raises(ValueError, match="--backends"):
+        Config(**base, llm_backends=[BackendEndpoint(api_base="http://localhost:11434/v1")]).validar()
+    with pytest.raises(ValueError, match="--hedge"):
+        Config(**base, llm_hedge=True).validar()
+    Config(**base).validar()
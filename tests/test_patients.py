@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import json
+
+from clinikondo import PatientRegistry
+from clinikondo.models import Patient
+
+
+def test_sqlite_registry_persists_single_patient_edits(tmp_path):
+    db_path = tmp_path / "patients.db"
+    registry = PatientRegistry(db_path)
+    maria = registry.ensure_patient("Maria Aparecida Souza")
+    registry.ensure_patient("José da Silva")
+    assert registry.add_alias(maria.slug_diretorio, "Cida Souza")
+
+    reopened = PatientRegistry(db_path)
+    assert reopened.match("cida souza").slug_diretorio == maria.slug_diretorio
+    assert reopened.match_in_text("Paciente: JOSE DA SILVA").nome_completo == "José da Silva"
+
+    patient = reopened.get_by_slug(maria.slug_diretorio)
+    patient.genero = "F"
+    reopened.save()
+    assert PatientRegistry(db_path).get_by_slug(maria.slug_diretorio).genero == "F"
+
+    assert reopened.remove_patient(maria.slug_diretorio)
+    assert [p.nome_completo for p in PatientRegistry(db_path).list()] == ["José da Silva"]
+
+
+def test_sqlite_registry_migrates_existing_json(tmp_path):
+    legacy = [
+        {
+            "nome_completo": "Ana Paula Lima",
+            "slug_diretorio": "ana_paula_lima",
+            "nomes_alternativos": ["Aninha"],
+            "genero": "F",
+        }
+    ]
+    (tmp_path / "patients.json").write_text(json.dumps(legacy), encoding="utf-8")
+
+    registry = PatientRegistry(tmp_path / "patients.db")
+
+    assert registry.match("Aninha").slug_diretorio == "ana_paula_lima"
+    registry.upsert(Patient(nome_completo="Ana Lima", slug_diretorio="ana_lima"))
+    duplicates = registry.detect_possible_duplicates(threshold=0.5)
+    assert {duplicates[0][0].slug_diretorio, duplicates[0][1].slug_diretorio} == {"ana_paula_lima", "ana_lima"}
+
+
+def test_sqlite_registry_merges_patients_in_one_transaction(tmp_path):
+    db_path = tmp_path / "patients.db"
+    registry = PatientRegistry(db_path)
+    origem = registry.ensure_patient("Ana Paula Lima")
+    destino = registry.ensure_patient("Ana Lima")
+    registry.add_alias(origem.slug_diretorio, "Aninha")
+    registry.detect_possible_duplicates()  # Carrega o índice de nomes
+
+    assert registry.merge_patients(origem.slug_diretorio, destino.slug_diretorio)
+
+    reopened = PatientRegistry(db_path)
+    assert reopened.get_by_slug(origem.slug_diretorio) is None
+    assert reopened.match("Aninha").slug_diretorio == destino.slug_diretorio
+    assert registry.detect_possible_duplicates(threshold=0.5) == []
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+import io
 from datetime import date
 from pathlib import Path
 
-from clinikondo import Config, run_pipeline
+from clinikondo import Config, DocumentTypeCatalog, PatientRegistry, run_pipeline
+from clinikondo.llm import BaseExtractor
+from clinikondo.manifest import list_manifests, read_manifest
+from clinikondo.models import LLMExtractionResult
+from clinikondo.processing import DocumentProcessor
 
 
 def build_config(input_dir: Path, output_dir: Path, **overrides):
@@ -88,3 +93,48 @@ def test_document_without_patient_goes_to_shared_when_configured(tmp_path):
     destino = documento.caminho_destino
     assert "compartilhado" in destino.parts
     assert destino.exists()
+
+
+class _ExtractorStub(BaseExtractor):
+    def extract(self, document, *, patient_registry, type_catalog):
+        return LLMExtractionResult(
+            nome_paciente="Ana Souza", data_documento=date(2024, 5, 2), tipo_documento="exame"
+        )
+
+
+def test_iter_process_yields_placed_documents_without_text_and_saves_state_when_stopped(tmp_path):
+    input_dir = tmp_path / "entrada"
+    input_dir.mkdir()
+    for indice in range(3):
+        (input_dir / f"exame_{indice}.txt").write_text(f"Paciente: Ana Souza\nExame {indice}", encoding="utf-8")
+    config = build_config(input_dir, tmp_path / "saida", llm_batch_size=2)
+    processor = DocumentProcessor(config, _ExtractorStub(), PatientRegistry(), DocumentTypeCatalog())
+
+    documentos = processor.iter_process()
+    primeiro = next(documentos)
+    assert primeiro.caminho_destino.exists()
+    assert primeiro.texto_extraido == ""
+    assert primeiro.chars_extraidos > 0
+    documentos.close()  # Consumidor para antes do fim: o restante fica para a próxima execução
+
+    assert config.processed_hashes_path.exists()
+    [manifesto] = list_manifests(config.manifests_dir)
+    assert [linha["status"] for linha in read_manifest(manifesto)] == ["organizado"]
+
+
+def test_process_bytes_organizes_upload_without_input_file(tmp_path):
+    input_dir = tmp_path / "entrada"
+    input_dir.mkdir()
+    config = build_config(input_dir, tmp_path / "saida")
+    processor = DocumentProcessor(config, _ExtractorStub(), PatientRegistry(), DocumentTypeCatalog())
+    conteudo = bytearray(b"Paciente: Ana Souza\nHemograma")
+
+    documento = processor.process_bytes(conteudo, "hemograma.txt")
+
+    assert documento.nome_arquivo_original == "hemograma.txt"
+    assert documento.caminho_destino.read_bytes() == conteudo
+    assert documento.conteudo is None
+    assert not any(input_dir.iterdir())
+    assert processor.process_bytes(io.BytesIO(bytes(conteudo)), "copia.txt") is None  # Duplicata por hash
+    [manifesto] = list_manifests(config.manifests_dir)
+    assert [linha["status"] for linha in read_manifest(manifesto)] == ["organizado", "duplicata"]
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from clinikondo.prompting import GAP_MARKER, clean_text, compact_document_text
+from clinikondo.ratelimit import estimate_tokens
+
+
+def _laudo_longo(paginas=60):
+    linhas = []
+    for pagina in range(1, paginas + 1):
+        linhas += [
+            "LABORATÓRIO EXEMPLO  -  Unidade Centro",
+            f"Página {pagina} de {paginas}",
+            "",
+            "||| ___ ;;; ---",
+        ]
+        if pagina == 1:
+            linhas += ["Paciente: Ana Souza", "Data de coleta: 12/03/2023", "Exame: hemograma completo"]
+        linhas += [f"Analito {pagina}-{item} valor de referência dentro do intervalo esperado" for item in range(15)]
+        if pagina == paginas:
+            linhas += ["Conclusão: sem alterações significativas", "Médico responsável: Dr. Carlos Lima CRM 12345"]
+    return "\n".join(linhas)
+
+
+def test_clean_text_drops_noise_and_repeated_headers():
+    linhas = clean_text(_laudo_longo(paginas=3))
+    assert linhas.count("LABORATÓRIO EXEMPLO - Unidade Centro") == 1
+    assert sum(linha.startswith("Página") for linha in linhas) == 1
+    assert "||| ___ ;;; ---" not in linhas and "" not in linhas
+
+
+def test_clean_text_keeps_lines_that_differ_only_in_numbers():
+    texto = "\n".join(
+        [
+            "Carteira de vacinação - Hepatite B",
+            "Dose 1 - 12/03/2021",
+            "Dose 2 - 12/04/2021",
+            "Dose 3 - 12/09/2021",
+            "Página 1 de 3",
+            "Glicose: 92 mg/dL",
+            "Glicose: 105 mg/dL",
+            "Glicose: 98 mg/dL",
+            "Página 2 de 3",
+            "Conclusão: glicemia de jejum normal",
+            "Página 3 de 3",
+        ]
+    )
+    linhas = clean_text(texto)
+    assert linhas == [linha for linha in texto.splitlines() if linha not in ("Página 2 de 3", "Página 3 de 3")]
+    assert compact_document_text(texto, token_budget=0) == "\n".join(linhas)
+
+
+def test_compact_text_fits_budget_and_keeps_informative_regions():
+    texto = compact_document_text(_laudo_longo(), token_budget=400)
+    assert estimate_tokens(texto) <= 400
+    assert "Paciente: Ana Souza" in texto
+    assert "Data de coleta: 12/03/2023" in texto
+    assert "Conclusão: sem alterações significativas" in texto
+    assert GAP_MARKER in texto
+
+
+def test_compact_text_splits_long_lines_without_newlines():
+    texto = compact_document_text("palavra " * 5000, token_budget=200)
+    assert 0 < estimate_tokens(texto) <= 200
+
+
+def test_compact_text_charges_gap_markers_against_budget():
+    linhas = []
+    for item in range(300):
+        linhas += [f"Exame {item}: normal", f"item {item} a", f"item {item} b", f"item {item} c"]
+    for budget in (60, 150, 400):
+        partes = compact_document_text("\n".join(linhas), token_budget=budget).split("\n")
+        assert GAP_MARKER in partes
+        assert sum(estimate_tokens(parte) + 1 for parte in partes) <= budget
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+
+import pytest
+
+from clinikondo.ratelimit import (
+    AdaptiveRateLimiter,
+    AIMDController,
+    TokenBucket,
+    retry_after_seconds,
+)
+from clinikondo.resilience import (
+    ABERTO,
+    MEIO_ABERTO,
+    CircuitBreaker,
+    DeadlineExceeded,
+    document_deadline,
+)
+
+
+class _HTTPError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": headers or {}, "status_code": status_code})()
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_spaces_requests_at_the_configured_rate():
+    clock = _FakeClock()
+    bucket = TokenBucket(60, capacity=2, clock=clock)  # 1 requisição/s, rajada de 2
+    waits = [bucket.reserve(1) for _ in range(4)]
+    assert waits == pytest.approx([0.0, 0.0, 1.0, 2.0])
+
+
+def test_limiter_honors_retry_after_and_backs_off_concurrency():
+    clock = _FakeClock()
+    limiter = AdaptiveRateLimiter(
+        "teste",
+        initial_concurrency=4,
+        max_attempts=3,
+        backoff_base=0.5,
+        backoff_max=30,
+        sleep=clock.sleep,
+        clock=clock,
+        rng=random.Random(0),
+    )
+    respostas = [_HTTPError(429, {"retry-after": "7"}), _HTTPError(503), "ok"]
+
+    def call():
+        resposta = respostas.pop(0)
+        if isinstance(resposta, Exception):
+            raise resposta
+        return resposta
+
+    assert limiter.call(call) == "ok"
+    assert clock.sleeps[0] == pytest.approx(7.0)  # Retry-After prevalece sobre o backoff curto
+    assert clock.sleeps[1] <= 1.0  # segunda tentativa: jitter em [0, base·2]
+    stats = limiter.get_statistics()
+    assert (stats["limitadas_429"], stats["erros_servidor"], stats["sucessos"]) == (1, 1, 1)
+    assert stats["limite_concorrencia"] == 2  # 4 → 2 → 1, +1 após o sucesso (janela de 1 vaga)
+
+
+def test_limiter_does_not_retry_client_errors():
+    limiter = AdaptiveRateLimiter("teste", max_attempts=5, sleep=lambda _: None)
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise _HTTPError(401)
+
+    with pytest.raises(_HTTPError):
+        limiter.call(call)
+    assert len(calls) == 1
+
+
+def test_client_error_is_neutral_for_the_circuit_breaker():
+    clock = _FakeClock()
+    breaker = CircuitBreaker("teste", failure_threshold=2, reset_timeout=10, clock=clock)
+    limiter = AdaptiveRateLimiter("teste", max_attempts=1, breaker=breaker, sleep=clock.sleep)
+
+    def falha(status):
+        def call():
+            raise _HTTPError(status)
+
+        return call
+
+    with pytest.raises(_HTTPError):
+        limiter.call(falha(503))
+    with pytest.raises(_HTTPError):
+        limiter.call(falha(400))  # Não zera a falha anterior
+    with pytest.raises(_HTTPError):
+        limiter.call(falha(503))
+    assert breaker.state == ABERTO
+
+    clock.now += 10
+    with pytest.raises(_HTTPError):
+        limiter.call(falha(400))  # Sonda liberada, circuito continua meio aberto
+    assert breaker.state == MEIO_ABERTO
+    assert limiter.call(lambda: "ok") == "ok"
+
+
+def test_aimd_controller_caps_in_flight_requests():
+    controller = AIMDController(initial=2, maximum=2)
+    ativos, pico = [0], [0]
+    lock = threading.Lock()
+
+    def worker():
+        controller.acquire()
+        with lock:
+            ativos[0] += 1
+            pico[0] = max(pico[0], ativos[0])
+        time.sleep(0.01)
+        with lock:
+            ativos[0] -= 1
+        controller.release()
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert pico[0] == 2
+
+
+def test_aimd_controller_gives_up_waiting_at_document_deadline():
+    controller = AIMDController(initial=1, maximum=1)
+    controller.acquire()
+    inicio = time.monotonic()
+    with document_deadline(0.05), pytest.raises(DeadlineExceeded):
+        controller.acquire()
+    assert time.monotonic() - inicio < 1.0
+    assert controller.in_flight == 1
+
+
+def test_retry_after_accepts_milliseconds_header():
+    assert retry_after_seconds(_HTTPError(429, {"retry-after-ms": "1500"})) == pytest.approx(1.5)
+    assert retry_after_seconds(_HTTPError(429)) is None
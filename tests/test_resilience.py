@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import random
+import time
+
+import pytest
+
+from clinikondo import Config, DocumentTypeCatalog, PatientRegistry
+from clinikondo.llm import BaseExtractor
+from clinikondo.models import DocumentProcessingError
+from clinikondo.processing import DocumentProcessor
+from clinikondo.ratelimit import AdaptiveRateLimiter
+from clinikondo.resilience import (
+    ABERTO,
+    FECHADO,
+    MEIO_ABERTO,
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceeded,
+    check_deadline,
+    current_deadline,
+    document_deadline,
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_circuit_breaker_fails_fast_and_probes_after_reset_timeout():
+    clock = _Clock()
+    breaker = CircuitBreaker("ollama", failure_threshold=2, reset_timeout=30, clock=clock)
+    limiter = AdaptiveRateLimiter("ollama", max_attempts=1, breaker=breaker, sleep=lambda _: None)
+    chamadas = []
+
+    def down():
+        chamadas.append(1)
+        raise ConnectionError("host fora do ar")
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            limiter.call(down)
+    assert breaker.state == ABERTO
+    with pytest.raises(CircuitOpenError):
+        limiter.call(down)
+    assert len(chamadas) == 2  # a terceira nem chegou ao endpoint
+
+    clock.now = 31
+    assert breaker.state == MEIO_ABERTO
+    assert limiter.call(lambda: "ok") == "ok"  # sonda bem-sucedida fecha o circuito
+    assert breaker.state == FECHADO
+
+
+def test_deadline_while_waiting_for_slot_does_not_leak_half_open_probe():
+    clock = _Clock()
+    breaker = CircuitBreaker("ollama", failure_threshold=1, reset_timeout=30, clock=clock)
+    limiter = AdaptiveRateLimiter(
+        "ollama", max_attempts=1, initial_concurrency=1, breaker=breaker, sleep=lambda _: None
+    )
+    with pytest.raises(ConnectionError):
+        limiter.call(lambda: (_ for _ in ()).throw(ConnectionError("host fora do ar")))
+    clock.now = 31
+    assert breaker.state == MEIO_ABERTO
+
+    limiter.concurrency.acquire()  # Vaga ocupada por outra requisição
+    with document_deadline(0.05), pytest.raises(DeadlineExceeded):
+        limiter.call(lambda: "ok")
+    limiter.concurrency.release()
+
+    clock.now = 62
+    assert limiter.call(lambda: "ok") == "ok"  # A sonda não ficou presa
+    assert breaker.state == FECHADO
+
+
+class _MaxJitter(random.Random):
+    def uniform(self, a, b):
+        return b
+
+
+def test_backoff_longer_than_deadline_raises_immediately():
+    limiter = AdaptiveRateLimiter(
+        "lento", max_attempts=3, backoff_base=60, sleep=pytest.fail, rng=_MaxJitter()
+    )
+
+    def erro_servidor():
+        exc = RuntimeError("503")
+        exc.status_code = 503
+        raise exc
+
+    with document_deadline(0.5), pytest.raises(DeadlineExceeded):
+        limiter.call(erro_servidor)
+
+
+class _SlowExtractor(BaseExtractor):
+    def extract(self, document, *, patient_registry, type_catalog):
+        time.sleep(0.05)
+        check_deadline("classificação LLM")
+        raise AssertionError("prazo deveria ter expirado")
+
+
+def test_document_over_deadline_is_routed_to_falhas(tmp_path):
+    input_dir = tmp_path / "entrada"
+    input_dir.mkdir()
+    (input_dir / "laudo.txt").write_text("Paciente: Ana Souza", encoding="utf-8")
+    config = Config(
+        input_dir=input_dir,
+        output_dir=tmp_path / "saida",
+        openai_api_key="chave-teste",
+        document_timeout=0.01,
+        executar_copia_apos_erro=False,
+    )
+    processor = DocumentProcessor(config, _SlowExtractor(), PatientRegistry(), DocumentTypeCatalog())
+
+    assert processor.process_all() == []
+    assert (config.output_dir / "falhas" / "laudo.txt").exists()
+
+
+class _DeadlineRecorder(BaseExtractor):
+    def __init__(self):
+        self.prazo_lote = None
+        self.prazos = []
+
+    def extract_batch(self, documents, *, patient_registry, type_catalog):
+        self.prazo_lote = current_deadline()
+        raise DocumentProcessingError("lote indisponível")
+
+    def extract(self, document, *, patient_registry, type_catalog):
+        self.prazos.append(current_deadline())
+        raise DocumentProcessingError("sem classificação")
+
+
+def test_batched_documents_keep_deadline_set_when_extraction_started(tmp_path):
+    input_dir = tmp_path / "entrada"
+    input_dir.mkdir()
+    (input_dir / "a.txt").write_text("Paciente: Ana Souza", encoding="utf-8")
+    (input_dir / "b.txt").write_text("Paciente: Bruno Lima", encoding="utf-8")
+    config = Config(
+        input_dir=input_dir,
+        output_dir=tmp_path / "saida",
+        openai_api_key="chave-teste",
+        document_timeout=60,
+        llm_batch_size=2,
+        executar_copia_apos_erro=False,
+    )
+    extractor = _DeadlineRecorder()
+    inicio = time.monotonic()
+    DocumentProcessor(config, extractor, PatientRegistry(), DocumentTypeCatalog()).process_all()
+
+    # O lote usa o prazo mais curto; o fallback individual, o prazo de cada documento
+    assert extractor.prazo_lote == min(extractor.prazos)
+    assert all(inicio + 60 <= prazo <= inicio + 60 + 1 for prazo in extractor.prazos)
+    assert len(set(extractor.prazos)) == 2
+
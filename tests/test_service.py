@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import json
+import threading
+import urllib.error
+import urllib.request
+from datetime import date
+
+import pytest
+
+from clinikondo import Config, DocumentTypeCatalog, PatientRegistry
+from clinikondo.llm import BaseExtractor
+from clinikondo.models import LLMExtractionResult
+from clinikondo.processing import DocumentProcessor
+from clinikondo.service import DocumentService, QueueFullError, make_server
+
+TEXTO = b"Paciente: Ana Souza\nData: 02/05/2024\nHemograma completo"
+
+
+class _ExtractorStub(BaseExtractor):
+    def __init__(self) -> None:
+        self.chamadas = 0
+
+    def extract(self, document, *, patient_registry, type_catalog):
+        self.chamadas += 1
+        return LLMExtractionResult(
+            nome_paciente="Ana Souza", data_documento=date(2024, 5, 2), tipo_documento="exame"
+        )
+
+
+def _service(tmp_path, **kwargs):
+    input_dir = tmp_path / "entrada"
+    input_dir.mkdir()
+    config = Config(input_dir=input_dir, output_dir=tmp_path / "saida", openai_api_key="chave-teste")
+    extractor = _ExtractorStub()
+    processor = DocumentProcessor(config, extractor, PatientRegistry(), DocumentTypeCatalog())
+    return DocumentService(processor, **kwargs), extractor
+
+
+def test_service_processes_uploads_and_paths_with_one_warm_processor(tmp_path):
+    service, extractor = _service(tmp_path)
+    existente = service.processor.config.input_dir / "glicemia.txt"
+    existente.write_text("Paciente: Ana Souza\nGlicemia", encoding="utf-8")
+    service.start()
+    try:
+        enviado = service.submit_bytes(TEXTO, "C:\\digitalizados\\hemograma.txt")
+        local = service.submit_path(existente)
+        copia = service.submit_bytes(TEXTO, "hemograma-copia.txt")
+        for job in (enviado, local, copia):
+            assert job.concluido.wait(10)
+    finally:
+        service.close()
+
+    assert enviado.nome == "hemograma.txt"
+    assert enviado.status == "organizado"
+    assert enviado.resultado["campos"]["nome_paciente"] == "Ana Souza"
+    assert local.status == "organizado" and existente.exists()
+    assert copia.status == "duplicata"
+    assert extractor.chamadas == 2
+    assert enviado.content is None  # Buffer liberado ao terminar
+    assert service.health()["documentos"] == 2
+
+
+def test_service_rejects_invalid_submissions_and_full_queue(tmp_path):
+    service, _ = _service(tmp_path, queue_size=1)
+    fora = tmp_path / "fora.txt"
+    fora.write_text("x", encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        service.submit_path(fora)
+    with pytest.raises(ValueError):
+        service.submit_bytes(TEXTO, "planilha.xlsx")
+    with pytest.raises(ValueError):
+        service.submit_bytes(b"", "vazio.txt")
+
+    service.submit_bytes(TEXTO, "a.txt")  # Serviço parado: a fila não anda
+    with pytest.raises(QueueFullError):
+        service.submit_bytes(TEXTO, "b.txt")
+
+
+def test_http_api_submits_bytes_and_waits_for_result(tmp_path):
+    service, _ = _service(tmp_path)
+    server = make_server(service, host="127.0.0.1", port=0, max_upload_mb=0.001)
+    service.start()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        pedido = urllib.request.Request(f"{base}/documentos?nome=hemograma.txt", data=TEXTO, method="POST")
+        with urllib.request.urlopen(pedido) as resposta:
+            assert resposta.status == 202
+            job = json.loads(resposta.read())
+        with urllib.request.urlopen(f"{base}/documentos/{job['id']}?esperar=10") as resposta:
+            resultado = json.loads(resposta.read())
+        assert resultado["status"] == "organizado"
+        assert resultado["resultado"]["destino"].endswith(".txt")
+
+        grande = urllib.request.Request(f"{base}/documentos?nome=grande.txt", data=b"x" * 2048, method="POST")
+        with pytest.raises(urllib.error.HTTPError) as erro:
+            urllib.request.urlopen(grande)
+        assert erro.value.code == 413
+        with pytest.raises(urllib.error.HTTPError) as erro:
+            urllib.request.urlopen(f"{base}/documentos/inexistente")
+        assert erro.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
+
+
+def test_service_returns_pending_job_for_path_submitted_twice(tmp_path):
+    service, extractor = _service(tmp_path)
+    existente = service.processor.config.input_dir / "glicemia.txt"
+    existente.write_text("Paciente: Ana Souza\nGlicemia", encoding="utf-8")
+
+    primeiro = service.submit_path(existente)
+    segundo = service.submit_path(existente)  # Serviço parado: o primeiro segue na fila
+    assert segundo is primeiro
+    service.start()
+    try:
+        assert primeiro.concluido.wait(10)
+    finally:
+        service.close()
+
+    assert primeiro.status == "organizado"
+    assert primeiro.resultado is not None
+    assert extractor.chamadas == 1
+
+
+def test_service_cycles_defer_state_and_metrics_to_close(tmp_path):
+    service, _ = _service(tmp_path)
+    processor = service.processor
+    gravacoes = []
+    salvar_hashes = processor.hash_tracker.save
+    processor.hash_tracker.save = lambda: (gravacoes.append(1), salvar_hashes())[-1]
+    service.start()
+    try:
+        for indice in range(3):  # Um ciclo por envio
+            job = service.submit_bytes(TEXTO + str(indice).encode(), f"exame-{indice}.txt")
+            assert job.concluido.wait(10) and job.status == "organizado"
+        assert gravacoes == []
+        assert not list(processor.config.metrics_dir.glob("execucao-*.json"))
+    finally:
+        service.close()
+
+    assert gravacoes == [1]
+    assert processor.hash_tracker.is_processed(job.resultado["hash"])
+    assert len(list(processor.config.metrics_dir.glob("execucao-*.json"))) == 1
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+# Módulos que só o pipeline (processar/servir) precisa carregar.
+PESADOS = [
+    "clinikondo.processing",
+    "clinikondo.llm",
+    "clinikondo.backends",
+    "clinikondo.watch",
+    "clinikondo.service",
+    "urllib.request",
+    "http.client",
+    "ssl",
+    "sqlite3",
+]
+
+
+def _modulos_carregados(codigo: str, cwd: Path) -> list:
+    script = f"import sys\n{codigo}\nimport json\nprint(json.dumps(sorted(sys.modules)))"
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    saida = subprocess.run(
+        [sys.executable, "-c", script], cwd=cwd, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def test_import_and_admin_commands_do_not_load_pipeline(tmp_path):
+    for codigo in (
+        "import clinikondo",
+        "import clinikondo.__main__",
+        "from clinikondo.__main__ import main\nmain(['mostrar-log', '--linhas', '5'])",
+        "from clinikondo.__main__ import main\nmain(['verificar-duplicatas', '.'])",
+    ):
+        carregados = _modulos_carregados(codigo, tmp_path)
+        assert not [nome for nome in PESADOS if nome in carregados], codigo
+
+
+def test_lazy_public_api_resolves_on_first_access(tmp_path):
+    carregados = _modulos_carregados(
+        "import clinikondo\nassert 'Config' in dir(clinikondo)\nclinikondo.DocumentProcessor", tmp_path
+    )
+    assert "clinikondo.processing" in carregados
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from clinikondo import DocumentTypeCatalog
+from clinikondo.utils import sanitize_token
+
+
+def _reference_infer(catalog: DocumentTypeCatalog, text: str) -> str:
+    text_clean = sanitize_token(text, separator=" ")
+    for doc_type in catalog._types.values():
+        for keyword in doc_type.palavras_chave:
+            if sanitize_token(keyword, separator=" ") in text_clean:
+                return doc_type.nome_tipo
+    return "documento"
+
+
+def test_infer_from_text_matches_substring_scan():
+    catalog = DocumentTypeCatalog()
+    textos = [
+        "Receita: Losartana 50mg, uso contínuo",
+        "Confirmação de AGENDAMENTO da consulta com Dra. Ana",
+        "Cartão de vacinação - 2ª dose",
+        "Relatório médico e atestado de comparecimento",
+        "Formulário de cadastro",
+        "Sem nenhuma palavra conhecida",
+        "Monitoramento da pressão arterial e glicose; exames em anexo",
+    ]
+    for texto in textos:
+        assert catalog.infer_from_text(texto).nome_tipo == _reference_infer(catalog, texto)
+
+
+def test_score_text_weights_every_occurrence():
+    catalog = DocumentTypeCatalog()
+    scores = catalog.score_text("Agendamento de consulta. Agenda: retorno; medicamento de uso contínuo")
+
+    # "agendamento" também conta a palavra-chave "agenda" que é seu prefixo
+    assert scores["agenda"] == 4.0
+    assert scores["receita"] == 3.0
+    assert catalog.resolve("Resultado").nome_tipo == "exame"
+    assert catalog.resolve("prescrição").nome_tipo == "receita"
+    assert catalog.resolve("qualquer").nome_tipo == "documento"
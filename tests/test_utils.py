@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import random
+import re
+import time
+import unicodedata
+
+import pytest
+
+from clinikondo.utils import _sanitize_short, sanitize_token, strip_accents
+
+
+def _reference_strip_accents(value: str) -> str:
+    normalized = unicodedata.normalize("NFKD", value)
+    return "".join(ch for ch in normalized if unicodedata.category(ch) != "Mn")
+
+
+def _reference_sanitize_token(value: str, *, separator: str = "-", allow_digits: bool = True) -> str:
+    ascii_value = _reference_strip_accents(value).lower()
+    safe_chars: list[str] = []
+    for ch in ascii_value:
+        if ch.isalpha() or (allow_digits and ch.isdigit()):
+            safe_chars.append(ch)
+        elif ch in {" ", "-", "_"}:
+            safe_chars.append(separator)
+    sanitized = "".join(safe_chars)
+    sanitized = re.sub(rf"{separator}+", separator, sanitized)
+    sanitized = sanitized.strip(separator)
+    return sanitized or "na"
+
+
+NOMES = [
+    "José da Silva",
+    "Maria Conceição Araújo",
+    "JOÃO PEDRO ÇÂMARA-NÓBREGA",
+    "Ângela d'Ávila Guimarães",
+    "Luís Fernando_Otávio  Brandão",
+]
+
+OCR_TEXTO = (
+    "LABORATÓRIO SÃO LUCAS — Resultado de Exame\n"
+    "Paciente: Conceição Araújo   Data da coleta: 12/03/2023\n"
+    "Hemoglobina glicada (HbA1c): 5,4 %  |  Glicose em jejum: 92 mg/dL\n"
+    "Observação: amostra hemolisada; repetir se necessário. Médico: Dr. Ênio Calçada\n"
+) * 40
+
+# Alfabeto com ASCII, acentos latinos, marcas combinantes, ligaduras, larguras
+# completas, hangul e símbolos musicais (marcas Mc com reordenamento canônico).
+_ALFABETO = (
+    "abcxyzABCXYZ019 -_./:;,()\t\n"
+    "áàâãäéêíóôõöúüçñÁÀÂÃÉÊÍÓÔÕÚÇÑ"
+    "̧̣́̀̃̈"
+    "ﬁﬂ½²ªº™Ａｂ１"
+    "한글ß"
+    "\U0001D165\U0001D16D\U0001D15E"
+)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_normalization_matches_reference_implementation(seed):
+    rng = random.Random(seed)
+    samples = [*NOMES, OCR_TEXTO, ""]
+    for _ in range(400):
+        samples.append("".join(rng.choice(_ALFABETO) for _ in range(rng.randint(0, 90))))
+    for sample in samples:
+        assert strip_accents(sample) == _reference_strip_accents(sample)
+        for separator in ("-", "_", " "):
+            for allow_digits in (True, False):
+                expected = _reference_sanitize_token(sample, separator=separator, allow_digits=allow_digits)
+                assert sanitize_token(sample, separator=separator, allow_digits=allow_digits) == expected
+                # Segunda chamada passa pelo memo de tokens curtos
+                assert sanitize_token(sample, separator=separator, allow_digits=allow_digits) == expected
+
+
+def _best_of(func, values, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        _sanitize_short.cache_clear()  # Mede o cálculo, não acertos do cache
+        start = time.perf_counter()
+        for value in values:
+            func(value, separator=" ", allow_digits=False)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@pytest.mark.benchmark
+def test_sanitize_token_is_faster_than_reference():
+    # Nomes distintos: repetir NOMES mediria só acertos do cache de _sanitize_short
+    names = [f"{nome} {''.join(chr(97 + int(d)) for d in str(i))}" for i in range(200) for nome in NOMES]
+    reference_names = _best_of(_reference_sanitize_token, names)
+    fast_names = _best_of(sanitize_token, names)
+    reference_text = _best_of(_reference_sanitize_token, [OCR_TEXTO] * 20)
+    fast_text = _best_of(sanitize_token, [OCR_TEXTO] * 20)
+
+    print(
+        f"\nnomes: {reference_names / len(names) * 1e6:.2f}µs -> {fast_names / len(names) * 1e6:.2f}µs por chamada; "
+        f"texto OCR ({len(OCR_TEXTO)} chars): {reference_text / 20 * 1e6:.1f}µs -> {fast_text / 20 * 1e6:.1f}µs por chamada"
+    )
+    assert fast_names < reference_names
+    assert fast_text < reference_text
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import sys
+import threading
+from datetime import date
+
+import pytest
+
+from clinikondo import Config, DocumentTypeCatalog, PatientRegistry
+from clinikondo.discovery import accepts_path
+from clinikondo.llm import BaseExtractor
+from clinikondo.models import LLMExtractionResult
+from clinikondo.processing import SUPPORTED_EXTENSIONS, DocumentProcessor
+from clinikondo.watch import (
+    InotifyWatcher,
+    PollingWatcher,
+    StabilityTracker,
+    watch_documents,
+)
+
+
+class _ExtractorStub(BaseExtractor):
+    def extract(self, document, *, patient_registry, type_catalog):
+        return LLMExtractionResult(
+            nome_paciente="Ana Souza", data_documento=date(2024, 5, 2), tipo_documento="exame"
+        )
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.agora = 0.0
+
+    def __call__(self) -> float:
+        return self.agora
+
+
+def _options(tmp_path, **overrides):
+    options = {
+        "extensions": SUPPORTED_EXTENSIONS,
+        "include": [],
+        "exclude": [],
+        "recursive": True,
+        "skip_dirs": [tmp_path / "entrada" / "saida"],
+    }
+    options.update(overrides)
+    return options
+
+
+def test_stability_tracker_waits_until_size_stops_changing(tmp_path):
+    arquivo = tmp_path / "laudo.pdf"
+    arquivo.write_bytes(b"%PDF-1")
+    relogio = _Clock()
+    tracker = StabilityTracker(settle=2.0, clock=relogio)
+
+    tracker.observe(arquivo)
+    relogio.agora = 1.0
+    assert tracker.ready() == []
+
+    arquivo.write_bytes(b"%PDF-1 ainda copiando")  # Cópia em andamento reinicia a espera
+    relogio.agora = 2.5
+    assert tracker.ready() == []
+    relogio.agora = 4.0
+    assert tracker.ready() == []
+    relogio.agora = 4.5
+    [pronto] = tracker.ready()
+    assert pronto.path == arquivo and pronto.stat.st_size == arquivo.stat().st_size
+    assert len(tracker) == 0
+
+    tracker.observe(arquivo)
+    arquivo.unlink()
+    relogio.agora = 10.0
+    assert tracker.ready() == [] and len(tracker) == 0
+
+
+def test_accepts_path_applies_scan_rules_to_events(tmp_path):
+    root = tmp_path / "entrada"
+    options = _options(tmp_path, exclude=["rascunhos"])
+    assert accepts_path(root, root / "clinica_a" / "laudo.pdf", **options)
+    assert not accepts_path(root, root / "laudo.docx", **options)
+    assert not accepts_path(root, root / ".laudo.pdf", **options)
+    assert not accepts_path(root, root / ".tmp" / "laudo.pdf", **options)
+    assert not accepts_path(root, root / "rascunhos" / "laudo.pdf", **options)
+    assert not accepts_path(root, root / "saida" / "Ana" / "laudo.pdf", **options)
+    assert not accepts_path(root, root / "clinica_a" / "laudo.pdf", **{**options, "recursive": False})
+
+
+def test_polling_watcher_reports_new_and_changed_files(tmp_path):
+    root = tmp_path / "entrada"
+    (root / "clinica_a").mkdir(parents=True)
+    existente = root / "antigo.txt"
+    existente.write_text("a", encoding="utf-8")
+    watcher = PollingWatcher(root, _options(tmp_path), interval=0.01)
+    stop = threading.Event()
+
+    assert watcher.poll(0.01, stop) == set()
+    novo = root / "clinica_a" / "novo.txt"
+    novo.write_text("b", encoding="utf-8")
+    existente.write_text("aa", encoding="utf-8")
+    assert watcher.poll(0.01, stop) == {novo, existente}
+
+    stop.set()
+    assert watcher.poll(1.0, stop) == set()
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify só existe no Linux")
+def test_inotify_watcher_sees_files_in_new_subfolders(tmp_path):
+    root = tmp_path / "entrada"
+    root.mkdir()
+    watcher = InotifyWatcher(root, _options(tmp_path))
+    stop = threading.Event()
+    try:
+        (root / "direto.txt").write_text("a", encoding="utf-8")
+        pasta = root / "clinica_b"
+        pasta.mkdir()
+        (pasta / "dentro.txt").write_text("b", encoding="utf-8")
+        vistos = set()
+        for _ in range(10):
+            vistos |= watcher.poll(0.2, stop)
+            if {root / "direto.txt", pasta / "dentro.txt"} <= vistos:
+                break
+        assert {root / "direto.txt", pasta / "dentro.txt"} <= vistos
+    finally:
+        watcher.close()
+
+
+def test_watch_documents_processes_backlog_and_new_files_with_one_processor(tmp_path):
+    input_dir = tmp_path / "entrada"
+    input_dir.mkdir()
+    (input_dir / "inicial.txt").write_text("Paciente: Ana Souza\nHemograma", encoding="utf-8")
+    config = Config(input_dir=input_dir, output_dir=tmp_path / "saida", openai_api_key="chave-teste")
+    processor = DocumentProcessor(config, _ExtractorStub(), PatientRegistry(), DocumentTypeCatalog())
+    stop = threading.Event()
+
+    def chegar_arquivo() -> None:
+        (input_dir / "novo.txt").write_text("Paciente: Ana Souza\nGlicemia", encoding="utf-8")
+
+    documentos = watch_documents(
+        processor, stop=stop, backend="polling", interval=0.05, settle=0.1, on_ready=chegar_arquivo
+    )
+    nomes = []
+    for documento in documentos:
+        nomes.append(documento.nome_arquivo_original)
+        assert documento.caminho_destino.exists()
+        if len(nomes) == 2:
+            stop.set()
+
+    assert nomes == ["inicial.txt", "novo.txt"]
+    assert processor.metrics.documentos == 2